@@ -5,7 +5,6 @@ from django.utils import timezone
 from .serializers import FollowUpDraftSerializer
 from .utils import extract_score
 from .serializers import JobApplicationSerializer, ApplicationAttachmentSerializer
-import requests
 import traceback
 from .models import JobApplication, ApplicationAttachment
 from .models import InterviewPrepNote
@@ -28,7 +27,6 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from django.conf import settings
 import os
-from openai import OpenAI
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 from django.utils.decorators import method_decorator
@@ -55,6 +53,7 @@ class JobApplicationViewSet(viewsets.ModelViewSet):
             return JobApplication.objects.none()
         return JobApplication.objects.filter(user=self.request.user, is_deleted=False)
     def get_openrouter_client(self):
+        from openai import OpenAI  # Heavy import; only needed on AI endpoints
         return OpenAI(
             api_key=os.getenv("OPENROUTER_API_KEY"),
             base_url="https://openrouter.ai/api/v1"
@@ -62,6 +61,7 @@ class JobApplicationViewSet(viewsets.ModelViewSet):
         
 
     def get_whisper_client(self):
+        from openai import OpenAI
         return OpenAI(api_key=settings.OPENAI_API_KEY)
     def perform_destroy(self, instance):
         # Soft delete instead of actual delete
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bills', '0002_bill_receipt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bill',
+            name='password_value',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
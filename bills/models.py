@@ -24,7 +24,7 @@ class Bill(models.Model):
     notes = models.TextField(blank=True, null=True)
     website_url = models.URLField(blank=True, null=True)
     username = models.CharField(max_length=255, blank=True, null=True)
-    password_value = models.CharField(max_length=500, blank=True, null=True)
+    password_value = models.TextField(blank=True, null=True)  # Sealed like Password.password_value
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
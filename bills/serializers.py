@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from .models import Bill
+from passwords.encryption import decrypt_value, encrypt_value
+from passwords.serializers import DecryptingListSerializer
 
 class BillSerializer(serializers.ModelSerializer):
+    password_value = serializers.CharField(max_length=500, required=False, allow_blank=True, allow_null=True)
+
     class Meta:
         model = Bill
         fields = [
@@ -13,6 +17,7 @@ class BillSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'receipt': {'required': False, 'allow_null': True}
         }
+        list_serializer_class = DecryptingListSerializer
 
     def validate_amount(self, value):
         if value <= 0:
@@ -21,6 +26,8 @@ class BillSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
+        if validated_data.get('password_value'):
+            validated_data['password_value'] = encrypt_value(validated_data['user'].pk, validated_data['password_value'])
         return super().create(validated_data)
     def update(self, instance, validated_data):
         # Handle receipt deletion if client sends "receipt": null or empty string
@@ -30,4 +37,12 @@ class BillSerializer(serializers.ModelSerializer):
                     instance.receipt.delete(save=False)
                 validated_data['receipt'] = None
 
-        return super().update(instance, validated_data)
\ No newline at end of file
+        if validated_data.get('password_value'):
+            validated_data['password_value'] = encrypt_value(instance.user_id, validated_data['password_value'])
+        return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('password_value'):
+            data['password_value'] = decrypt_value(instance.user_id, data['password_value'])
+        return data
\ No newline at end of file
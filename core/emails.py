@@ -0,0 +1,158 @@
+# emails.py
+"""
+Email template registry.
+
+Every email the app sends is registered here by name with a subject and a
+body template. Templates are compiled once per process and kept on the
+registry entry:
+
+- the shared chrome (emails/base.html: the page, the card and the footer)
+  is rendered once and split around its ``{{ content }}`` slot, so an email
+  costs a render of its own body only;
+- the plain-text part is a second template, made at compile time by running
+  the body template's *source* through html_to_text() (template tags pass
+  through as text), so no email's HTML is parsed again after rendering.
+
+    queue_templated_mail('login_otp', [user.email], user=user, otp_code=otp_code)
+"""
+import re
+from html.parser import HTMLParser
+
+from django.template import Context, Template
+from django.template.loader import get_template
+
+from .outbox import queue_mail
+
+CONTENT_MARKER = '\x00content\x00'
+
+BLOCK_TAGS = {
+    'address', 'article', 'blockquote', 'div', 'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'li', 'ol', 'p', 'section', 'table', 'tr', 'ul',
+}
+SKIP_TAGS = {'head', 'script', 'style', 'title'}
+
+
+class TextExtractor(HTMLParser):
+    """Text of an HTML fragment: one line per block element, link targets kept."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self.current = []
+        self.skipping = 0
+        self.href = None
+
+    def break_line(self):
+        line = re.sub(r'\s+', ' ', ''.join(self.current)).strip()
+        if line:
+            self.lines.append(line)
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skipping += 1
+        elif tag == 'br' or tag in BLOCK_TAGS:
+            self.break_line()
+        elif tag == 'a':
+            self.href = dict(attrs).get('href')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skipping = max(self.skipping - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.break_line()
+        elif tag == 'a' and self.href:
+            self.current.append(f' ({self.href})')
+            self.href = None
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.current.append(data)
+
+    def text(self):
+        self.close()
+        self.break_line()
+        return '\n'.join(self.lines)
+
+
+def html_to_text(html):
+    extractor = TextExtractor()
+    extractor.feed(html)
+    return extractor.text()
+
+
+class Chrome:
+    """The layout every registered email shares, rendered once."""
+
+    def __init__(self, template_name):
+        html = get_template(template_name).render({'content': CONTENT_MARKER})
+        self.html_head, self.html_tail = html.split(CONTENT_MARKER)
+        self.text_head, self.text_tail = html_to_text(self.html_head), html_to_text(self.html_tail)
+
+    def wrap(self, html, text):
+        text = '\n\n'.join(part for part in (self.text_head, text, self.text_tail) if part)
+        return self.html_head + html + self.html_tail, text
+
+
+class EmailTemplate:
+    def __init__(self, subject, template_name, chrome='emails/base.html'):
+        self.subject_source = subject
+        self.template_name = template_name
+        self.chrome_name = chrome
+        self._compiled = None
+
+    def compile(self):
+        if self._compiled is None:
+            body = get_template(self.template_name).template
+            text = Template('{% autoescape off %}' + html_to_text(body.source) + '{% endautoescape %}')
+            self._compiled = (
+                Template('{% autoescape off %}' + self.subject_source + '{% endautoescape %}'),
+                body,
+                text,
+                Chrome(self.chrome_name) if self.chrome_name else None,
+            )
+        return self._compiled
+
+    def render(self, context):
+        """(subject, text, html) for ``context``."""
+        subject, body, text, chrome = self.compile()
+        context = Context(context)
+        # Subjects are plain text, and newlines in them are header injection
+        subject = ' '.join(subject.render(context).split())
+        html = body.render(context)
+        text = text.render(context)
+        if chrome:
+            html, text = chrome.wrap(html, text)
+        return subject, text, html
+
+
+class EmailRegistry:
+    def __init__(self):
+        self.templates = {}
+
+    def register(self, name, subject, template_name, **kwargs):
+        self.templates[name] = EmailTemplate(subject, template_name, **kwargs)
+
+    def render(self, name, **context):
+        return self.templates[name].render(context)
+
+    def clear_compiled(self):
+        for template in self.templates.values():
+            template._compiled = None
+
+
+registry = EmailRegistry()
+registry.register('registration', '[EncryptEase] Successful Registration – Verify Your Email', 'emails/registration.html')
+registry.register('decoy_login', '[EncryptEase] Decoy Login Detected', 'emails/decoy_login.html')
+registry.register('login_otp', '[EncryptEase] Login Verification OTP', 'emails/login_otp.html')
+registry.register('password_reset', '[EncryptEase] Password Reset OTP', 'emails/password_reset.html')
+registry.register('document_expiry', 'Document Expiring: {{ document.title }}', 'emails/document_expiry_alert.html')
+
+
+def render_email(name, **context):
+    return registry.render(name, **context)
+
+
+def queue_templated_mail(name, recipient_list, **context):
+    subject, text, html = registry.render(name, **context)
+    return queue_mail(subject, text, recipient_list, html_message=html)
@@ -0,0 +1,16 @@
+# hashers.py
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 with the work factor taken from
+    PASSWORD_PBKDF2_ITERATIONS. Same algorithm name, so existing hashes
+    still verify, and Django re-hashes them at the new count on the next
+    successful login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,55 @@
+import time
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from core.emails import registry
+
+class Command(BaseCommand):
+    help = 'Times rendering one registered email many times, against render_to_string plus BeautifulSoup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='document_expiry', choices=sorted(registry.templates))
+        parser.add_argument('--count', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        name, count = options['email'], options['count']
+        contexts = [self.context(i) for i in range(count)]
+        template = registry.templates[name]
+
+        template._compiled = None
+        started = time.perf_counter()
+        template.render(contexts[0])
+        first = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for context in contexts:
+            template.render(context)
+        compiled = time.perf_counter() - started
+
+        try:
+            from bs4 import BeautifulSoup
+        except ImportError:
+            raise CommandError('The comparison needs beautifulsoup4 installed')
+        started = time.perf_counter()
+        for context in contexts:
+            # The old path: look the template up, render the whole page, parse it again for text
+            html = render_to_string(template.template_name, context)
+            BeautifulSoup(html, 'html.parser').get_text(separator='\n').strip()
+        baseline = time.perf_counter() - started
+
+        per_email = lambda seconds: seconds / count * 1_000_000
+        self.stdout.write(f"{name}, {count} emails")
+        self.stdout.write(f"  first render (compiles)        {first * 1000:.2f} ms")
+        self.stdout.write(self.style.SUCCESS(f"  registry                       {per_email(compiled):.1f} µs/email"))
+        self.stdout.write(f"  render_to_string + BeautifulSoup {per_email(baseline):.1f} µs/email")
+
+    def context(self, i):
+        user = SimpleNamespace(username=f'user{i}', email=f'user{i}@example.com')
+        document = SimpleNamespace(title=f'Passport {i}', file_name=f'passport-{i}.pdf')
+        return {
+            'user': user,
+            'otp_code': f'{i:06d}',
+            'document': document,
+            'expiry_date': '2026-11-01',
+            'document_url': f'https://app.example.com/documents/{i}',
+        }
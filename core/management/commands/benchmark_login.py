@@ -0,0 +1,71 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+from core.views import LoginView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Times POST /api/auth/login for a user with a decoy password, with and without the decoy tag. '
+            'Database writes are rolled back and no mail is sent.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, help='PBKDF2 iterations (default: PASSWORD_PBKDF2_ITERATIONS)')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Mail stays in memory, so the timings don't include SMTP and nothing is sent
+        overrides = {
+            'AUTH_THROTTLE_RATES': {},
+            'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend',
+            'EMAIL_OUTBOX': False,
+        }
+        if options['iterations']:
+            overrides['PASSWORD_PBKDF2_ITERATIONS'] = options['iterations']
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, repeat):
+        from django.conf import settings
+        user = User.objects.create_user(username='benchmark-login', email='benchmark-login@example.com',
+                                        password='real-password')
+        profile = user.profile
+        profile.otp_verified = True
+        profile.set_decoy_password('decoy-password')
+
+        self.stdout.write(f"PBKDF2 {settings.PASSWORD_PBKDF2_ITERATIONS} iterations, best of {repeat}")
+        tagged = self.time_login('real-password', repeat)
+        profile.decoy_tag = None
+        profile.save()
+        untagged = self.time_login('real-password', repeat)
+
+        decoy = float('inf')
+        for _ in range(repeat):
+            profile.set_decoy_password('decoy-password')
+            decoy = min(decoy, self.time_login('decoy-password', 1))
+
+        self.stdout.write(f"  normal login, decoy without tag  {untagged * 1000:.1f} ms  (two hashes)")
+        self.stdout.write(self.style.SUCCESS(f"  normal login, decoy with tag     {tagged * 1000:.1f} ms"))
+        self.stdout.write(f"  decoy login                      {decoy * 1000:.1f} ms")
+
+    def time_login(self, password, repeat):
+        view = LoginView.as_view()
+        best = float('inf')
+        for _ in range(repeat):
+            request = APIRequestFactory().post(
+                '/api/auth/login', {'email': 'benchmark-login@example.com', 'password': password}, format='json')
+            started = time.perf_counter()
+            response = view(request)
+            best = min(best, time.perf_counter() - started)
+            assert response.status_code == 200, response.data
+        return best
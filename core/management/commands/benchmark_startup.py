@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: boots Django like a worker, then serves one request
+FIRST_REQUEST_SCRIPT = """
+import io, sys, time
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+booted = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': sys.argv[2], 'SERVER_PORT': '443', 'HTTP_HOST': sys.argv[2],
+    'wsgi.url_scheme': 'https', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+}
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(f"{booted - started} {done - started} {statuses[0]}")
+"""
+
+class Command(BaseCommand):
+    help = 'Reports import time, worker boot and time-to-first-request in fresh interpreters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/admin/login/', help='Path for the first request')
+        parser.add_argument('--top', type=int, default=10, help='How many of the slowest imports to list')
+        parser.add_argument('--runs', type=int, default=3)
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'jobapps_manager.settings'))
+        host = next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h), 'localhost').lstrip('.')
+
+        # -X importtime writes "import time: self | cumulative | module" to stderr
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', FIRST_REQUEST_SCRIPT, options['path'], host],
+            capture_output=True, text=True, env=env
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        imports = []
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line and 'self [us]' not in line:
+                self_us, cumulative_us, module = line[len('import time:'):].split('|')
+                imports.append((int(cumulative_us), int(self_us), module.rstrip()))
+        total_us = sum(self_us for _, self_us, _ in imports)
+        self.stdout.write(f"Imports: {len(imports)} modules, {total_us / 1e6:.2f}s total")
+        for cumulative_us, _, module in sorted(imports, reverse=True)[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1e3:8.1f} ms  {module.strip()}")
+
+        boots, firsts = [], []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', FIRST_REQUEST_SCRIPT, options['path'], host],
+                capture_output=True, text=True, env=env
+            )
+            if result.returncode:
+                raise CommandError(result.stderr[-2000:])
+            boot, first, response_status = result.stdout.split(maxsplit=2)
+            boots.append(float(boot))
+            firsts.append(float(first))
+        self.stdout.write(f"Worker boot:          {min(boots) * 1000:.0f} ms (best of {options['runs']})")
+        self.stdout.write(f"Time to first request: {min(firsts) * 1000:.0f} ms ({response_status.strip()})")
+
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'check'],
+                       capture_output=True, env=env)
+        self.stdout.write(f"manage.py check:      {(time.perf_counter() - started) * 1000:.0f} ms")
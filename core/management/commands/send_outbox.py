@@ -0,0 +1,40 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.outbox import OutboxWorker
+
+PURGE_INTERVAL = 3600  # Seconds between retention purges while running
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox emails over a persistent SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the outbox and exit')
+        parser.add_argument('--purge-after', type=float, default=None,
+                            help='Delete sent and failed messages older than this many days '
+                                 '(default: EMAIL_OUTBOX_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(batch_size=options['batch_size'])
+        purge_after = options['purge_after']
+        if purge_after is None:
+            purge_after = getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 7)
+        last_purge = None
+        try:
+            while True:
+                if last_purge is None or time.monotonic() - last_purge >= PURGE_INTERVAL:
+                    last_purge = time.monotonic()
+                    purged = worker.purge(purge_after)
+                    if purged:
+                        self.stdout.write(f"Purged {purged} old emails")
+                sent = worker.drain()
+                if sent:
+                    self.stdout.write(f"Processed {sent} emails")
+                if options['once']:
+                    return
+                worker.close_if_idle()
+                time.sleep(options['interval'])
+        finally:
+            worker.close()
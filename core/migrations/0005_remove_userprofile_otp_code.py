@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 11:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofile',
+            name='otp_code',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_remove_userprofile_otp_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='decoy_tag',
+            field=models.CharField(blank=True, max_length=4, null=True),
+        ),
+    ]
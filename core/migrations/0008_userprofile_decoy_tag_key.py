@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_outbox_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='decoy_tag_key',
+            field=models.CharField(blank=True, max_length=8, null=True),
+        ),
+    ]
@@ -1,36 +1,116 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from .otp import VERIFY_EMAIL
+
+DECOY_TAG_LENGTH = 4
+
+
+def decoy_tag(user_id, raw_password, secret=None):
+    """
+    A short keyed tag of the decoy password. 16 bits is plenty to skip the
+    hasher for ordinary logins (1 in 65536 still runs it). The tradeoff:
+    anyone holding both the database and SECRET_KEY can rule out all but
+    about 1 in 65536 decoy guesses before running the KDF. Without the key
+    the tag tells them nothing.
+    """
+    digest = salted_hmac('core.decoy_tag', f'{user_id}:{raw_password}', secret=secret, algorithm='sha256').hexdigest()
+    return digest[:DECOY_TAG_LENGTH]
+
+
+def secret_id(secret):
+    """Short fingerprint of a SECRET_KEY, recorded beside the tags it made."""
+    return salted_hmac('core.decoy_tag.secret', 'id', secret=secret, algorithm='sha256').hexdigest()[:8]
+
+
+def tag_secret(key_id):
+    """The current or fallback SECRET_KEY with this fingerprint, or None once it has been rotated out."""
+    for secret in [settings.SECRET_KEY, *getattr(settings, 'SECRET_KEY_FALLBACKS', [])]:
+        if key_id and constant_time_compare(key_id, secret_id(secret)):
+            return secret
+    return None
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
-    otp_code = models.CharField(max_length=6, blank=True, null=True)  # Store the OTP code directly
     otp_verified = models.BooleanField(default=False)
     decoy_password = models.CharField(max_length=128, blank=True, null=True)
+    decoy_tag = models.CharField(max_length=DECOY_TAG_LENGTH, blank=True, null=True)  # See decoy_tag()
+    decoy_tag_key = models.CharField(max_length=8, blank=True, null=True)  # secret_id() of the key that made decoy_tag
     
     def __str__(self):
         
         return self.user.username
     
-    def generate_otp_code(self):
-        import random
-        self.otp_code = str(random.randint(100000, 999999))  # Generate a 6-digit OTP code
-        self.save()
-        return self.otp_code
-    
-    def verify_otp(self, otp_code):
-        return self.otp_code == otp_code  # Direct comparison of the OTP code
+    def generate_otp_code(self, purpose=VERIFY_EMAIL):
+        from .otp import issue_otp
+        return issue_otp(self.user_id, purpose)  # Kept in the cache, see otp.py
+
+    def verify_otp(self, otp_code, purpose=VERIFY_EMAIL):
+        from .otp import verify_otp
+        return verify_otp(self.user_id, purpose, otp_code)  # Consumes the code when it matches
 
     def set_decoy_password(self, raw_password):
         from django.contrib.auth.hashers import make_password
         self.decoy_password = make_password(raw_password)
+        self.decoy_tag = decoy_tag(self.user_id, raw_password, settings.SECRET_KEY)
+        self.decoy_tag_key = secret_id(settings.SECRET_KEY)
+        self.save()
+
+    def clear_decoy_password(self):
+        self.decoy_password = None
+        self.decoy_tag = None
+        self.decoy_tag_key = None
         self.save()
         
     def check_decoy_password(self, raw_password):
         from django.contrib.auth.hashers import check_password
+        # The tag rules out nearly every non-decoy password without running the hasher,
+        # so a normal login pays for one KDF (authenticate), not two. A tag whose key
+        # is no longer in SECRET_KEY/SECRET_KEY_FALLBACKS can't be checked, so those
+        # (and untagged decoys) always go through the hasher.
+        secret = tag_secret(self.decoy_tag_key) if self.decoy_tag else None
+        if secret is not None and not constant_time_compare(
+                self.decoy_tag, decoy_tag(self.user_id, raw_password, secret)):
+            return False
         return check_password(raw_password, self.decoy_password)
 
+class OutboxMessage(models.Model):
+    """An email waiting for (or done with) delivery by send_outbox, see outbox.py."""
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_until = models.DateTimeField(blank=True, null=True)  # A worker's lease while SENDING
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -0,0 +1,132 @@
+# otp.py
+"""
+One-time codes kept in the cache instead of on UserProfile.
+
+A code lives under ``otp:<purpose>:<user id>`` for OTP_TTL seconds
+(OTP_EMAIL_VERIFY_TTL for the registration code), so issuing one is a
+cache write rather than an UPDATE of core_userprofile, and email
+verification, login and password reset codes can't stand in for each
+other. Only a keyed hash of the code is stored. A correct code is
+consumed by the check that accepts it; a wrong one counts against
+OTP_MAX_ATTEMPTS, after which the code is dropped and a new one is needed.
+
+With django-redis the check is one Lua script (compare, count, delete in a
+single round trip, atomic across workers). Other cache backends get the
+same behaviour from incr() and delete(), which are atomic per call.
+"""
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+VERIFY_EMAIL = 'verify'
+LOGIN = 'login'
+RESET_PASSWORD = 'reset'
+
+# 1 = accepted and consumed, 0 = no live code, -1 = wrong (and maybe now dropped)
+VERIFY_SCRIPT = """
+local stored = redis.call('HGET', KEYS[1], 'code')
+if not stored then
+  return 0
+end
+if stored == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+  return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+  redis.call('DEL', KEYS[1])
+end
+return -1
+"""
+
+
+def otp_key(purpose, user_id):
+    return f'otp:{purpose}:{user_id}'
+
+
+def code_digest(purpose, user_id, code):
+    return salted_hmac('core.otp', f'{purpose}:{user_id}:{code}', algorithm='sha256').hexdigest()
+
+
+def ttl(purpose):
+    if purpose == VERIFY_EMAIL:
+        # The registration code waits on someone opening their inbox, so it gets longer
+        return getattr(settings, 'OTP_EMAIL_VERIFY_TTL', 86400)
+    return getattr(settings, 'OTP_TTL', 600)
+
+
+def max_attempts():
+    return getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+
+
+class RedisOTPStore:
+    def __init__(self):
+        self._script = None
+
+    def _connection(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def issue(self, purpose, user_id, code):
+        key = otp_key(purpose, user_id)
+        pipe = self._connection().pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.hset(key, mapping={'code': code_digest(purpose, user_id, code), 'attempts': 0})
+        pipe.expire(key, ttl(purpose))
+        pipe.execute()
+
+    def verify(self, purpose, user_id, code):
+        if self._script is None:
+            self._script = self._connection().register_script(VERIFY_SCRIPT)
+        result = self._script(keys=[otp_key(purpose, user_id)],
+                              args=[code_digest(purpose, user_id, code), max_attempts()])
+        return result == 1
+
+
+class CacheOTPStore:
+    """Any Django cache backend; the attempt counter is a second key beside the code."""
+
+    def issue(self, purpose, user_id, code):
+        key = otp_key(purpose, user_id)
+        cache.set_many({key: code_digest(purpose, user_id, code), f'{key}:attempts': 0}, ttl(purpose))
+
+    def verify(self, purpose, user_id, code):
+        key = otp_key(purpose, user_id)
+        stored = cache.get(key)
+        if stored is None:
+            return False
+        if constant_time_compare(stored, code_digest(purpose, user_id, code)):
+            # delete() reports whether the key was there, so only one caller consumes it
+            return bool(cache.delete(key))
+        try:
+            attempts = cache.incr(f'{key}:attempts')
+        except ValueError:
+            attempts = max_attempts()
+        if attempts >= max_attempts():
+            cache.delete_many([key, f'{key}:attempts'])
+        return False
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        backend = settings.CACHES['default']['BACKEND']
+        _store = RedisOTPStore() if backend.startswith('django_redis.') else CacheOTPStore()
+    return _store
+
+
+def issue_otp(user_id, purpose):
+    """A new 6-digit code for ``purpose``, replacing any earlier one."""
+    code = f'{secrets.randbelow(900000) + 100000}'
+    get_store().issue(purpose, user_id, code)
+    return code
+
+
+def verify_otp(user_id, purpose, code):
+    if not code:
+        return False
+    return get_store().verify(purpose, user_id, str(code).strip())
@@ -0,0 +1,165 @@
+# outbox.py
+"""
+Transactional email outbox.
+
+Views call queue_mail() instead of send_mail(): the message becomes an
+OutboxMessage row and the request returns without touching SMTP.
+``manage.py send_outbox`` delivers queued rows over one SMTP connection that
+it keeps open between messages and batches, reconnecting when the server
+drops it, and retries failures with exponential backoff. Rows are claimed
+(SENDING, with a lease) in a short transaction and sent outside it; a
+worker that dies mid-batch leaves its rows to be picked up again once the
+lease runs out. Delivered messages keep only their envelope, and sent or
+failed rows are deleted after EMAIL_OUTBOX_RETENTION_DAYS.
+
+EMAIL_OUTBOX is off by default and queue_mail() then sends immediately;
+only turn it on where the send_outbox worker runs.
+"""
+import logging
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, recipient_list, html_message=None, from_email=None):
+    """Same arguments as send_mail(); returns the queued OutboxMessage (None if sent inline)."""
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    if not getattr(settings, 'EMAIL_OUTBOX', False):
+        send_mail(subject, message, from_email, recipient_list, fail_silently=False, html_message=html_message)
+        return None
+    return OutboxMessage.objects.create(
+        subject=subject,
+        body=str(message),
+        html_body=str(html_message or ''),
+        from_email=from_email,
+        recipients=list(recipient_list),
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: 30s, 60s, 2m, ... capped at an hour."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+class OutboxWorker:
+    """Sends queued messages over a connection that outlives each batch."""
+
+    def __init__(self, batch_size=50, idle_timeout=None):
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout if idle_timeout is not None else getattr(
+            settings, 'EMAIL_OUTBOX_IDLE_TIMEOUT', 60)
+        self.connection = None
+        self.connections_opened = 0
+        self._last_used = 0.0
+
+    def _connection(self):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+            self.connections_opened += 1
+        self._last_used = time.monotonic()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def close_if_idle(self):
+        # Servers drop idle sessions anyway; closing first saves a failed send
+        if self.connection is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def send(self, outbox_message):
+        email = EmailMultiAlternatives(
+            subject=outbox_message.subject,
+            body=outbox_message.body,
+            from_email=outbox_message.from_email,
+            to=outbox_message.recipients,
+        )
+        if outbox_message.html_body:
+            email.attach_alternative(outbox_message.html_body, 'text/html')
+        try:
+            email.connection = self._connection()
+            email.send()
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The kept-open session went stale; one retry on a fresh one
+            self.close()
+            email.connection = self._connection()
+            email.send()
+
+    def claim_batch(self):
+        """Lease a batch of due messages to this worker; the row locks last only as long as the claim."""
+        now = timezone.now()
+        with transaction.atomic():
+            # skip_locked lets several workers drain the outbox side by side
+            batch = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(Q(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+                        # A worker that died mid-batch leaves its rows SENDING until the lease runs out
+                        | Q(status=OutboxMessage.SENDING, claimed_until__lt=now))
+                .order_by('next_attempt_at')[:self.batch_size]
+            )
+            lease = now + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+            OutboxMessage.objects.filter(pk__in=[outbox_message.pk for outbox_message in batch]).update(
+                status=OutboxMessage.SENDING, claimed_until=lease, attempts=F('attempts') + 1)
+        for outbox_message in batch:
+            outbox_message.attempts += 1
+        return batch
+
+    def deliver(self, outbox_message):
+        """Send one claimed message and record the outcome straight away."""
+        try:
+            self.send(outbox_message)
+        except Exception as e:
+            logger.warning("Delivery of outbox message %s failed: %s", outbox_message.pk, e)
+            self.close()
+            outcome = {'last_error': str(e)[:1000]}
+            if outbox_message.attempts >= getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 8):
+                outcome['status'] = OutboxMessage.FAILED
+            else:
+                outcome['status'] = OutboxMessage.PENDING
+                outcome['next_attempt_at'] = timezone.now() + backoff(outbox_message.attempts)
+        else:
+            # The body is often a live code; keep only the envelope once it's delivered
+            outcome = {'status': OutboxMessage.SENT, 'sent_at': timezone.now(), 'last_error': '',
+                       'body': '', 'html_body': ''}
+        OutboxMessage.objects.filter(pk=outbox_message.pk).update(claimed_until=None, **outcome)
+
+    def deliver_batch(self):
+        """Send one batch of due messages; returns how many were attempted."""
+        batch = self.claim_batch()
+        # SMTP runs with no transaction open, and each result is saved as soon as
+        # its send finishes, so a crash can't roll a sent message back to pending
+        for outbox_message in batch:
+            self.deliver(outbox_message)
+        return len(batch)
+
+    def purge(self, days):
+        """Delete sent and failed messages created more than ``days`` ago; returns how many."""
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = OutboxMessage.objects.filter(
+            status__in=(OutboxMessage.SENT, OutboxMessage.FAILED), created_at__lt=cutoff).delete()
+        return deleted
+
+    def drain(self):
+        total = 0
+        while True:
+            sent = self.deliver_batch()
+            total += sent
+            if sent < self.batch_size:
+                return total
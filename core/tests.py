@@ -1,13 +1,31 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import UserProfile
+from .models import UserProfile, OutboxMessage
+from .emails import html_to_text, registry, render_email
+from .otp import LOGIN, RESET_PASSWORD, issue_otp, otp_key, verify_otp
+from .outbox import OutboxWorker, queue_mail
+from .throttling import TokenBucketThrottle, refill_and_take
+from .hashers import PBKDF2PasswordHasher
 import pyotp
 from django.core import mail
 from bs4 import BeautifulSoup
 import json
+import re
+from datetime import timedelta
+from io import StringIO
+import socketserver
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
 
 class AuthenticationTests(TestCase):
     def setUp(self):
@@ -33,6 +51,7 @@ class AuthenticationTests(TestCase):
         self.assertIn('message', response.data)
         
         # Check that an email was sent
+        OutboxWorker().drain()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, '[EncryptEase] Successful Registration – Verify Your Email')
         
@@ -79,6 +98,7 @@ class AuthenticationTests(TestCase):
         self.assertTrue(response.data['decoy'])
         
         # Check decoy login email was sent
+        OutboxWorker().drain()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(mail.outbox[1].subject, '[EncryptEase] Decoy Login Detected')
     
@@ -101,6 +121,7 @@ class AuthenticationTests(TestCase):
         self.assertTrue(response.data['decoy'])
         
         # Check decoy login email was sent
+        OutboxWorker().drain()
         self.assertEqual(len(mail.outbox), 2)
         self.assertEqual(mail.outbox[1].subject, '[EncryptEase] Decoy Login Detected')
     
@@ -135,6 +156,7 @@ class EmailServiceTests(TestCase):
         )
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        OutboxWorker().drain()
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].subject, 'Test Email')
         self.assertEqual(mail.outbox[0].to, ['test1@example.com', 'test2@example.com'])
@@ -155,4 +177,364 @@ class EmailServiceTests(TestCase):
             'recipients': ['test@example.com']
         })
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn('error', response.data)
\ No newline at end of file
+        self.assertIn('error', response.data)
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib; counts sessions and messages on the server."""
+
+    def handle(self):
+        self.server.sessions += 1
+        self.wfile.write(b'220 localhost\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith('DATA'):
+                self.wfile.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.wfile.write(b'250 OK\r\n')
+                if self.server.drop_after_each:
+                    return
+            elif command.startswith('QUIT'):
+                self.wfile.write(b'221 Bye\r\n')
+                return
+            elif command.startswith('EHLO'):
+                self.wfile.write(b'250 localhost\r\n')
+            else:
+                # HELO, MAIL, RCPT, RSET, NOOP
+                self.wfile.write(b'250 OK\r\n')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.sessions = 0
+        self.messages = 0
+        self.drop_after_each = False
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.server = FakeSMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        smtp = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            EMAIL_OUTBOX=True,
+        )
+        smtp.enable()
+        self.addCleanup(smtp.disable)
+
+    def queue(self, count):
+        for i in range(count):
+            queue_mail(f'Message {i}', 'body', [f'user{i}@example.com'], html_message='<p>body</p>')
+
+    def test_queue_mail_does_not_send(self):
+        self.queue(1)
+        self.assertEqual(self.server.messages, 0)
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.PENDING)
+
+    def test_worker_reuses_one_connection(self):
+        self.queue(5)
+        worker = OutboxWorker(batch_size=2)
+        self.assertEqual(worker.drain(), 5)
+        worker.close()
+        self.assertEqual(self.server.messages, 5)
+        self.assertEqual(self.server.sessions, 1)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 5)
+
+    def test_sent_messages_keep_no_body_and_are_purged(self):
+        self.queue(2)
+        worker = OutboxWorker()
+        worker.drain()
+        worker.close()
+        self.assertEqual(set(OutboxMessage.objects.values_list('body', 'html_body')), {('', '')})
+
+        self.queue(1)
+        OutboxMessage.objects.filter(status=OutboxMessage.SENT).update(created_at=timezone.now() - timedelta(days=10))
+        out = StringIO()
+        call_command('send_outbox', once=True, purge_after=7, stdout=out)
+        self.assertIn('Purged 2 old emails', out.getvalue())
+        self.assertEqual(OutboxMessage.objects.get().status, OutboxMessage.SENT)
+
+    def test_worker_reconnects_when_server_drops_connection(self):
+        self.server.drop_after_each = True
+        self.queue(3)
+        worker = OutboxWorker()
+        worker.drain()
+        worker.close()
+        self.assertEqual(self.server.messages, 3)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 3)
+
+    @override_settings(EMAIL_PORT=1, EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        self.queue(1)
+        OutboxWorker().drain()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, OutboxMessage.PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertTrue(message.last_error)
+
+        # Not due yet
+        self.assertEqual(OutboxWorker().drain(), 0)
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        OutboxWorker().drain()
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.FAILED)
+        self.assertEqual(message.attempts, 2)
+
+    def test_sends_are_recorded_one_by_one(self):
+        self.queue(3)
+        # The worker dies during the second send
+        with patch.object(OutboxWorker, 'send', side_effect=[None, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                OutboxWorker().drain()
+        statuses = list(OutboxMessage.objects.order_by('pk').values_list('status', flat=True))
+        self.assertEqual(statuses, [OutboxMessage.SENT, OutboxMessage.SENDING, OutboxMessage.SENDING])
+
+        # Still leased to the dead worker
+        self.assertEqual(OutboxWorker().drain(), 0)
+        OutboxMessage.objects.filter(status=OutboxMessage.SENDING).update(claimed_until=timezone.now())
+        worker = OutboxWorker()
+        self.assertEqual(worker.drain(), 2)
+        worker.close()
+        self.assertEqual(self.server.messages, 2)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 3)
+
+    @override_settings(EMAIL_OUTBOX=False)
+    def test_outbox_disabled_sends_inline(self):
+        self.assertIsNone(queue_mail('Inline', 'body', ['someone@example.com']))
+        self.assertEqual(self.server.messages, 1)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+class EmailTemplateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='a<b', email='ab@example.com')
+
+    def test_html_and_text_from_one_render(self):
+        subject, text, html = render_email('login_otp', user=self.user, otp_code='123456')
+        self.assertEqual(subject, '[EncryptEase] Login Verification OTP')
+        self.assertIn('Hi a&lt;b,', html)
+        self.assertIn('123456', html)
+        self.assertIn('The EncryptEase Team', html)
+        self.assertIn('Hi a<b,', text)
+        self.assertIn('OTP Code: 123456', text)
+        self.assertTrue(text.endswith('The EncryptEase Team'))
+        self.assertNotIn('<', text.replace('a<b', ''))
+
+    def test_subject_is_rendered_unescaped_on_one_line(self):
+        document = SimpleNamespace(title='Tax & ID\nscan', file_name='scan.pdf')
+        subject, text, html = render_email(
+            'document_expiry', user=self.user, document=document,
+            expiry_date='2026-11-01', document_url='https://app.example.com/documents/1')
+        self.assertEqual(subject, 'Document Expiring: Tax & ID scan')
+        self.assertIn('scan.pdf (https://app.example.com/documents/1)', text)
+        self.assertIn('href="https://app.example.com/documents/1"', html)
+
+    def test_templates_compile_once(self):
+        registry.clear_compiled()
+        render_email('decoy_login', user=self.user)
+        with patch('core.emails.get_template') as get_template:
+            render_email('decoy_login', user=self.user)
+        get_template.assert_not_called()
+
+    def test_html_to_text(self):
+        html = '<html><head><style>p {}</style></head><body><h1>Hi</h1><p>One<br>two &amp; <a href="https://x.example">link</a></p></body></html>'
+        self.assertEqual(html_to_text(html), 'Hi\nOne\ntwo & link (https://x.example)')
+
+
+class OTPTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='otpuser', email='otp@example.com', password='testpass123')
+        self.user.profile.otp_verified = True
+        self.user.profile.save()
+
+    def login_code(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/auth/login', {'email': 'otp@example.com', 'password': 'testpass123'})
+        self.assertTrue(response.data['requires_otp'])
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "core_userprofile"')])
+        OutboxWorker().drain()
+        return re.search(r'OTP code: (\d{6})', mail.outbox[-1].body, re.I).group(1)
+
+    def verify_login(self, code):
+        return self.client.post('/api/auth/verify-login-otp', {'email': 'otp@example.com', 'otp_code': code})
+
+    def test_login_code_is_consumed(self):
+        code = self.login_code()
+        self.assertEqual(self.verify_login(code).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.verify_login(code).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_codes_are_scoped_to_their_purpose(self):
+        reset_code = issue_otp(self.user.pk, RESET_PASSWORD)
+        self.assertEqual(self.verify_login(reset_code).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(verify_otp(self.user.pk, RESET_PASSWORD, reset_code))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_code_dropped_after_too_many_wrong_guesses(self):
+        code = issue_otp(self.user.pk, LOGIN)
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(3):
+            self.assertFalse(verify_otp(self.user.pk, LOGIN, wrong))
+        self.assertFalse(verify_otp(self.user.pk, LOGIN, code))
+
+    def test_new_code_replaces_old_one(self):
+        first = issue_otp(self.user.pk, LOGIN)
+        second = issue_otp(self.user.pk, LOGIN)
+        if first != second:
+            self.assertFalse(verify_otp(self.user.pk, LOGIN, first))
+        self.assertTrue(verify_otp(self.user.pk, LOGIN, second))
+
+    def test_plain_code_is_not_stored(self):
+        code = issue_otp(self.user.pk, LOGIN)
+        self.assertNotEqual(cache.get(otp_key(LOGIN, self.user.pk)), code)
+
+    def test_resend_verification_issues_a_fresh_code(self):
+        self.user.profile.otp_verified = False
+        self.user.profile.save()
+        response = self.client.post('/api/auth/resend-verification', {'email': 'otp@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        OutboxWorker().drain()
+        code = re.search(r'OTP code: (\d{6})', mail.outbox[-1].body, re.I).group(1)
+
+        response = self.client.post('/api/auth/verify-otp', {'email': 'otp@example.com', 'otp_code': code})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.profile.refresh_from_db()
+        self.assertTrue(self.user.profile.otp_verified)
+
+    def test_resend_verification_skips_verified_and_unknown_emails(self):
+        for email in ('otp@example.com', 'nobody@example.com'):
+            response = self.client.post('/api/auth/resend-verification', {'email': email})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        OutboxWorker().drain()
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_password_reset_flow(self):
+        self.client.post('/api/auth/request-password-reset', {'email': 'otp@example.com'})
+        OutboxWorker().drain()
+        code = re.search(r'\n(\d{6})\n', mail.outbox[-1].body).group(1)
+        response = self.client.post('/api/auth/reset-password',
+                                    {'email': 'otp@example.com', 'code': code, 'newPassword': 'newpass456'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass456'))
+
+
+@override_settings(AUTH_THROTTLE_RATES={
+    'login': {'ip': '5/min', 'email': '3/min'},
+    'password_reset': {'ip': '2/hour'},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, email):
+        return self.client.post('/api/auth/login', {'email': email, 'password': 'wrong'})
+
+    def test_email_bucket_runs_out_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.login('victim@example.com').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.login('Victim@Example.com')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # One token refills in 60/3 seconds
+        self.assertTrue(0 < int(response['Retry-After']) <= 20)
+
+    def test_ip_bucket_covers_many_emails(self):
+        for i in range(5):
+            self.assertEqual(self.login(f'user{i}@example.com').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('other@example.com').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_ip_bucket(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            # The proxy appends the real client address; anything before it is client-supplied
+            for i in range(5):
+                response = self.client.post('/api/auth/login', {'email': f'user{i}@example.com', 'password': 'wrong'},
+                                            HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 198.51.100.7')
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.post('/api/auth/login', {'email': 'other@example.com', 'password': 'wrong'},
+                                        HTTP_X_FORWARDED_FOR='10.0.0.99, 198.51.100.7')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_other_scopes_have_their_own_buckets(self):
+        for _ in range(2):
+            self.client.post('/api/auth/request-password-reset', {'email': 'nobody@example.com'})
+        response = self.client.post('/api/auth/request-password-reset', {'email': 'nobody@example.com'})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login('nobody@example.com').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_store_failure_lets_requests_through(self):
+        with patch('core.throttling.get_store', side_effect=ConnectionError):
+            for _ in range(6):
+                self.assertEqual(self.login('victim@example.com').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_base_throttle_is_abstract(self):
+        with self.assertRaises(TypeError):
+            TokenBucketThrottle()
+
+    def test_refill_and_take(self):
+        self.assertEqual(refill_and_take(3, 0.5, 0, 1), (0.5, 1.0, False))
+        self.assertEqual(refill_and_take(3, 0.5, 0.5, 1), (0, 0.0, True))
+        self.assertEqual(refill_and_take(3, 0.5, 2, 100), (2, 0.0, True))
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class DecoyTagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='decoyuser', email='decoy@example.com', password='realpass123')
+        self.profile = self.user.profile
+        self.profile.otp_verified = True
+        self.profile.set_decoy_password('decoypass123')
+
+    def login(self, password):
+        return self.client.post('/api/auth/login', {'email': 'decoy@example.com', 'password': password})
+
+    def test_normal_login_runs_one_hash(self):
+        verify_password = PBKDF2PasswordHasher.verify
+        with patch.object(PBKDF2PasswordHasher, 'verify', autospec=True, side_effect=verify_password) as verify:
+            response = self.login('realpass123')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['requires_otp'])
+        self.assertEqual(verify.call_count, 1)
+
+    def test_decoy_login_clears_decoy(self):
+        response = self.login('decoypass123')
+        self.assertTrue(response.data['decoy'])
+        self.profile.refresh_from_db()
+        self.assertIsNone(self.profile.decoy_password)
+        self.assertIsNone(self.profile.decoy_tag)
+
+    def test_decoy_without_tag_still_detected(self):
+        self.profile.decoy_tag = None
+        self.profile.save()
+        self.assertTrue(self.login('decoypass123').data['decoy'])
+
+    def test_tags_survive_key_rotation(self):
+        with override_settings(SECRET_KEY='rotated-key', SECRET_KEY_FALLBACKS=[settings.SECRET_KEY]):
+            self.assertFalse(self.profile.check_decoy_password('realpass123'))
+            self.assertTrue(self.login('decoypass123').data['decoy'])
+
+    def test_decoy_detected_after_its_key_is_retired(self):
+        with override_settings(SECRET_KEY='rotated-key', SECRET_KEY_FALLBACKS=[]):
+            self.assertTrue(self.login('decoypass123').data['decoy'])
+
+    def test_hasher_uses_configured_iterations(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
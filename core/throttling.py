@@ -0,0 +1,155 @@
+# throttling.py
+"""
+Token-bucket throttles for the unauthenticated auth endpoints.
+
+Each bucket holds up to N tokens and refills at N per period (rates use
+DRF's "N/period" strings), so a client gets a burst of N and then a steady
+N per period. A view sets ``throttle_scope`` and is limited twice: per
+client IP and per email address in the request body, so neither a botnet
+against one account nor one IP against many accounts gets far. Rates are
+AUTH_THROTTLE_RATES[scope]['ip' | 'email'] in settings, the only place
+they're defined.
+
+With django-redis a check is one Lua script (refill, take, save, expire)
+using Redis' clock, so every worker shares the buckets. Other cache
+backends keep the same arithmetic under a process lock. If the store is
+unreachable the request is let through: a Redis outage shouldn't lock
+everyone out of logging in.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Returns {allowed, milliseconds until a token is available}
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local per_ms = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - ts, 0) * per_ms)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+else
+  wait = math.ceil((1 - tokens) / per_ms)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / per_ms))
+return {allowed, wait}
+"""
+
+
+def parse_rate(rate):
+    """'10/min' -> (capacity 10, refill 10/60 tokens per second)."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+def refill_and_take(capacity, per_second, tokens, elapsed):
+    """The script's arithmetic in Python: (tokens left, seconds to wait, allowed)."""
+    tokens = min(capacity, tokens + max(elapsed, 0) * per_second)
+    if tokens >= 1:
+        return tokens - 1, 0.0, True
+    return tokens, (1 - tokens) / per_second, False
+
+
+class RedisBucketStore:
+    def __init__(self):
+        self._script = None
+
+    def take(self, key, capacity, per_second):
+        if self._script is None:
+            from django_redis import get_redis_connection
+            self._script = get_redis_connection('default').register_script(TAKE_SCRIPT)
+        allowed, wait_ms = self._script(keys=[key], args=[capacity, per_second / 1000])
+        return bool(allowed), wait_ms / 1000
+
+
+class CacheBucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, per_second):
+        with self._lock:
+            now = time.time()
+            tokens, ts = cache.get(key, (capacity, now))
+            tokens, wait, allowed = refill_and_take(capacity, per_second, tokens, now - ts)
+            cache.set(key, (tokens, now), math.ceil(capacity / per_second))
+        return allowed, wait
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        backend = settings.CACHES['default']['BACKEND']
+        _store = RedisBucketStore() if backend.startswith('django_redis.') else CacheBucketStore()
+    return _store
+
+
+class TokenBucketThrottle(ABC, BaseThrottle):
+    """Base for the per-``kind`` throttles below; not usable on its own."""
+    kind = None
+
+    @abstractmethod
+    def get_ident_value(self, request):
+        """What the bucket is keyed on, or None to skip throttling this request."""
+
+    def allow_request(self, request, view):
+        self._wait = None
+        scope = getattr(view, 'throttle_scope', None)
+        rates = settings.AUTH_THROTTLE_RATES.get(scope, {})
+        rate = rates.get(self.kind)
+        ident = self.get_ident_value(request)
+        if not rate or not ident:
+            return True
+
+        # Hashed so emails don't end up in Redis key names
+        digest = hashlib.sha256(ident.encode('utf-8')).hexdigest()[:32]
+        capacity, per_second = parse_rate(rate)
+        try:
+            allowed, self._wait = get_store().take(f'throttle:{scope}:{self.kind}:{digest}', capacity, per_second)
+        except Exception:
+            logger.warning("Throttle check failed; allowing the request", exc_info=True)
+            return True
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'ip'
+
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class EmailTokenBucketThrottle(TokenBucketThrottle):
+    kind = 'email'
+
+    def get_ident_value(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        return email.strip().lower() if isinstance(email, str) else None
+
+
+AUTH_THROTTLES = (IPTokenBucketThrottle, EmailTokenBucketThrottle)
@@ -4,6 +4,7 @@ from .views import (
     RegisterView,
     LoginView,
     VerifyOTPView,
+    ResendVerificationView,
     RequestPasswordResetView,
     ResetPasswordView,
     ChangePasswordView,
@@ -19,6 +20,7 @@ urlpatterns = [
     path('verify-login-otp', VerifyLoginOTPView.as_view(), name='verify_login_otp'),
     path('token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
     path('verify-otp', VerifyOTPView.as_view(), name='verify_otp'),
+    path('resend-verification', ResendVerificationView.as_view(), name='resend_verification'),
     path('request-password-reset', RequestPasswordResetView.as_view(), name='request_password_reset'),
     path('reset-password', ResetPasswordView.as_view(), name='reset_password'),
     path('change-password', ChangePasswordView.as_view(), name='change_password'),
@@ -4,7 +4,6 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from django.core.mail import send_mail
 from django.conf import settings
 import pyotp
 from drf_yasg.utils import swagger_auto_schema
@@ -12,6 +11,10 @@ from drf_yasg import openapi
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import ValidationError
 from .models import UserProfile
+from .emails import html_to_text, queue_templated_mail
+from .otp import LOGIN, RESET_PASSWORD
+from .outbox import queue_mail
+from .throttling import AUTH_THROTTLES, IPTokenBucketThrottle
 from .serializers import (
     UserSerializer, 
     RegisterSerializer, 
@@ -23,8 +26,6 @@ from .serializers import (
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from bs4 import BeautifulSoup
-from django.utils.html import format_html
 
 
 class RegisterView(generics.CreateAPIView):
@@ -84,36 +85,8 @@ class RegisterView(generics.CreateAPIView):
         # Create verification link
         verification_link = f"http://localhost:8080/verification?email={user.email}&otp_code={otp_code}"
 
-        # HTML message for registration email
-        html_message = f"""
-        <html>
-          <body style="font-family: Arial, sans-serif; background-color: #f8f9fa; padding: 20px; color: #333;">
-            <div style="max-width: 600px; margin: auto; background-color: #fff; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1); padding: 30px;">
-              <h2 style="color: #007bff;">Welcome to EncryptEase, {user.username} 👋</h2>
-              <p>Thank you for registering with <strong>EncryptEase</strong>.</p>
-              <p>To complete your registration, please verify your email address by verifying the OTP</p>
-            <div style="background-color: #e9ecef; padding: 15px; border-radius: 5px; text-align: center; margin: 20px 0;">
-                <h3 style="font-weight: bold;">🔐 OTP Code: {otp_code}</h3>
-            </div>
-              <div style="background-color: #e9ecef; padding: 15px; border-radius: 5px; text-align: center; margin: 20px 0;">
-              </div>
-              <p>If you did not initiate this registration, you can safely ignore this email.</p>
-              <hr style="margin: 30px 0;">
-              <p style="font-size: 14px; color: #777;">Best regards,<br>The EncryptEase Team</p>
-            </div>
-          </body>
-        </html>
-        """
-
         # Send verification email
-        send_mail(
-            subject='[EncryptEase] Successful Registration – Verify Your Email',
-            message=f"Hi {user.username},\n\nPlease verify your email by verifying the otp",  # Fallback plain text
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False,
-            html_message=html_message
-        )
+        queue_templated_mail('registration', [user.email], user=user, otp_code=otp_code)
 
         return Response({
             "message": "User registered successfully. Please verify your email with the link sent."
@@ -121,6 +94,8 @@ class RegisterView(generics.CreateAPIView):
 
 class LoginView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'login'
 
     @swagger_auto_schema(
         operation_description="Authenticate user and get JWT tokens",
@@ -184,29 +159,10 @@ class LoginView(APIView):
 
 
                 # send email to notify user that some has loged in with decoy mode please change password
-                html_message = f"""
-                <html>
-                  <body style="font-family: Arial, sans-serif; background-color: #f8f9fa; padding: 20px; color: #333;">
-                    <h2 style="font-weight: bold;">🚨 Decoy Login Detected</h2>
-                    <p style="margin-bottom: 20px;">Hi {user.username},</p>
-                    <p style="margin-bottom: 20px;">Someone has logged in with a decoy password.</p>
-                    <p style="margin-bottom: 20px;">Please change your password to secure your account.</p>
-                    <p style="margin-bottom: 20px;">Best regards,<br>The EncryptEase Team</p>
-                  </body>
-                </html>
-                """
-                send_mail(
-                    subject='[EncryptEase] Decoy Login Detected',
-                    message=f"Hi {user.username},\n\nYou have logged in with a decoy password. Please change your password to secure your account.",  # Fallback plain text
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                    html_message=html_message
-                )
+                queue_templated_mail('decoy_login', [user.email], user=user)
 
                 # remove the decoy password
-                profile.decoy_password = None
-                profile.save()
+                profile.clear_decoy_password()
                 
                 return Response({
                     'refresh': str(refresh),
@@ -232,36 +188,10 @@ class LoginView(APIView):
                 )
             
             # Generate and send OTP for every login attempt
-            otp_code = profile.generate_otp_code()
+            otp_code = profile.generate_otp_code(LOGIN)
             
             # Send OTP email
-            html_message = f"""
-            <html>
-              <body style="font-family: Arial, sans-serif; background-color: #f8f9fa; padding: 20px; color: #333;">
-                <div style="max-width: 600px; margin: auto; background-color: #fff; border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1); padding: 30px;">
-                  <h2 style="color: #007bff;">Login Verification for EncryptEase</h2>
-                  <p>Hi {user.username},</p>
-                  <p>Here is your login verification OTP code:</p>
-                  <div style="background-color: #e9ecef; padding: 15px; border-radius: 5px; text-align: center; margin: 20px 0;">
-                    <h3 style="font-weight: bold;">🔐 OTP Code: {otp_code}</h3>
-                  </div>
-                  <p>This code is valid for a limited time. Please do not share it with anyone.</p>
-                  <p>If you didn't request this login, please secure your account immediately.</p>
-                  <hr style="margin: 30px 0;">
-                  <p style="font-size: 14px; color: #777;">Stay secure,<br>The EncryptEase Team</p>
-                </div>
-              </body>
-            </html>
-            """
-
-            send_mail(
-                subject='[EncryptEase] Login Verification OTP',
-                message=f"Hi {user.username},\n\nHere is your login verification OTP code: {otp_code}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-                html_message=html_message
-            )
+            queue_templated_mail('login_otp', [user.email], user=user, otp_code=otp_code)
             
             return Response({
                 "message": "OTP sent to your registered email. Please verify to complete login.",
@@ -282,6 +212,8 @@ class LoginView(APIView):
 
 class VerifyOTPView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'otp'
     
     @swagger_auto_schema(
         operation_description="Verify OTP code for email verification",
@@ -342,8 +274,35 @@ class VerifyOTPView(APIView):
                 "error": "User not found"
             }, status=status.HTTP_404_NOT_FOUND)
 
+class ResendVerificationView(APIView):
+    permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'resend_verification'
+
+    def post(self, request):
+        email = request.data.get('email', None)
+
+        if not email:
+            return Response(
+                {"error": "Email is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user = User.objects.filter(email=email, profile__otp_verified=False).first()
+        if user is not None:
+            # Replaces any earlier registration code
+            otp_code = user.profile.generate_otp_code()
+            queue_templated_mail('registration', [user.email], user=user, otp_code=otp_code)
+
+        # Same answer either way, so this doesn't reveal who has an account
+        return Response({
+            "message": "If the email belongs to an unverified account, a new verification code has been sent."
+        }, status=status.HTTP_200_OK)
+
 class VerifyLoginOTPView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'otp'
     def post(self, request):
         serializer = VerifyOTPSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -352,7 +311,7 @@ class VerifyLoginOTPView(APIView):
             user = User.objects.get(email=serializer.validated_data['email'])
             profile = user.profile
             
-            if profile.verify_otp(serializer.validated_data['otp_code']):
+            if profile.verify_otp(serializer.validated_data['otp_code'], LOGIN):
                 # Generate tokens only after OTP verification
                 refresh = RefreshToken.for_user(user)
                 print("Generated tokens:", refresh)
@@ -374,6 +333,8 @@ class VerifyLoginOTPView(APIView):
 
 class RequestPasswordResetView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'password_reset'
     
     def post(self, request):
         email = request.data.get('email', None)  # Ensure you get the email properly
@@ -389,31 +350,10 @@ class RequestPasswordResetView(APIView):
             profile = user.profile
             
             # Generate OTP for password reset
-            otp_code = profile.generate_otp_code()
+            otp_code = profile.generate_otp_code(RESET_PASSWORD)
             
-            # Create a professional email message
-            subject = '[EncryptEase] Password Reset OTP'
-            message = format_html("""
-                <h2 style="color: #333;">Password Reset Request</h2>
-                <p>Hi {username},</p>
-                <p>We received a request to reset your password. Here is your OTP code:</p>
-                <h3 style="color: #007BFF;">{otp_code}</h3>
-                <p>If you didn't request a password reset, please ignore this email.</p>
-                <p>Thank you,<br>Your EncryptEase Team</p>
-                <footer style="font-size: 0.9em; color: #888;">
-                    <p>This email was sent to {email}. If you have any questions, please contact support.</p>
-                </footer>
-            """, username=user.username, otp_code=otp_code, email=user.email)
-
-            # Send password reset email with HTML content
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-                html_message=message  # Use HTML message
-            )
+            # Send password reset email
+            queue_templated_mail('password_reset', [user.email], user=user, otp_code=otp_code)
 
             return Response({
                 "message": "Password reset OTP sent to email.",
@@ -428,6 +368,8 @@ class RequestPasswordResetView(APIView):
 
 class ResetPasswordView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'otp'
     
     def post(self, request):
         print(request.data)
@@ -445,7 +387,7 @@ class ResetPasswordView(APIView):
             user = User.objects.get(email=email)
             profile = user.profile
             
-            if profile.verify_otp(otp_code):
+            if profile.verify_otp(otp_code, RESET_PASSWORD):
                 user.set_password(new_password)
                 user.save()
                 return Response({
@@ -575,6 +517,8 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
 
 class SendEmailView(APIView):
     permission_classes = (permissions.AllowAny,)
+    throttle_classes = (IPTokenBucketThrottle,)
+    throttle_scope = 'send_email'
 
     @swagger_auto_schema(
         operation_description="Send an email through the platform",
@@ -638,16 +582,14 @@ class SendEmailView(APIView):
 
         try:
             # Generate plain text version from HTML
-            soup = BeautifulSoup(html_message, "html.parser")
-            plain_message = soup.get_text(separator='\n').strip()
+            plain_message = html_to_text(html_message)
 
-            send_mail(
+            queue_mail(
                 subject=subject,
                 message=plain_message,
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=recipients,
-                html_message=html_message,
-                fail_silently=False
+                html_message=html_message
             )
             
             return Response({
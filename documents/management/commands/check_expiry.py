@@ -2,8 +2,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from core.emails import queue_templated_mail
 from documents.models import Document
 
 class Command(BaseCommand):
@@ -24,24 +23,13 @@ class Command(BaseCommand):
             if not doc.user.settings.enable_email_alerts:
                 continue
 
-            context = {
-                'user': doc.user,
-                'document': doc,
-                'expiry_date': doc.expiry_date.strftime('%Y-%m-%d'),
-                'document_url': f"{settings.FRONTEND_URL}/documents/{doc.id}"
-            }
-
-            html_message = render_to_string(
-                'emails/document_expiry_alert.html',
-                context
-            )
-            
-            send_mail(
-                subject=f"Document Expiring: {doc.title}",
-                message=strip_tags(html_message),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[doc.user.email],
-                html_message=html_message
+            queue_templated_mail(
+                'document_expiry',
+                [doc.user.email],
+                user=doc.user,
+                document=doc,
+                expiry_date=doc.expiry_date.strftime('%Y-%m-%d'),
+                document_url=f"{settings.FRONTEND_URL}/documents/{doc.id}",
             )
 
             doc.expiry_notified = True
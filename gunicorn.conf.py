@@ -0,0 +1,9 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn jobapps_manager.wsgi:application`
+
+
+def post_worker_init(worker):
+    # Django is set up by now; load the password classifier once per worker
+    # (when PASSWORD_CLASSIFIER_PRELOAD is on) instead of on the first request.
+    from passwords.classifiers import warm_up
+    warm_up()
@@ -13,7 +13,6 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-import openai
 
 
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
@@ -102,6 +101,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Proxies in front of the app; throttles take the client address from X-Forwarded-For at that depth
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
 }
 
 SECURE_SSL_REDIRECT = False
@@ -132,6 +133,15 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',  # Reads PASSWORD_PBKDF2_ITERATIONS
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '1000000'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -259,4 +269,52 @@ SWAGGER_SETTINGS = {
 }
 USE_X_FORWARDED_HOST = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
-SECURE_HSTS_PRELOAD = True
\ No newline at end of file
+SECURE_HSTS_PRELOAD = True
+# Password categorization
+PASSWORD_CLASSIFIER_MODEL = os.getenv('PASSWORD_CLASSIFIER_MODEL', 'facebook/bart-large-mnli')
+PASSWORD_CLASSIFIER_PRELOAD = os.getenv('PASSWORD_CLASSIFIER_PRELOAD', 'False') == 'True'  # Load at worker boot
+PASSWORD_INFERENCE_SOCKET = os.getenv('PASSWORD_INFERENCE_SOCKET')  # e.g. /run/encryptease/inference.sock
+PASSWORD_INFERENCE_TIMEOUT = float(os.getenv('PASSWORD_INFERENCE_TIMEOUT', '0.5'))  # Seconds
+PASSWORD_BATCHING = os.getenv('PASSWORD_BATCHING', 'False') == 'True'  # Micro-batch concurrent classifications
+PASSWORD_BATCH_MAX_SIZE = int(os.getenv('PASSWORD_BATCH_MAX_SIZE', '16'))
+PASSWORD_BATCH_MAX_WAIT_MS = float(os.getenv('PASSWORD_BATCH_MAX_WAIT_MS', '5'))
+PASSWORD_BATCH_RESULT_TIMEOUT = float(os.getenv('PASSWORD_BATCH_RESULT_TIMEOUT', '10'))  # Seconds per forward pass before a request gives up on the batcher
+PASSWORD_BATCH_STATS_INTERVAL = 300  # Seconds between batcher fill-rate/queue-latency log lines (0 disables)
+PASSWORD_CLASSIFIER_BACKEND = os.getenv('PASSWORD_CLASSIFIER_BACKEND', 'zero_shot')  # 'zero_shot' or 'embedding'
+PASSWORD_EMBEDDING_MODEL = os.getenv('PASSWORD_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+PASSWORD_SKLEARN_MODEL_PATH = os.getenv('PASSWORD_SKLEARN_MODEL_PATH', os.path.join(BASE_DIR, 'ml_models', 'password_category.joblib'))
+PASSWORD_SKLEARN_MIN_CONFIDENCE = float(os.getenv('PASSWORD_SKLEARN_MIN_CONFIDENCE', '0.6'))  # Below this, ask the transformer
+PASSWORD_CATEGORY_CACHE = os.getenv('PASSWORD_CATEGORY_CACHE', 'True') == 'True'
+PASSWORD_CATEGORY_CACHE_SIZE = int(os.getenv('PASSWORD_CATEGORY_CACHE_SIZE', '10000'))  # In-process LRU entries
+PASSWORD_CATEGORY_CACHE_TIMEOUT = 60 * 60 * 24  # Redis TTL in seconds
+PASSWORD_CATEGORY_CACHE_VERSION = 1  # Bump when rules or models change
+PASSWORD_ASYNC_CATEGORIZATION = os.getenv('PASSWORD_ASYNC_CATEGORIZATION', 'False') == 'True'  # Needs `manage.py process_category_queue` running
+PASSWORD_CATEGORY_MAX_ATTEMPTS = 5  # Model failures before a queued entry is left alone
+PASSWORD_CATEGORY_LEASE_SECONDS = 300  # How long a worker's claim on a queued batch lasts
+PASSWORD_BREACH_CORPUS_PATH = os.getenv('PASSWORD_BREACH_CORPUS_PATH')  # HIBP "ordered by hash" SHA-1 dump
+PASSWORD_REUSE_SIMILARITY = 0.5  # Estimated trigram Jaccard for "similar passwords"
+PASSWORD_REUSE_REPORT_TIMEOUT = 600  # Seconds; dropped early whenever the vault changes
+PASSWORD_MASTER_KEY = os.getenv('PASSWORD_MASTER_KEY')  # base64, 32 bytes; wraps every user's data key
+PASSWORD_DATA_KEY_CACHE_SIZE = int(os.getenv('PASSWORD_DATA_KEY_CACHE_SIZE', '1024'))  # Unwrapped keys kept per process
+PASSWORD_DATA_KEY_CACHE_TTL = 300  # Seconds an unwrapped key stays in memory
+PASSWORD_PUBLIC_SUFFIX_LIST = os.getenv('PASSWORD_PUBLIC_SUFFIX_LIST')  # Defaults to the copy in passwords/data/
+PASSWORD_SHARE_BACKEND = os.getenv('PASSWORD_SHARE_BACKEND', 'database')  # 'cache' keeps share links in Redis with a TTL instead of rows
+PASSWORD_HISTORY_RETENTION = int(os.getenv('PASSWORD_HISTORY_RETENTION', '20'))  # Versions kept per entry
+PASSWORD_USAGE_BUFFER = os.getenv('PASSWORD_USAGE_BUFFER', 'local')  # 'redis' shares the usage buffer between workers
+PASSWORD_USAGE_FLUSH_SECONDS = float(os.getenv('PASSWORD_USAGE_FLUSH_SECONDS', '30'))
+EMAIL_OUTBOX = os.getenv('EMAIL_OUTBOX', 'False') == 'True'  # Queue mail for `manage.py send_outbox`; only turn on where that worker runs
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_RETRY_DELAY = 30  # Seconds before the first retry; doubles each attempt
+EMAIL_OUTBOX_IDLE_TIMEOUT = 60  # Close the kept-open SMTP connection after this many idle seconds
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # How long a worker owns a claimed batch before others may retry it
+EMAIL_OUTBOX_RETENTION_DAYS = 7  # send_outbox deletes sent and failed messages older than this
+OTP_TTL = int(os.getenv('OTP_TTL', '600'))  # Seconds a login or password reset code stays valid
+OTP_EMAIL_VERIFY_TTL = int(os.getenv('OTP_EMAIL_VERIFY_TTL', '86400'))
+OTP_MAX_ATTEMPTS = 5  # Wrong guesses before a code is dropped
+AUTH_THROTTLE_RATES = {  # Token buckets for the unauthenticated auth endpoints, see core/throttling.py
+    'login': {'ip': '30/min', 'email': '10/min'},
+    'otp': {'ip': '30/min', 'email': '10/min'},
+    'password_reset': {'ip': '10/hour', 'email': '5/hour'},
+    'resend_verification': {'ip': '10/hour', 'email': '5/hour'},
+    'send_email': {'ip': '10/hour'},
+}
@@ -0,0 +1,169 @@
+# batching.py
+import math
+import queue
+import threading
+import logging
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+
+from .classifiers import predict_categories
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups concurrent categorization calls into one forward pass.
+
+    The first text to arrive opens a batch; the batch is run as soon as it
+    holds ``max_batch_size`` texts or ``max_wait`` seconds have passed,
+    whichever comes first. Futures cancelled while still queued (callers
+    that gave up waiting) are dropped from the batch. stats() is logged at
+    INFO every ``stats_interval`` seconds while batches are running.
+    """
+
+    def __init__(self, predict, max_batch_size=16, max_wait=0.005, stats_interval=None):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats_interval = stats_interval
+        self._last_stats_log = time.monotonic()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+        self._queue_seconds_total = 0.0
+        self._queue_seconds_max = 0.0
+
+    def submit(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def classify(self, text, timeout=None):
+        return self.submit(text).result(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            batches, items = self._batches, self._items
+            return {
+                'batches': batches,
+                'items': items,
+                'avg_batch_size': items / batches if batches else 0.0,
+                'fill_rate': items / (batches * self.max_batch_size) if batches else 0.0,
+                'avg_queue_ms': self._queue_seconds_total * 1000 / items if items else 0.0,
+                'max_queue_ms': self._queue_seconds_max * 1000,
+            }
+
+    def _ensure_worker(self):
+        # Started lazily so a forking server never inherits a dead thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='password-batcher', daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _log_stats(self):
+        if not self.stats_interval or time.monotonic() - self._last_stats_log < self.stats_interval:
+            return
+        self._last_stats_log = time.monotonic()
+        logger.info(
+            "Batcher: %(batches)d batches, %(items)d items, avg size %(avg_batch_size).1f, "
+            "fill rate %(fill_rate).2f, queue wait avg %(avg_queue_ms).1f ms / max %(max_queue_ms).1f ms",
+            self.stats(),
+        )
+
+    def _run(self):
+        while True:
+            # Skip what callers already gave up on; the rest can no longer be cancelled
+            batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._queue_seconds_total += sum(waits)
+                self._queue_seconds_max = max(self._queue_seconds_max, *waits)
+
+            try:
+                results = self.predict([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            self._log_stats()
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def is_enabled():
+    return getattr(settings, 'PASSWORD_BATCHING', False)
+
+
+def get_batcher():
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    predict_categories,
+                    max_batch_size=getattr(settings, 'PASSWORD_BATCH_MAX_SIZE', 16),
+                    max_wait=getattr(settings, 'PASSWORD_BATCH_MAX_WAIT_MS', 5) / 1000,
+                    stats_interval=getattr(settings, 'PASSWORD_BATCH_STATS_INTERVAL', 300),
+                )
+    return _batcher
+
+
+def classify_texts(texts, strict=False):
+    """
+    Categorize texts, going through the shared batcher when it's on. Texts the
+    batcher doesn't answer in time come back as OTHER, or with ``strict``
+    raise TimeoutError; either way they're dropped from its queue.
+    """
+    if not is_enabled():
+        return predict_categories(texts)
+    batcher = get_batcher()
+    futures = [batcher.submit(text) for text in texts]
+    # One timeout per forward pass the batcher needs for this many texts
+    passes = math.ceil(len(texts) / batcher.max_batch_size) or 1
+    deadline = time.monotonic() + getattr(settings, 'PASSWORD_BATCH_RESULT_TIMEOUT', 10) * passes
+    categories = []
+    for i, future in enumerate(futures):
+        try:
+            categories.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+        except TimeoutError:
+            # A wedged batcher thread mustn't hang the request
+            for pending in futures[i:]:
+                pending.cancel()
+            if strict:
+                raise
+            logger.warning("Batched categorization timed out; using OTHER for %d texts", len(futures) - i)
+            categories += ['OTHER'] * (len(futures) - i)
+            break
+    return categories
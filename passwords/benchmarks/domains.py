@@ -0,0 +1,41 @@
+# domains.py
+import random
+
+from passwords.domain_rules import DOMAIN_PATTERNS
+
+FILLER_LABELS = ['www', 'app', 'my', 'login', 'portal', 'id', 'accounts', 'cdn', 'eu', 'us']
+FILLER_WORDS = ['acme', 'globex', 'initech', 'umbrella', 'hooli', 'vandelay', 'stark', 'wayne']
+TLDS = ['com', 'net', 'org', 'io', 'co.uk', 'de', 'app', 'dev']
+
+
+def generate_domain_infos(count, seed=0):
+    """
+    Build ``extract_domain_features``-shaped dicts that exercise every rule:
+    exact hosts, keyword hits in subdomains and names, rule TLDs, digits and
+    plain misses.
+    """
+    rng = random.Random(seed)
+    exact = sorted(d for patterns in DOMAIN_PATTERNS.values() for d in patterns['exact'])
+    keywords = sorted(k for patterns in DOMAIN_PATTERNS.values() for k in patterns['contains'])
+    rule_tlds = sorted(t for patterns in DOMAIN_PATTERNS.values() for t in patterns['tlds'])
+
+    infos = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.2:
+            domain = rng.choice(exact)
+        else:
+            name = rng.choice(FILLER_WORDS)
+            if kind < 0.55:
+                name = rng.choice([f"{name}{rng.choice(keywords)}", f"{rng.choice(keywords)}{name}"])
+            elif kind < 0.65:
+                name = f"{name}{rng.randint(0, 99999)}"
+            tld = rng.choice(rule_tlds) if kind > 0.9 else rng.choice(TLDS)
+            labels = [rng.choice(FILLER_LABELS + keywords) for _ in range(rng.randint(0, 2))]
+            domain = '.'.join(labels + [name, tld])
+        infos.append({
+            'domain': domain,
+            'tld': domain.split('.')[-1],
+            'subdomains': domain.split('.')[:-1]
+        })
+    return infos
@@ -0,0 +1,105 @@
+# breach.py
+"""
+Offline breached-password lookups.
+
+The corpus is a Have I Been Pwned style "ordered by hash" dump: one
+``SHA1HEX:COUNT`` line per breached password, sorted by hash. The file is
+memory-mapped and binary searched in place, so the OS pages in only the few
+blocks a lookup touches and a multi-GB corpus adds next to nothing to RSS.
+"""
+import hashlib
+import mmap
+import os
+import threading
+
+from django.conf import settings
+
+SHA1_HEX_LENGTH = 40
+
+
+class BreachCorpusUnavailable(Exception):
+    pass
+
+
+class BreachCorpus:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.size = os.fstat(f.fileno()).st_size
+            if not self.size:
+                raise BreachCorpusUnavailable(f"{path} is empty")
+            # The mapping stays valid after the file object is closed
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._map, 'madvise'):
+            # Lookups jump around the file; don't read ahead
+            self._map.madvise(mmap.MADV_RANDOM)
+
+    def lookup(self, sha1_hex):
+        """Times the hash appears in the corpus (0 if it doesn't)."""
+        target = sha1_hex.upper().encode('ascii')
+        data = self._map
+        lo, hi = 0, self.size  # Both always sit on a line start
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b'\n', lo, mid) + 1 or lo
+            end = data.find(b'\n', start, hi)
+            if end == -1:
+                end = hi
+
+            candidate = data[start:start + SHA1_HEX_LENGTH]
+            if candidate == target:
+                line = data[start:end].rstrip(b'\r')
+                _, _, count = line.partition(b':')
+                return int(count or 1)
+            if candidate < target:
+                lo = end + 1
+            else:
+                hi = start
+        return 0
+
+    def check(self, raw_password):
+        return self.lookup(hashlib.sha1(raw_password.encode('utf-8')).hexdigest())
+
+    def close(self):
+        self._map.close()
+
+
+_corpus = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus():
+    """The configured corpus, mapped once per process."""
+    global _corpus
+    path = getattr(settings, 'PASSWORD_BREACH_CORPUS_PATH', None)
+    if not path:
+        raise BreachCorpusUnavailable('PASSWORD_BREACH_CORPUS_PATH is not set')
+
+    with _corpus_lock:
+        if _corpus is None or _corpus.path != path:
+            try:
+                corpus = BreachCorpus(path)
+            except OSError as e:
+                raise BreachCorpusUnavailable(str(e)) from e
+            if _corpus is not None:
+                _corpus.close()
+            _corpus = corpus
+        return _corpus
+
+
+def audit_passwords(passwords, corpus=None):
+    """
+    Check (id, name, password_value) rows and return the breached ones,
+    most exposed first.
+    """
+    corpus = corpus or get_corpus()
+    checked = 0
+    breached = []
+    for pk, name, password_value in passwords:
+        checked += 1
+        count = corpus.check(password_value)
+        if count:
+            breached.append({'id': pk, 'name': name, 'breach_count': count})
+    breached.sort(key=lambda entry: entry['breach_count'], reverse=True)
+    return {'checked': checked, 'breached': breached}
@@ -0,0 +1,87 @@
+# category_cache.py
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(features):
+    """Hash of the lowercased domain and name tokens, so no vault data sits in Redis."""
+    domain = (features.get('domain') or {}).get('domain', '')
+    name_tokens = re.findall(r'\w+', (features.get('name') or '').lower())
+    version = getattr(settings, 'PASSWORD_CATEGORY_CACHE_VERSION', 1)
+    raw = f"{version}|{domain}|{' '.join(name_tokens)}"
+    return 'password-category:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+class CategoryCache:
+    """
+    Two tiers: an in-process LRU checked first, then the shared Django cache
+    (Redis) so one worker's result serves every other worker too.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            category = self._local.get(key)
+            if category is not None:
+                self._local.move_to_end(key)
+                self._counters['local_hits'] += 1
+                return category
+
+        try:
+            category = cache.get(key)
+        except Exception:
+            # A cache outage should only cost us the lookup
+            logger.warning("Shared category cache unavailable", exc_info=True)
+            category = None
+
+        with self._lock:
+            if category is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['shared_hits'] += 1
+        self._remember(key, category)
+        return category
+
+    def set(self, key, category):
+        self._remember(key, category)
+        try:
+            cache.set(key, category, getattr(settings, 'PASSWORD_CATEGORY_CACHE_TIMEOUT', 86400))
+        except Exception:
+            logger.warning("Shared category cache unavailable", exc_info=True)
+
+    def _remember(self, key, category):
+        with self._lock:
+            self._local[key] = category
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters['local_size'] = len(self._local)
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        counters['hit_rate'] = (lookups - counters['misses']) / lookups if lookups else 0.0
+        return counters
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            for name in self._counters:
+                self._counters[name] = 0
+
+
+category_cache = CategoryCache(max_size=getattr(settings, 'PASSWORD_CATEGORY_CACHE_SIZE', 10000))
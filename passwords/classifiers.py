@@ -0,0 +1,271 @@
+# classifiers.py
+import logging
+import os
+import resource
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CANDIDATE_LABELS = [
+    'social media', 'email', 'financial services',
+    'work related', 'entertainment', 'online shopping'
+]
+
+# Map zero-shot labels to Password.category values
+LABEL_MAPPING = {
+    'SOCIAL_MEDIA': 'SOCIAL',
+    'EMAIL': 'EMAIL',
+    'FINANCIAL_SERVICES': 'FINANCE',
+    'WORK_RELATED': 'WORK',
+    'ENTERTAINMENT': 'ENTERTAINMENT',
+    'ONLINE_SHOPPING': 'SHOPPING'
+}
+
+
+def label_to_category(label):
+    return LABEL_MAPPING.get(label.upper().replace(' ', '_'), 'OTHER')
+
+
+def pipeline(*args, **kwargs):
+    # transformers pulls in torch; import it only when a model is actually built
+    from transformers import pipeline as transformers_pipeline
+    return transformers_pipeline(*args, **kwargs)
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        # No procfs (macOS); fall back to the peak RSS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """
+    Holds the categorization models loaded in this process.
+
+    Each model is built once by its loader, the first time it is asked for,
+    and reused by every request the worker serves afterwards.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            rss_before = current_rss()
+            started = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - started
+            rss_after = current_rss()
+
+            self._models[name] = model
+            self._stats[name] = {
+                'load_seconds': round(load_seconds, 3),
+                'rss_bytes': rss_after,
+                'rss_delta_bytes': rss_after - rss_before,
+            }
+            logger.info(
+                "Loaded %s model in %.2fs (rss %.1f MB, +%.1f MB)",
+                name, load_seconds, rss_after / 2**20,
+                (rss_after - rss_before) / 2**20
+            )
+            return model
+
+    def discard(self, name):
+        with self._lock:
+            self._models.pop(name, None)
+            self._stats.pop(name, None)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def stats(self):
+        return {name: dict(values) for name, values in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+
+registry = ModelRegistry()
+
+
+def load_zero_shot_classifier():
+    return pipeline(
+        "zero-shot-classification",
+        model=getattr(settings, 'PASSWORD_CLASSIFIER_MODEL', 'facebook/bart-large-mnli')
+    )
+
+
+def get_zero_shot_classifier():
+    return registry.get('zero_shot', load_zero_shot_classifier)
+
+
+def zero_shot_categories(texts):
+    """Categorize several texts with a single call into the pipeline."""
+    categories = ['OTHER'] * len(texts)
+    pending = [(i, text) for i, text in enumerate(texts) if text and text.strip()]
+    if not pending:
+        return categories
+
+    classifier = get_zero_shot_classifier()
+    results = classifier([text for _, text in pending], CANDIDATE_LABELS)
+    if isinstance(results, dict):
+        results = [results]
+    for (i, _), result in zip(pending, results):
+        categories[i] = label_to_category(result['labels'][0])
+    return categories
+
+
+# Embedding backend: the text is embedded once and compared with these,
+# instead of one NLI pass per candidate label
+LABEL_TEMPLATE = "This account is for {}."
+
+
+def _mean_pool(features):
+    import numpy as np
+
+    # feature-extraction output is [1][tokens][dim]; average over tokens
+    vector = np.asarray(features, dtype=np.float32).reshape(-1, np.shape(features)[-1]).mean(axis=0)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def load_embedding_classifier():
+    import numpy as np
+
+    extractor = pipeline(
+        "feature-extraction",
+        model=getattr(settings, 'PASSWORD_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    )
+    prompts = [LABEL_TEMPLATE.format(label) for label in CANDIDATE_LABELS]
+    label_vectors = np.stack([_mean_pool(features) for features in extractor(prompts)])
+    return extractor, label_vectors
+
+
+def get_embedding_classifier():
+    return registry.get('embedding', load_embedding_classifier)
+
+
+def embedding_categories(texts):
+    """Categorize texts by cosine similarity against precomputed label vectors."""
+    categories = ['OTHER'] * len(texts)
+    pending = [(i, text) for i, text in enumerate(texts) if text and text.strip()]
+    if not pending:
+        return categories
+
+    import numpy as np
+
+    extractor, label_vectors = get_embedding_classifier()
+    vectors = np.stack([_mean_pool(features) for features in extractor([text for _, text in pending])])
+    best = (vectors @ label_vectors.T).argmax(axis=1)
+    for (i, _), label_index in zip(pending, best):
+        categories[i] = label_to_category(CANDIDATE_LABELS[label_index])
+    return categories
+
+
+def features_to_document(features):
+    """Flatten PasswordSerializer.build_features output into one text for TF-IDF."""
+    domain = features.get('domain') or {}
+    tokens = [features.get('name') or '']
+    if domain.get('domain'):
+        tokens.append(domain['domain'])
+        tokens.extend(domain.get('subdomains', []))
+        tokens.append(f"tld_{domain.get('tld', '')}")
+    tokens.extend(sorted(features.get('keywords') or ()))
+    return ' '.join(tokens).lower()
+
+
+def vault_model_path():
+    return getattr(settings, 'PASSWORD_SKLEARN_MODEL_PATH', None)
+
+
+def load_vault_model():
+    import joblib  # Ships with scikit-learn
+
+    path = vault_model_path()
+    return os.path.getmtime(path), joblib.load(path)
+
+
+def get_vault_model():
+    """The model written by ``train_category_model``, or None if there isn't one."""
+    path = vault_model_path()
+    if not path or not os.path.exists(path):
+        return None
+
+    mtime, model = registry.get('sklearn', load_vault_model)
+    if mtime != os.path.getmtime(path):
+        # Retrained since this worker loaded it
+        registry.discard('sklearn')
+        mtime, model = registry.get('sklearn', load_vault_model)
+    return model
+
+
+def vault_model_category(features):
+    """Return (category, probability) from the vault model, or (None, 0.0)."""
+    try:
+        model = get_vault_model()
+        if model is None:
+            return None, 0.0
+        probabilities = model.predict_proba([features_to_document(features)])[0]
+    except Exception:
+        logger.exception("Vault category model failed")
+        return None, 0.0
+    best = probabilities.argmax()
+    return model.classes_[best], float(probabilities[best])
+
+
+# name -> (categorize texts, load model)
+BACKENDS = {
+    'zero_shot': (zero_shot_categories, get_zero_shot_classifier),
+    'embedding': (embedding_categories, get_embedding_classifier),
+}
+
+
+def current_backend():
+    return getattr(settings, 'PASSWORD_CLASSIFIER_BACKEND', 'zero_shot')
+
+
+def load_backend(backend=None):
+    return BACKENDS[backend or current_backend()][1]()
+
+
+def predict_categories(texts, backend=None):
+    """Categorize texts with the backend chosen by PASSWORD_CLASSIFIER_BACKEND."""
+    return BACKENDS[backend or current_backend()][0](texts)
+
+
+def warm_up():
+    """
+    Load the classifier ahead of the first request.
+
+    Called from the gunicorn ``post_worker_init`` hook so each worker pays
+    the load cost at boot rather than on a user's POST.
+    """
+    if not getattr(settings, 'PASSWORD_CLASSIFIER_PRELOAD', False):
+        return
+    if getattr(settings, 'PASSWORD_INFERENCE_SOCKET', None):
+        # The inference daemon holds the model; workers don't need a copy
+        return
+    try:
+        load_backend()
+    except Exception:
+        logger.exception("Could not preload the password classifier")
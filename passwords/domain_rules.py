@@ -0,0 +1,230 @@
+# domain_rules.py
+"""
+Domain rules for password categorization, compiled once per process.
+
+``DomainRuleIndex`` answers the same question as the original rule walk
+(``classify_linear``) with a hash lookup for exact domains, one
+Aho-Corasick pass per label for the ``contains`` keywords and a TLD map.
+"""
+import re
+
+# Expanded domain rules with common services and patterns.
+# Order matters: when several categories match, the first one listed wins.
+DOMAIN_PATTERNS = {
+    'SOCIAL': {
+        'exact': {'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
+                'pinterest.com', 'tumblr.com', 'reddit.com', 'snapchat.com',
+                'tiktok.com', 'whatsapp.com', 'wechat.com', 'telegram.org'},
+        'contains': ['social', 'connect', 'profile', 'network', 'share'],
+        'tlds': set()
+    },
+    'EMAIL': {
+        'exact': {'gmail.com', 'outlook.com', 'yahoo.com', 'protonmail.com',
+                'zoho.com', 'mail.com', 'fastmail.com', 'icloud.com'},
+        'contains': ['mail', 'inbox', 'email', 'mx.', 'smtp.'],
+        'tlds': {'email', 'mail'}
+    },
+    'FINANCE': {
+        'exact': {'paypal.com', 'bankofamerica.com', 'chase.com', 'fidelity.com',
+                'capitalone.com', 'wellsfargo.com', 'schwab.com', 'coinbase.com',
+                'binance.com', 'venmo.com', 'cash.app', 'mint.com'},
+        'contains': ['bank', 'pay', 'credit', 'loan', 'mortgage', 'crypto', 'trade',
+                    'invest', 'wealth', 'finance', 'capital', 'exchange'],
+        'tlds': {'bank', 'capital', 'trade'}
+    },
+    'WORK': {
+        'exact': {'okta.com', 'office.com', 'azure.com', 'slack.com',
+                'atlassian.net', 'googleworkspace.com', 'vpn.', 'remote.',
+                'jira.', 'confluence.', 'zoom.us', 'teams.microsoft.com'},
+        'contains': ['vpn', 'corp', 'office', 'work', 'business', 'enterprise',
+                    'company', 'internal', 'hr', 'okta', 'sso', 'auth'],
+        'tlds': {'enterprise', 'business'}
+    },
+    'ENTERTAINMENT': {
+        'exact': {'netflix.com', 'spotify.com', 'hulu.com', 'youtube.com',
+                'twitch.tv', 'disneyplus.com', 'primevideo.com', 'steampowered.com',
+                'xbox.com', 'playstation.com', 'crunchyroll.com'},
+        'contains': ['stream', 'game', 'music', 'video', 'tv', 'movie', 'play',
+                    'fun', 'entertain', 'media', 'flix', 'tube'],
+        'tlds': {'tv', 'games', 'movie'}
+    },
+    'SHOPPING': {
+        'exact': {'amazon.com', 'ebay.com', 'etsy.com', 'aliexpress.com',
+                'walmart.com', 'target.com', 'bestbuy.com', 'newegg.com',
+                'zappos.com', 'shopify.com', 'woocommerce.com'},
+        'contains': ['shop', 'store', 'cart', 'buy', 'deal', 'sale', 'market',
+                    'mall', 'checkout', 'purchase', 'retail', 'merchant'],
+        'tlds': {'shop', 'store', 'buy'}
+    },
+    'EDUCATION': {
+        'exact': {'coursera.org', 'edx.org', 'udemy.com', 'khanacademy.org',
+                'skillshare.com', 'pluralsight.com', 'lynda.com'},
+        'contains': ['learn', 'course', 'academy', 'study', 'school', 'edu',
+                    'training', 'class', 'education'],
+        'tlds': {'edu', 'academy', 'courses'}
+    }
+}
+
+
+SHOPPING_NUMBERS_RE = re.compile(r'\d{3,}')  # Numbers in domain often indicate shopping
+WORK_ENVIRONMENT_RE = re.compile(r'(api|dev|stage|prod)')
+FINANCE_FALLBACK_RE = re.compile(r'(bank|creditunion|fin|capital)')  # Country-specific financial institutions
+
+
+def classify_fallbacks(domain):
+    """Special cases checked after every table rule has missed."""
+    if 'login.' in domain or 'auth.' in domain:
+        return 'WORK'
+    if 'cloud.' in domain or 'aws.' in domain:
+        return 'WORK'
+    if any(x in domain for x in ['bit.ly', 'goo.gl']):
+        return 'OTHER'  # URL shorteners
+
+    # Check domain structure patterns
+    if SHOPPING_NUMBERS_RE.search(domain):
+        return 'SHOPPING'
+    if WORK_ENVIRONMENT_RE.search(domain):
+        return 'WORK'
+    if FINANCE_FALLBACK_RE.search(domain):
+        return 'FINANCE'
+    return 'OTHER'
+
+
+def classify_linear(domain_info, domain_patterns=DOMAIN_PATTERNS):
+    """
+    Reference implementation: walks the rule table in order.
+
+    Kept for parity tests and ``benchmark_domain_rules``; requests go
+    through ``DomainRuleIndex``.
+    """
+    if not domain_info.get('domain'):
+        return 'OTHER'
+
+    domain = domain_info['domain'].lower()
+    tld = domain_info.get('tld', '')
+    subdomains = domain_info.get('subdomains', [])
+
+    # Check exact domain matches
+    for category, patterns in domain_patterns.items():
+        if domain in patterns['exact']:
+            return category
+
+    # Check subdomain patterns
+    for subdomain in subdomains:
+        for category, patterns in domain_patterns.items():
+            if any(keyword in subdomain for keyword in patterns['contains']):
+                return category
+
+    # Check domain contains keywords
+    for category, patterns in domain_patterns.items():
+        if any(keyword in domain for keyword in patterns['contains']):
+            return category
+
+    # Check TLD patterns
+    for category, patterns in domain_patterns.items():
+        if tld in patterns['tlds']:
+            return category
+
+    return classify_fallbacks(domain)
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over the ``contains`` keywords.
+
+    ``match`` returns a bitmask of the categories with at least one keyword
+    in the text; bit ``i`` is the ``i``-th category in rule order.
+    """
+
+    def __init__(self, keywords_by_bit):
+        self._goto = [{}]
+        self._output = [0]
+
+        for bit, keywords in keywords_by_bit.items():
+            for keyword in keywords:
+                state = 0
+                for char in keyword:
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto[state][char] = next_state
+                        self._goto.append({})
+                        self._output.append(0)
+                    state = next_state
+                self._output[state] |= 1 << bit
+
+        # Breadth-first failure links, then fold each state's transitions
+        # into a full table so matching never follows a failure link.
+        fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                self._output[next_state] |= self._output[fail[next_state]]
+
+        for state in queue:
+            for char, next_state in self._goto[fail[state]].items():
+                self._goto[state].setdefault(char, next_state)
+
+    def match(self, text):
+        goto, output = self._goto, self._output
+        root = goto[0]
+        state = 0
+        found = 0
+        for char in text:
+            state = goto[state].get(char) or root.get(char, 0)
+            found |= output[state]
+        return found
+
+
+class DomainRuleIndex:
+    def __init__(self, domain_patterns=DOMAIN_PATTERNS):
+        self.categories = list(domain_patterns)
+        self.exact = {}
+        self.tlds = {}
+        for category, patterns in domain_patterns.items():
+            for domain in patterns['exact']:
+                self.exact.setdefault(domain, category)
+            for tld in patterns['tlds']:
+                self.tlds.setdefault(tld, category)
+        self.automaton = KeywordAutomaton({
+            bit: patterns['contains']
+            for bit, patterns in enumerate(domain_patterns.values())
+        })
+
+    def _first_category(self, mask):
+        # Lowest set bit is the earliest category in rule order
+        return self.categories[(mask & -mask).bit_length() - 1]
+
+    def classify(self, domain_info):
+        if not domain_info.get('domain'):
+            return 'OTHER'
+
+        domain = domain_info['domain'].lower()
+
+        category = self.exact.get(domain)
+        if category:
+            return category
+
+        for subdomain in domain_info.get('subdomains', []):
+            mask = self.automaton.match(subdomain)
+            if mask:
+                return self._first_category(mask)
+
+        mask = self.automaton.match(domain)
+        if mask:
+            return self._first_category(mask)
+
+        category = self.tlds.get(domain_info.get('tld', ''))
+        if category:
+            return category
+
+        return classify_fallbacks(domain)
+
+
+DOMAIN_INDEX = DomainRuleIndex()
@@ -0,0 +1,198 @@
+# encryption.py
+"""
+Envelope encryption for stored password values.
+
+Each user has a random 256-bit data key, stored wrapped (AES-GCM) under the
+master key. Values are sealed with the user's data key:
+
+    enc1:<base64(nonce || ciphertext || tag)>
+
+with the user id as associated data, so a value copied onto another user's
+row won't open. Unwrapped keys are kept in a bounded in-process TTL cache,
+so after the first row a value costs one AES-GCM call, not a key unwrap and
+a query. Values without the prefix were saved before encryption (or with
+UserSettings.encrypt_passwords off) and are returned as they are.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.crypto import salted_hmac
+
+PREFIX = 'enc1:'
+NONCE_SIZE = 12
+KEY_SIZE = 32
+
+
+class DecryptionError(Exception):
+    pass
+
+
+def master_key():
+    encoded = getattr(settings, 'PASSWORD_MASTER_KEY', None)
+    if encoded:
+        key = base64.b64decode(encoded)
+        if len(key) != KEY_SIZE:
+            raise ValueError('PASSWORD_MASTER_KEY must be 32 bytes, base64 encoded')
+    elif settings.DEBUG:
+        # Development only: tied to SECRET_KEY, so rotating that loses every vault
+        key = salted_hmac('passwords.encryption.master', 'key', algorithm='sha256').digest()
+    else:
+        raise ImproperlyConfigured('Set PASSWORD_MASTER_KEY (32 bytes, base64 encoded) to store password values')
+    return key
+
+
+def master_cipher():
+    return AESGCM(master_key())
+
+
+def share_cipher(token):
+    """Cipher for one share link, derived from the master key and the link's token."""
+    return AESGCM(hmac.new(master_key(), f'share:{token}'.encode(), hashlib.sha256).digest())
+
+
+def _associated_data(user_id):
+    return f'user:{user_id}'.encode()
+
+
+def wrap_key(user_id, data_key):
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + master_cipher().encrypt(nonce, data_key, _associated_data(user_id))
+
+
+def unwrap_key(user_id, wrapped):
+    wrapped = bytes(wrapped)
+    try:
+        return master_cipher().decrypt(wrapped[:NONCE_SIZE], wrapped[NONCE_SIZE:], _associated_data(user_id))
+    except InvalidTag as e:
+        raise DecryptionError(f'Data key for user {user_id} does not match the master key') from e
+
+
+class DataKeyCache:
+    """LRU of unwrapped per-user ciphers, each kept for at most ``ttl`` seconds."""
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._ciphers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._ciphers.get(user_id)
+            if entry is None:
+                return None
+            cipher, expires = entry
+            if expires < time.monotonic():
+                del self._ciphers[user_id]
+                return None
+            self._ciphers.move_to_end(user_id)
+            return cipher
+
+    def set(self, user_id, cipher):
+        with self._lock:
+            self._ciphers[user_id] = (cipher, time.monotonic() + self.ttl)
+            self._ciphers.move_to_end(user_id)
+            while len(self._ciphers) > self.max_size:
+                self._ciphers.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._ciphers.clear()
+
+
+key_cache = DataKeyCache(
+    max_size=getattr(settings, 'PASSWORD_DATA_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'PASSWORD_DATA_KEY_CACHE_TTL', 300),
+)
+
+
+def ciphers_for(user_ids):
+    """
+    Data-key ciphers for several users with at most one query, creating keys
+    for users that don't have one yet.
+    """
+    from .models import DataKey
+
+    ciphers = {}
+    missing = []
+    for user_id in set(user_ids):
+        cipher = key_cache.get(user_id)
+        if cipher is None:
+            missing.append(user_id)
+        else:
+            ciphers[user_id] = cipher
+
+    if missing:
+        for user_id, wrapped in DataKey.objects.filter(user_id__in=missing).values_list('user_id', 'wrapped_key'):
+            ciphers[user_id] = AESGCM(unwrap_key(user_id, wrapped))
+        for user_id in missing:
+            if user_id not in ciphers:
+                data_key = AESGCM.generate_key(bit_length=KEY_SIZE * 8)
+                key, _ = DataKey.objects.get_or_create(
+                    user_id=user_id, defaults={'wrapped_key': wrap_key(user_id, data_key)})
+                # Another worker may have won the race; use whichever key was stored
+                ciphers[user_id] = AESGCM(unwrap_key(user_id, key.wrapped_key))
+            key_cache.set(user_id, ciphers[user_id])
+    return ciphers
+
+
+def cipher_for(user_id):
+    return key_cache.get(user_id) or ciphers_for([user_id])[user_id]
+
+
+def is_encrypted(value):
+    return isinstance(value, str) and value.startswith(PREFIX)
+
+
+def encryption_enabled(user_id):
+    from settings_app.models import UserSettings
+
+    enabled = UserSettings.objects.filter(user_id=user_id).values_list('encrypt_passwords', flat=True).first()
+    return enabled is None or enabled
+
+
+def seal(user_id, data, cipher=None):
+    """AES-GCM seal raw bytes with the user's data key (nonce || ciphertext || tag)."""
+    cipher = cipher or cipher_for(user_id)
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + cipher.encrypt(nonce, data, _associated_data(user_id))
+
+
+def unseal(user_id, sealed, cipher=None):
+    cipher = cipher or cipher_for(user_id)
+    sealed = bytes(sealed)
+    try:
+        return cipher.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], _associated_data(user_id))
+    except InvalidTag as e:
+        raise DecryptionError(f'Stored value does not belong to user {user_id}') from e
+
+
+def encrypt(user_id, value, cipher=None):
+    return PREFIX + base64.b64encode(seal(user_id, value.encode('utf-8'), cipher)).decode('ascii')
+
+
+def decrypt_value(user_id, value, cipher=None):
+    if not is_encrypted(value):
+        return value
+    return unseal(user_id, base64.b64decode(value[len(PREFIX):]), cipher).decode('utf-8')
+
+
+def encrypt_values(user_id, values):
+    """Seal values for one user, honouring their encrypt_passwords setting."""
+    if not encryption_enabled(user_id):
+        return list(values)
+    cipher = cipher_for(user_id)
+    return [value if not value or is_encrypted(value) else encrypt(user_id, value, cipher) for value in values]
+
+
+def encrypt_value(user_id, value):
+    return encrypt_values(user_id, [value])[0]
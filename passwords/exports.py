@@ -0,0 +1,198 @@
+# exports.py
+"""
+Streaming, passphrase-encrypted vault exports.
+
+Passwords, bills and document metadata are read with iterator() querysets,
+rendered as JSON Lines or CSV and encrypted as they go, so an export of
+any size holds one queryset chunk and one segment in memory.
+
+File format (all integers big-endian):
+
+    header   b'EEX1' | salt (16) | log2(N), r, p (1 byte each) | nonce prefix (7)
+    segment  length (4) | AES-GCM(plaintext) with the header as associated data
+
+The key is scrypt(passphrase, salt). Segment nonces are the prefix, a 4-byte
+counter and a flag byte that is 1 only on the last segment, so a truncated
+or reordered file fails to decrypt instead of looking complete.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .encryption import cipher_for, decrypt_value
+
+MAGIC = b'EEX1'
+SALT_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+HEADER_SIZE = len(MAGIC) + SALT_SIZE + 3 + NONCE_PREFIX_SIZE
+SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P = 15, 8, 1
+# Caps on the untrusted header's scrypt parameters (1 GiB, a few seconds at most)
+MAX_SCRYPT_LOG_N, MAX_SCRYPT_R, MAX_SCRYPT_P = 20, 8, 4
+SEGMENT_SIZE = 64 * 1024
+EXPORT_CHUNK_SIZE = 500
+FORMATS = ('jsonl', 'csv')
+
+CSV_COLUMNS = (
+    'type', 'name', 'username', 'password', 'website_url', 'notes', 'category',
+    'amount', 'due_date', 'is_paid', 'description', 'file_name', 'file_type', 'file_size',
+    'expiry_date', 'created_at',
+)
+
+
+class ExportDecryptionError(Exception):
+    pass
+
+
+def derive_key(passphrase, salt, log_n=SCRYPT_LOG_N, r=SCRYPT_R, p=SCRYPT_P):
+    n = 1 << log_n
+    return hashlib.scrypt(passphrase.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n, dklen=32)
+
+
+def _nonce(prefix, counter, last):
+    return prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+
+class ExportEncryptor:
+    """Buffers plaintext into SEGMENT_SIZE pieces and seals each one."""
+
+    def __init__(self, passphrase):
+        salt = os.urandom(SALT_SIZE)
+        self._prefix = os.urandom(NONCE_PREFIX_SIZE)
+        self.header = MAGIC + salt + bytes((SCRYPT_LOG_N, SCRYPT_R, SCRYPT_P)) + self._prefix
+        self._cipher = AESGCM(derive_key(passphrase, salt))
+        self._buffer = bytearray()
+        self._counter = 0
+
+    def _segment(self, data, last):
+        sealed = self._cipher.encrypt(_nonce(self._prefix, self._counter, last), bytes(data), self.header)
+        self._counter += 1
+        return struct.pack('>I', len(sealed)) + sealed
+
+    def update(self, data):
+        self._buffer += data
+        out = []
+        # Keep at least one byte back so finalize() always has a last segment to mark
+        while len(self._buffer) > SEGMENT_SIZE:
+            out.append(self._segment(self._buffer[:SEGMENT_SIZE], last=False))
+            del self._buffer[:SEGMENT_SIZE]
+        return b''.join(out)
+
+    def finalize(self):
+        segment = self._segment(self._buffer, last=True)
+        self._buffer = bytearray()
+        return segment
+
+
+def decrypt_export(fileobj, passphrase):
+    """Yield the plaintext of an export file, segment by segment."""
+    header = fileobj.read(HEADER_SIZE)
+    if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+        raise ExportDecryptionError('Not an EncryptEase export')
+    salt = header[len(MAGIC):len(MAGIC) + SALT_SIZE]
+    log_n, r, p = header[len(MAGIC) + SALT_SIZE:len(MAGIC) + SALT_SIZE + 3]
+    if not (1 <= log_n <= MAX_SCRYPT_LOG_N and 1 <= r <= MAX_SCRYPT_R and 1 <= p <= MAX_SCRYPT_P):
+        raise ExportDecryptionError('Unsupported key derivation parameters')
+    prefix = header[-NONCE_PREFIX_SIZE:]
+    cipher = AESGCM(derive_key(passphrase, salt, log_n, r, p))
+
+    counter = 0
+    while True:
+        length = fileobj.read(4)
+        if len(length) != 4:
+            raise ExportDecryptionError('Export is truncated')
+        size = struct.unpack('>I', length)[0]
+        if size > SEGMENT_SIZE + 16:
+            raise ExportDecryptionError('Wrong passphrase or corrupted export')
+        sealed = fileobj.read(size)
+        for last in (False, True):
+            try:
+                plaintext = cipher.decrypt(_nonce(prefix, counter, last), sealed, header)
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise ExportDecryptionError('Wrong passphrase or corrupted export')
+        counter += 1
+        yield plaintext
+        if last:
+            if fileobj.read(1):
+                raise ExportDecryptionError('Unexpected data after the last segment')
+            return
+
+
+def iter_records(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """(type, fields) for every live item in the user's vault, read a chunk at a time."""
+    from bills.models import Bill
+    from documents.models import Document
+    from .models import Password
+
+    cipher = None
+
+    def reveal(value):
+        nonlocal cipher
+        if not value:
+            return value
+        cipher = cipher or cipher_for(user.pk)
+        return decrypt_value(user.pk, value, cipher)
+
+    passwords = (Password.objects.filter(user=user, is_deleted=False).order_by('pk')
+                 .values('name', 'username', 'password_value', 'website_url', 'notes', 'category', 'created_at'))
+    for row in passwords.iterator(chunk_size=chunk_size):
+        row['password'] = reveal(row.pop('password_value'))
+        yield 'password', row
+
+    bills = (Bill.objects.filter(user=user, is_deleted=False).order_by('pk')
+             .values('name', 'amount', 'due_date', 'is_paid', 'category', 'notes', 'website_url',
+                     'username', 'password_value', 'created_at'))
+    for row in bills.iterator(chunk_size=chunk_size):
+        row['password'] = reveal(row.pop('password_value'))
+        yield 'bill', row
+
+    # Metadata only; the files themselves stay in storage
+    documents = (Document.objects.filter(user=user, is_deleted=False).order_by('pk')
+                 .values('title', 'description', 'file', 'file_type', 'file_size', 'expiry_date', 'upload_date'))
+    for row in documents.iterator(chunk_size=chunk_size):
+        yield 'document', {
+            'name': row['title'],
+            'description': row['description'],
+            'file_name': os.path.basename(row['file'] or ''),
+            'file_type': row['file_type'],
+            'file_size': row['file_size'],
+            'expiry_date': row['expiry_date'],
+            'created_at': row['upload_date'],
+        }
+
+
+def render_jsonl(records):
+    for kind, fields in records:
+        yield (json.dumps({'type': kind, **fields}, default=str) + '\n').encode('utf-8')
+
+
+def render_csv(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for kind, fields in records:
+        writer.writerow({'type': kind, **fields})
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def stream_export(user, fmt, passphrase):
+    """Encrypted export bytes for ``user``, produced incrementally."""
+    render = render_csv if fmt == 'csv' else render_jsonl
+    encryptor = ExportEncryptor(passphrase)
+    yield encryptor.header
+    for data in render(iter_records(user)):
+        sealed = encryptor.update(data)
+        if sealed:
+            yield sealed
+    yield encryptor.finalize()
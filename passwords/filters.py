@@ -0,0 +1,16 @@
+# filters.py
+from django.db.models import F
+from rest_framework import filters
+
+
+class NullsLastOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that sorts never-set values last in both directions, like "never used"."""
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        return queryset.order_by(*[
+            F(field[1:]).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in ordering
+        ])
@@ -0,0 +1,133 @@
+# history.py
+"""
+Password version history.
+
+Versions are reverse deltas: the Password row is always the newest state,
+and each PasswordVersion says how to get from the state after an update
+back to the one it replaced. Only changed fields are stored, as copy ranges
+into the newer text plus the text that differs, zlib-compressed and sealed
+with the owner's data key, so a history grows with the bytes that changed
+rather than with row copies. Pruning to the retention count just deletes
+the oldest versions; nothing else needs rewriting.
+
+Each version's sealed payload also carries a digest of the state it
+applies to. Edits that bypass the API (the admin, raw ORM saves) aren't
+recorded, and the digest turns the broken chain into HistoryUnavailable
+instead of garbage. Sitting under the data key rather than SECRET_KEY, it
+survives a SECRET_KEY rotation. Versions saved before that change keep a
+SECRET_KEY HMAC in base_digest, checked against SECRET_KEY_FALLBACKS too.
+
+record_version() must run in the same transaction as the save it
+describes, with the Password row locked; PasswordSerializer.update does so.
+"""
+import hashlib
+import json
+import zlib
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.crypto import salted_hmac
+
+from .encryption import decrypt_value, seal, unseal
+
+TRACKED_FIELDS = ('name', 'username', 'password_value', 'website_url', 'notes')
+DIGEST_SIZE = 16
+PAYLOAD_VERSION = b'\x01'  # Then the digest, then the zlib-compressed delta
+
+
+class HistoryUnavailable(Exception):
+    pass
+
+
+def current_state(password):
+    state = {field: getattr(password, field) for field in TRACKED_FIELDS}
+    state['password_value'] = decrypt_value(password.user_id, state['password_value'])
+    return state
+
+
+def state_digest(state):
+    # Unkeyed, so only ever stored inside the sealed payload
+    raw = json.dumps(state, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).digest()[:DIGEST_SIZE]
+
+
+def legacy_state_digests(state):
+    raw = json.dumps(state, sort_keys=True)
+    return [
+        salted_hmac('passwords.history.state', raw, secret=secret, algorithm='sha256').digest()[:DIGEST_SIZE]
+        for secret in [settings.SECRET_KEY, *getattr(settings, 'SECRET_KEY_FALLBACKS', [])]
+    ]
+
+
+def diff_text(newer, older):
+    """Ops rebuilding ``older`` from ``newer``: [start, end] copies newer[start:end], a string is literal."""
+    if older is None:
+        return None
+    if not newer:
+        return [older]
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, newer, older, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(older[j1:j2])
+    return ops
+
+
+def apply_text(newer, ops):
+    if ops is None:
+        return None
+    return ''.join(newer[op[0]:op[1]] if isinstance(op, list) else op for op in ops)
+
+
+def record_version(password, changes):
+    """
+    Keep the entry's current state as a version before ``changes`` (plaintext
+    field values, as validated by the serializer) are saved over it.
+    """
+    from .models import PasswordVersion
+
+    older = current_state(password)
+    newer = {**older, **{field: changes[field] for field in TRACKED_FIELDS if field in changes}}
+    delta = {field: diff_text(newer[field], older[field]) for field in TRACKED_FIELDS if newer[field] != older[field]}
+    if not delta:
+        return None
+
+    payload = PAYLOAD_VERSION + state_digest(newer) + zlib.compress(
+        json.dumps(delta, separators=(',', ':')).encode('utf-8'))
+    with transaction.atomic():
+        last = password.versions.order_by('-number').values_list('number', flat=True).first() or 0
+        version = PasswordVersion.objects.create(
+            password=password,
+            number=last + 1,
+            changed_fields=sorted(delta),
+            delta=seal(password.user_id, payload),
+            base_digest=b'',
+        )
+        retention = getattr(settings, 'PASSWORD_HISTORY_RETENTION', 20)
+        password.versions.filter(number__lte=version.number - retention).delete()
+    return version
+
+
+def reconstruct(password, number):
+    """Plaintext tracked fields of ``password`` as they were before update ``number``."""
+    versions = list(password.versions.filter(number__gte=number).order_by('-number'))
+    if not versions or versions[-1].number != number:
+        raise password.versions.model.DoesNotExist(f'No version {number}')
+
+    state = current_state(password)
+    for version in versions:
+        payload = unseal(password.user_id, version.delta)
+        if payload[:1] == PAYLOAD_VERSION:
+            matches = payload[1:DIGEST_SIZE + 1] == state_digest(state)
+            payload = payload[DIGEST_SIZE + 1:]
+        else:
+            # Bare zlib stream, from before the digest moved inside
+            matches = bytes(version.base_digest) in legacy_state_digests(state)
+        delta = json.loads(zlib.decompress(payload))
+        if not matches:
+            raise HistoryUnavailable('The entry was changed outside the app after this version was saved')
+        for field, ops in delta.items():
+            state[field] = apply_text(state[field], ops)
+    return state
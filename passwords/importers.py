@@ -0,0 +1,235 @@
+# importers.py
+"""
+Streaming import of password manager exports.
+
+Uploads are read an entry at a time (CSV rows, JSON Lines, or the objects of
+a JSON array), so memory stays flat however many entries the file holds.
+Entries are validated with PasswordSerializer, categorized a chunk at a time
+with one batched model call and written with bulk_create.
+"""
+import codecs
+import csv
+import io
+import json
+from collections import Counter
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Password
+from .serializers import PasswordSerializer
+from .reuse import index_passwords
+from .encryption import encrypt_values
+from .public_suffix import registrable_domain
+
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+# Column names used by common exports (Chrome, Firefox, Bitwarden, LastPass, 1Password)
+FIELD_ALIASES = {
+    'name': ['name', 'title'],
+    'username': ['username', 'login_username', 'user', 'email'],
+    'password_value': ['password', 'login_password', 'password_value'],
+    'website_url': ['url', 'login_uri', 'website', 'website_url', 'uri'],
+    'notes': ['notes', 'note', 'extra', 'comments'],
+}
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def normalize_entry(raw):
+    """Map one exported entry onto PasswordSerializer fields."""
+    if not isinstance(raw, dict):
+        return {}
+    row = {str(key).strip().lower(): value for key, value in raw.items()}
+
+    # Bitwarden JSON nests credentials under "login"
+    login = row.get('login')
+    if isinstance(login, dict):
+        uris = login.get('uris') or []
+        row.setdefault('username', login.get('username'))
+        row.setdefault('password', login.get('password'))
+        if uris and isinstance(uris[0], dict):
+            row.setdefault('url', uris[0].get('uri'))
+
+    entry = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = row.get(alias)
+            if value not in (None, ''):
+                entry[field] = str(value)
+                break
+
+    if 'name' not in entry:
+        # Chrome/Firefox rows often have no title; fall back to the site
+        entry['name'] = entry.get('website_url') or entry.get('username') or 'Imported entry'
+    return entry
+
+
+def iter_csv(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def iter_json_lines(fileobj):
+    for line in codecs.getreader('utf-8-sig')(fileobj):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ImportFormatError(f"Invalid JSON line: {e}")
+
+
+def iter_json_array(fileobj, chunk_size=64 * 1024):
+    """
+    Yield the objects of a JSON array one at a time.
+
+    Accepts a bare array or an object with an "items" array (Bitwarden). Only
+    one entry plus one read chunk is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    reader = codecs.getreader('utf-8-sig')(fileobj)
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError as e:
+                if eof:
+                    raise ImportFormatError(f"Invalid JSON: {e}")
+                # The value runs past the end of the buffer
+                fill()
+                continue
+            if end >= len(buffer) and not eof:
+                # A number could carry on into the next chunk
+                fill()
+                continue
+            pos = end
+            return value
+
+    # Find the opening bracket of the entry array
+    skip(' \t\r\n')
+    if pos < len(buffer) and buffer[pos] == '{':
+        # Walk the top-level keys; "items" inside some earlier value doesn't count
+        pos += 1
+        while True:
+            skip(' \t\r\n,')
+            if pos >= len(buffer) or buffer[pos] == '}':
+                raise ImportFormatError('JSON object has no "items" array')
+            key = decode()
+            skip(' \t\r\n')
+            if pos >= len(buffer) or buffer[pos] != ':':
+                raise ImportFormatError('Invalid JSON object')
+            pos += 1
+            skip(' \t\r\n')
+            if key == 'items':
+                break
+            decode()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ImportFormatError('Expected a JSON array of entries')
+    pos += 1
+
+    while True:
+        skip(' \t\r\n,')
+        if pos >= len(buffer):
+            raise ImportFormatError('Unterminated JSON array')
+        if buffer[pos] == ']':
+            return
+        yield decode()
+
+
+def detect_format(uploaded_file, requested=None):
+    fmt = (requested or '').lower()
+    if not fmt:
+        name = (uploaded_file.name or '').lower()
+        fmt = name.rsplit('.', 1)[-1] if '.' in name else ''
+    if fmt in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if fmt in ('csv', 'json'):
+        return fmt
+    raise ImportFormatError('Unsupported format; upload a .csv, .json or .jsonl export')
+
+
+def iter_entries(uploaded_file, fmt):
+    if fmt == 'csv':
+        return iter_csv(uploaded_file)
+    if fmt == 'jsonl':
+        return iter_json_lines(uploaded_file)
+    return iter_json_array(uploaded_file)
+
+
+def import_passwords(user, uploaded_file, fmt=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Import an export file for ``user`` and return a summary dict."""
+    fmt = detect_format(uploaded_file, fmt)
+    # One serializer validates every row; building one per row costs more than the row
+    validator = PasswordSerializer()
+    summary = {'format': fmt, 'rows': 0, 'imported': 0, 'pending': 0, 'skipped': 0, 'errors': []}
+    categories = Counter()
+    chunk = []
+
+    def flush():
+        validator.assign_categories(chunk)
+        sealed = encrypt_values(user.pk, [password.password_value for password in chunk])
+        for password, value in zip(chunk, sealed):
+            password.password_value = value
+            password.domain = registrable_domain(password.website_url)
+        with transaction.atomic():
+            Password.objects.bulk_create(chunk, batch_size=chunk_size)
+            # bulk_create skips post_save, so fingerprint the chunk here
+            index_passwords(chunk)
+        for password in chunk:
+            if password.category_status == Password.CATEGORY_PENDING:
+                summary['pending'] += 1
+            else:
+                categories[password.category] += 1
+        summary['imported'] += len(chunk)
+        chunk.clear()
+
+    try:
+        for row_number, raw in enumerate(iter_entries(uploaded_file, fmt), start=1):
+            summary['rows'] = row_number
+            try:
+                validated = validator.run_validation(normalize_entry(raw))
+            except serializers.ValidationError as e:
+                summary['skipped'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'row': row_number, 'errors': e.detail})
+                continue
+
+            chunk.append(Password(user=user, **validated))
+            if len(chunk) >= chunk_size:
+                flush()
+    except (ImportFormatError, csv.Error, UnicodeDecodeError) as e:
+        # Keep what was read before the file went bad
+        summary['error'] = str(e)
+
+    if chunk:
+        flush()
+    summary['categories'] = dict(categories)
+    return summary
@@ -0,0 +1,120 @@
+# inference.py
+"""
+Client and server for the shared categorization daemon.
+
+Workers send newline-delimited JSON over a Unix socket:
+
+    {"texts": ["Netflix my streaming login", ...]}
+
+and get back one category per text:
+
+    {"categories": ["ENTERTAINMENT", ...]}
+
+The daemon (``manage.py run_inference_server``) holds the only copy of the
+model on the box, so gunicorn workers no longer load it themselves.
+"""
+import json
+import logging
+import math
+import os
+import socket
+import socketserver
+import time
+
+from django.conf import settings
+
+from .batching import classify_texts
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(Exception):
+    """The daemon could not answer in time (not running, slow or broken)."""
+
+
+def socket_path():
+    return getattr(settings, 'PASSWORD_INFERENCE_SOCKET', None)
+
+
+def is_enabled():
+    return bool(socket_path())
+
+
+def remaining(deadline):
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise socket.timeout('Inference deadline passed')
+    return left
+
+
+def read_line(sock, deadline):
+    chunks = []
+    while True:
+        sock.settimeout(remaining(deadline))
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if b'\n' in chunk:
+            break
+    return b''.join(chunks).split(b'\n', 1)[0]
+
+
+def classify_many(texts, timeout=None):
+    if timeout is None:
+        # Allow one timeout per forward pass the daemon will need for a bulk request
+        batches = math.ceil(len(texts) / getattr(settings, 'PASSWORD_BATCH_MAX_SIZE', 16)) or 1
+        timeout = getattr(settings, 'PASSWORD_INFERENCE_TIMEOUT', 0.5) * batches
+
+    payload = json.dumps({'texts': list(texts)}).encode() + b'\n'
+    deadline = time.monotonic() + timeout
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # settimeout() bounds each call, so re-arm it with what's left of the
+            # one deadline covering connect, send and the model's forward pass
+            sock.settimeout(remaining(deadline))
+            sock.connect(socket_path())
+            sock.settimeout(remaining(deadline))
+            sock.sendall(payload)
+            line = read_line(sock, deadline)
+        response = json.loads(line)
+        categories = response['categories']
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise InferenceUnavailable(str(e)) from e
+
+    if len(categories) != len(texts):
+        raise InferenceUnavailable("Daemon returned the wrong number of categories")
+    return categories
+
+
+def classify(text, timeout=None):
+    return classify_many([text], timeout=timeout)[0]
+
+
+class InferenceRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                texts = json.loads(line)['texts']
+                # Strict, so a timed-out batch is an error the client falls back on, not OTHER
+                response = {'categories': classify_texts(texts, strict=True)}
+            except Exception as e:
+                logger.exception("Inference request failed")
+                response = {'error': str(e)}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, handler_class=InferenceRequestHandler):
+        # Clear a socket left behind by a previous run
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, handler_class)
+        os.chmod(path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
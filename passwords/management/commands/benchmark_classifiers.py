@@ -0,0 +1,47 @@
+import json
+import statistics
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from passwords.classifiers import BACKENDS, load_backend, predict_categories, registry
+
+DEFAULT_SAMPLES = Path(__file__).resolve().parents[2] / 'benchmarks' / 'category_samples.json'
+
+class Command(BaseCommand):
+    help = 'Compares accuracy and latency of the password categorization backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+        parser.add_argument('--samples', default=str(DEFAULT_SAMPLES), help='JSON list of {name, notes, category}')
+
+    def handle(self, *args, **options):
+        try:
+            samples = json.loads(Path(options['samples']).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read samples: {e}')
+
+        texts = [f"{sample['name']} {sample['notes']}" for sample in samples]
+        expected = [sample['category'] for sample in samples]
+
+        for backend in options['backends']:
+            load_backend(backend)
+            load_stats = registry.stats()[backend]
+
+            latencies = []
+            predicted = []
+            for text in texts:
+                started = time.perf_counter()
+                predicted.extend(predict_categories([text], backend=backend))
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            predict_categories(texts, backend=backend)
+            batch_ms = (time.perf_counter() - started) * 1000
+
+            correct = sum(p == e for p, e in zip(predicted, expected))
+            latencies.sort()
+            self.stdout.write(self.style.SUCCESS(backend))
+            self.stdout.write(f"  accuracy      {correct}/{len(samples)} ({correct / len(samples):.1%})")
+            self.stdout.write(f"  load          {load_stats['load_seconds']}s, +{load_stats['rss_delta_bytes'] / 2**20:.0f} MB rss")
+            self.stdout.write(f"  p50 / p95     {statistics.median(latencies):.1f} ms / {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms")
+            self.stdout.write(f"  batch of {len(texts):<4} {batch_ms:.1f} ms")
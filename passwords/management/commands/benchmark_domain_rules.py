@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from passwords.benchmarks.domains import generate_domain_infos
+from passwords.domain_rules import DOMAIN_INDEX, classify_linear
+
+class Command(BaseCommand):
+    help = 'Times the compiled domain rule index against the linear rule walk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        infos = generate_domain_infos(options['count'], seed=options['seed'])
+
+        started = time.perf_counter()
+        linear = [classify_linear(info) for info in infos]
+        linear_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed = [DOMAIN_INDEX.classify(info) for info in infos]
+        indexed_seconds = time.perf_counter() - started
+
+        mismatches = sum(a != b for a, b in zip(linear, indexed))
+        per_domain = lambda seconds: seconds / len(infos) * 1_000_000
+        self.stdout.write(f"{len(infos)} domains")
+        self.stdout.write(f"  linear rules  {linear_seconds:.3f}s ({per_domain(linear_seconds):.2f} µs/domain)")
+        self.stdout.write(f"  rule index    {indexed_seconds:.3f}s ({per_domain(indexed_seconds):.2f} µs/domain)")
+        self.stdout.write(f"  speedup       {linear_seconds / indexed_seconds:.1f}x")
+        style = self.style.SUCCESS if not mismatches else self.style.ERROR
+        self.stdout.write(style(f"  mismatches    {mismatches}"))
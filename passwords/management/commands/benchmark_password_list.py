@@ -0,0 +1,69 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+from passwords.encryption import cipher_for, decrypt_value, encrypt_values, key_cache
+from passwords.models import Password
+from passwords.views import PasswordViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Times GET /api/passwords/ over a plaintext vault and an encrypted one. Writes nothing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Entries per vault')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['count'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, count, repeat):
+        plain_user = User.objects.create_user(username='benchmark-plain')
+        sealed_user = User.objects.create_user(username='benchmark-sealed')
+        values = [f'benchmark-password-{i}' for i in range(count)]
+        sealed_values = encrypt_values(sealed_user.pk, values)
+        for user, stored in ((plain_user, values), (sealed_user, sealed_values)):
+            # bulk_create skips the fingerprint signal, which isn't under test
+            Password.objects.bulk_create(
+                [Password(user=user, name=f'Site {i}', password_value=value) for i, value in enumerate(stored)])
+
+        self.stdout.write(f"{count} entries per vault, best of {repeat}")
+        plain = self.time_list(plain_user, repeat)
+        key_cache.clear()
+        cold = self.time_list(sealed_user, 1)
+        sealed = self.time_list(sealed_user, repeat)
+
+        # The list timings are noisy next to a few µs per row; time the decrypt on its own too
+        cipher = cipher_for(sealed_user.pk)
+        started = time.perf_counter()
+        for value in sealed_values:
+            decrypt_value(sealed_user.pk, value, cipher)
+        decrypt_only = time.perf_counter() - started
+
+        per_row = lambda seconds: seconds / count * 1_000_000
+        self.stdout.write(f"  plaintext        {plain * 1000:.1f} ms")
+        self.stdout.write(f"  encrypted (cold) {cold * 1000:.1f} ms  (includes the key unwrap)")
+        self.stdout.write(f"  encrypted        {sealed * 1000:.1f} ms")
+        self.stdout.write(f"  overhead         {per_row(sealed - plain):.2f} µs/row")
+        self.stdout.write(self.style.SUCCESS(f"  decrypt only     {per_row(decrypt_only):.2f} µs/row"))
+
+    def time_list(self, user, repeat):
+        view = PasswordViewSet.as_view({'get': 'list'})
+        best = float('inf')
+        for _ in range(repeat):
+            request = APIRequestFactory().get('/api/passwords/')
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            view(request).render()
+            best = min(best, time.perf_counter() - started)
+        return best
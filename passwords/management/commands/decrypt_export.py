@@ -0,0 +1,28 @@
+import getpass
+import os
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from passwords.exports import ExportDecryptionError, decrypt_export
+
+
+class Command(BaseCommand):
+    help = 'Decrypts a vault export to stdout (or --output)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--output', help='Write here instead of stdout')
+        parser.add_argument('--passphrase-env', default='EXPORT_PASSPHRASE',
+                            help='Environment variable holding the passphrase; prompts when unset')
+
+    def handle(self, *args, **options):
+        passphrase = os.environ.get(options['passphrase_env']) or getpass.getpass('Export passphrase: ')
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            with open(options['path'], 'rb') as f:
+                for data in decrypt_export(f, passphrase):
+                    out.write(data)
+        except ExportDecryptionError as e:
+            raise CommandError(str(e))
+        finally:
+            if options['output']:
+                out.close()
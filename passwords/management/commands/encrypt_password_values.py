@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bills.models import Bill
+from passwords.encryption import PREFIX, encrypt_values
+from passwords.models import Password, SharedPassword
+
+# (model, owner field) for every column holding a password_value
+SEALED_MODELS = (
+    (Password, 'user_id'),
+    (SharedPassword, 'created_by_id'),
+    (Bill, 'user_id'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Seals password values saved before envelope encryption. Safe to re-run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model, owner in SEALED_MODELS:
+            rows = (model.objects
+                    .exclude(password_value__startswith=PREFIX)
+                    .exclude(password_value__isnull=True)
+                    .exclude(password_value='')
+                    .order_by(owner, 'pk')
+                    .values_list('pk', owner, 'password_value')
+                    .iterator(chunk_size=options['chunk_size']))
+
+            total = 0
+            chunk = []
+            for row in rows:
+                # Rows come grouped by owner, so each chunk has one user
+                if chunk and (row[1] != chunk[0][1] or len(chunk) >= options['chunk_size']):
+                    total += self.seal(model, chunk)
+                    chunk = []
+                chunk.append(row)
+            if chunk:
+                total += self.seal(model, chunk)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: sealed {total} values"))
+
+    def seal(self, model, chunk):
+        sealed = encrypt_values(chunk[0][1], [value for _, _, value in chunk])
+        # Users with encrypt_passwords off keep plaintext
+        updates = [model(pk=pk, password_value=new) for (pk, _, old), new in zip(chunk, sealed) if new != old]
+        if updates:
+            with transaction.atomic():
+                model.objects.bulk_update(updates, ['password_value'])
+        return len(updates)
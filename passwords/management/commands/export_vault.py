@@ -0,0 +1,30 @@
+import getpass
+import os
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from passwords.exports import FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Writes a user's encrypted vault export to a file, as the export endpoint would stream it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('output')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--passphrase-env', default='EXPORT_PASSPHRASE',
+                            help='Environment variable holding the passphrase; prompts when unset')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']}")
+        passphrase = os.environ.get(options['passphrase_env']) or getpass.getpass('Export passphrase: ')
+
+        size = 0
+        with open(options['output'], 'wb') as f:
+            for data in stream_export(user, options['format'], passphrase):
+                f.write(data)
+                size += len(data)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}"))
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from passwords.usage import get_tracker
+
+
+class Command(BaseCommand):
+    help = "Writes buffered password usage to the database (the shared Redis buffer, or this process's own)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help='Keep flushing every N seconds')
+
+    def handle(self, *args, **options):
+        tracker = get_tracker()
+        while True:
+            flushed = tracker.flush()
+            self.stdout.write(f"Flushed usage for {flushed} passwords")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from passwords.models import Password
+from passwords.reuse import index_passwords
+
+class Command(BaseCommand):
+    help = 'Builds reuse fingerprints for passwords saved before the index existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help='Rebuild every fingerprint, not only missing ones (needed once after upgrading '
+                                 'from SECRET_KEY-keyed fingerprints, or after changing PASSWORD_MASTER_KEY)')
+
+    def handle(self, *args, **options):
+        passwords = Password.objects.only('id', 'user_id', 'password_value').order_by('pk')
+        if not options['all']:
+            passwords = passwords.filter(fingerprint__isnull=True)
+
+        chunk, total = [], 0
+        for password in passwords.iterator(chunk_size=options['chunk_size']):
+            chunk.append(password)
+            if len(chunk) >= options['chunk_size']:
+                index_passwords(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            index_passwords(chunk)
+            total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} passwords"))
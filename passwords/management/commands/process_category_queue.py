@@ -0,0 +1,73 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from passwords.models import Password
+from passwords.serializers import PasswordSerializer
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = ('Categorizes passwords saved with a pending category. Entries the model fails on stay pending '
+            'and are retried up to PASSWORD_CATEGORY_MAX_ATTEMPTS times, then marked ready as OTHER.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=32)
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        serializer = PasswordSerializer()
+        while True:
+            processed = self.process_batch(serializer, options['batch_size'])
+            if processed:
+                self.stdout.write(f"Categorized {processed} passwords")
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
+
+    def claim_batch(self, batch_size):
+        """Lease a batch to this worker; the row locks last only as long as the claim."""
+        now = timezone.now()
+        with transaction.atomic():
+            # skip_locked lets several workers drain the queue side by side
+            batch = list(
+                Password.objects.select_for_update(skip_locked=True)
+                .filter(category_status=Password.CATEGORY_PENDING,
+                        category_attempts__lt=getattr(settings, 'PASSWORD_CATEGORY_MAX_ATTEMPTS', 5))
+                .filter(Q(category_claimed_until__isnull=True) | Q(category_claimed_until__lt=now))
+                .order_by('created_at')[:batch_size]
+            )
+            lease = now + timedelta(seconds=getattr(settings, 'PASSWORD_CATEGORY_LEASE_SECONDS', 300))
+            Password.objects.filter(pk__in=[password.pk for password in batch]).update(category_claimed_until=lease)
+        return batch
+
+    def process_batch(self, serializer, batch_size):
+        batch = self.claim_batch(batch_size)
+        if not batch:
+            return 0
+
+        # The model runs with no transaction open, so edits to these rows don't wait on it
+        try:
+            categories = serializer.predict_categories(batch, strict=True)
+        except Exception:
+            logger.warning("Categorizing %d queued passwords failed; leaving them pending", len(batch), exc_info=True)
+            Password.objects.filter(pk__in=[password.pk for password in batch]).update(
+                category_attempts=F('category_attempts') + 1, category_claimed_until=None)
+            # Out of retries: settle on OTHER so clients polling /category/ see them finish
+            Password.objects.filter(
+                category_status=Password.CATEGORY_PENDING,
+                category_attempts__gte=getattr(settings, 'PASSWORD_CATEGORY_MAX_ATTEMPTS', 5),
+            ).update(category='OTHER', category_status=Password.CATEGORY_READY)
+            return 0
+
+        for password, category in zip(batch, categories):
+            # Only rows still waiting; the owner may have deleted or re-saved one meanwhile
+            Password.objects.filter(pk=password.pk, category_status=Password.CATEGORY_PENDING).update(
+                category=category, category_status=Password.CATEGORY_READY, category_claimed_until=None)
+        return len(batch)
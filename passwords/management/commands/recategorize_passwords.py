@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from passwords.models import Password
+from passwords.serializers import PasswordSerializer
+
+FIELDS = ('id', 'name', 'website_url', 'notes', 'category')
+
+
+def _init_worker():
+    # Needed under the spawn start method; a no-op after fork
+    import django
+    django.setup()
+    # A forked child inherits the parent's open DB sockets; drop them unclosed
+    # (closing would end the parent's session) so the child opens its own
+    for connection in connections.all(initialized_only=True):
+        connection.connection = None
+
+
+def classify_rows(rows):
+    """Current category for each (name, website_url, notes) row, bypassing the result cache."""
+    serializer = PasswordSerializer()
+    features = [
+        serializer.build_features(Password(name=name, website_url=url, notes=notes))
+        for name, url, notes in rows
+    ]
+    # Strict: a model failure must not come back as OTHER and overwrite real categories
+    return serializer.classify_passwords(features, strict=True)
+
+
+class Command(BaseCommand):
+    help = ('Re-runs the current rules and classifier over every password. '
+            'Bump PASSWORD_CATEGORY_CACHE_VERSION alongside rule or model changes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=1, help='Classifier processes (1 runs in-process)')
+        parser.add_argument('--dry-run', action='store_true', help='Print changes without writing them')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last checkpointed id')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, '.recategorize_checkpoint'))
+
+    def handle(self, *args, **options):
+        self.options = options
+        last_id = self.read_checkpoint() if options['resume'] else 0
+        if last_id:
+            self.stdout.write(f"Resuming after id {last_id}")
+
+        rows = (Password.objects
+                .filter(pk__gt=last_id)
+                .exclude(category_status=Password.CATEGORY_PENDING)
+                .order_by('pk')
+                .values_list(*FIELDS)
+                .iterator(chunk_size=options['chunk_size']))
+
+        self.seen = self.changed = 0
+        self.started = time.perf_counter()
+
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                in_flight = deque()
+                for chunk in self.chunks(rows):
+                    in_flight.append((chunk, pool.submit(classify_rows, [row[1:4] for row in chunk])))
+                    # Bound the read-ahead so memory stays flat
+                    if len(in_flight) >= options['workers'] * 2:
+                        chunk, future = in_flight.popleft()
+                        self.apply(chunk, self.categories(chunk, future.result))
+                while in_flight:
+                    chunk, future = in_flight.popleft()
+                    self.apply(chunk, self.categories(chunk, future.result))
+        else:
+            for chunk in self.chunks(rows):
+                self.apply(chunk, self.categories(chunk, lambda: classify_rows([row[1:4] for row in chunk])))
+
+        elapsed = time.perf_counter() - self.started
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.seen} passwords checked, {self.changed} {verb} "
+            f"in {elapsed:.1f}s ({self.seen / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
+        if not options['dry_run'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+    def chunks(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.options['chunk_size']:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def categories(self, chunk, classify):
+        try:
+            return classify()
+        except Exception as e:
+            # Stop before this chunk is written or checkpointed, so --resume retries it
+            raise CommandError(
+                f"Classifying ids {chunk[0][0]}-{chunk[-1][0]} failed ({e}); "
+                f"{self.changed} changes before them are saved, rerun with --resume"
+            ) from e
+
+    def apply(self, chunk, categories):
+        updates = []
+        for (pk, name, _, _, old), new in zip(chunk, categories):
+            if new != old:
+                updates.append(Password(pk=pk, category=new))
+                if self.options['dry_run']:
+                    self.stdout.write(f"{pk}\t{name}\t{old} -> {new}")
+
+        if updates and not self.options['dry_run']:
+            with transaction.atomic():
+                Password.objects.bulk_update(updates, ['category'], batch_size=self.options['chunk_size'])
+        if not self.options['dry_run']:
+            self.write_checkpoint(chunk[-1][0])
+
+        self.seen += len(chunk)
+        self.changed += len(updates)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f"  ...{self.seen} rows ({self.seen / elapsed if elapsed else 0:.0f} rows/s)")
+
+    def read_checkpoint(self):
+        try:
+            with open(self.options['checkpoint']) as f:
+                return json.load(f)['last_id']
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def write_checkpoint(self, last_id):
+        with open(self.options['checkpoint'], 'w') as f:
+            json.dump({'last_id': last_id}, f)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from passwords.classifiers import current_backend, load_backend, registry
+from passwords.inference import InferenceServer
+
+class Command(BaseCommand):
+    help = 'Serves password categorization to all workers over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=None, help='Socket path (defaults to PASSWORD_INFERENCE_SOCKET)')
+
+    def handle(self, *args, **options):
+        path = options['socket'] or getattr(settings, 'PASSWORD_INFERENCE_SOCKET', None)
+        if not path:
+            raise CommandError('Set PASSWORD_INFERENCE_SOCKET or pass --socket')
+
+        # Load the model before accepting connections so the first caller doesn't time out
+        load_backend()
+        stats = registry.stats()[current_backend()]
+        self.stdout.write(
+            f"{current_backend()} model loaded in {stats['load_seconds']}s "
+            f"(rss {stats['rss_bytes'] / 2**20:.0f} MB)"
+        )
+
+        server = InferenceServer(path)
+        self.stdout.write(self.style.SUCCESS(f'Listening on {path}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,59 @@
+import os
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from passwords.classifiers import features_to_document
+from passwords.models import Password
+from passwords.serializers import PasswordSerializer
+
+class Command(BaseCommand):
+    help = 'Trains the TF-IDF + linear category model from existing vault entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Model path (defaults to PASSWORD_SKLEARN_MODEL_PATH)')
+        parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of rows kept back to report accuracy')
+
+    def handle(self, *args, **options):
+        import joblib
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import train_test_split
+        from sklearn.pipeline import make_pipeline
+
+        output = options['output'] or settings.PASSWORD_SKLEARN_MODEL_PATH
+        serializer = PasswordSerializer()
+
+        documents, labels = [], []
+        rows = (Password.objects.filter(is_deleted=False)
+                .exclude(category='OTHER')
+                .only('name', 'website_url', 'notes', 'category'))
+        for password in rows.iterator(chunk_size=2000):
+            documents.append(features_to_document(serializer.build_features(password)))
+            labels.append(password.category)
+
+        counts = Counter(labels)
+        if len(counts) < 2:
+            raise CommandError('Need entries in at least two categories to train')
+        self.stdout.write(f"Training on {len(labels)} entries: {dict(counts)}")
+
+        def build():
+            return make_pipeline(
+                TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1),
+                LogisticRegression(max_iter=1000, class_weight='balanced'),
+            )
+
+        # Only hold rows back when every category can spare some
+        if options['holdout'] > 0 and min(counts.values()) >= 2 and len(labels) * options['holdout'] >= len(counts):
+            train_x, test_x, train_y, test_y = train_test_split(
+                documents, labels, test_size=options['holdout'], stratify=labels, random_state=0
+            )
+            score = build().fit(train_x, train_y).score(test_x, test_y)
+            self.stdout.write(f"Holdout accuracy: {score:.1%} on {len(test_y)} entries")
+
+        model = build().fit(documents, labels)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        # Write then rename so workers never load a half-written file
+        tmp_path = f"{output}.tmp"
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, output)
+        self.stdout.write(self.style.SUCCESS(f"Saved model to {output}"))
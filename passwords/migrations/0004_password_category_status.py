@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0003_sharedpassword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='password',
+            name='category_status',
+            field=models.CharField(choices=[('READY', 'Ready'), ('PENDING', 'Pending')], db_index=True, default='READY', max_length=10),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 11:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0004_password_category_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasswordFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exact_hash', models.CharField(max_length=64)),
+                ('minhash', models.BinaryField()),
+                ('password', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='passwords.password')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='password_fingerprints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'exact_hash'], name='passwords_p_user_id_b94739_idx')],
+            },
+        ),
+    ]
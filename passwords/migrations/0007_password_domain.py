@@ -0,0 +1,125 @@
+# Generated by Django 5.2 on 2026-10-18 11:12
+
+import ipaddress
+import os
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copy of passwords.public_suffix as of this migration, so later
+# changes to that module can't break migrating from scratch.
+LIST_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'public_suffix_list.dat')
+TERMINAL = None
+RULE = 1
+EXCEPTION = 2
+
+
+def to_ascii(name):
+    if name.isascii():
+        return name
+    try:
+        return name.encode('idna').decode('ascii')
+    except UnicodeError:
+        return name
+
+
+def load_trie(path):
+    root = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('//'):
+                continue
+            rule, kind = line.split()[0], RULE
+            if rule.startswith('!'):
+                kind, rule = EXCEPTION, rule[1:]
+            node = root
+            for label in reversed(to_ascii(rule.lower()).split('.')):
+                node = node.setdefault(label, {})
+            node[TERMINAL] = kind
+    return root
+
+
+def suffix_length(root, labels):
+    length = 1
+    exception = None
+    nodes = [root]
+    for depth, label in enumerate(labels, start=1):
+        matched = []
+        for node in nodes:
+            for key in (label, '*'):
+                child = node.get(key)
+                if child is None:
+                    continue
+                matched.append(child)
+                kind = child.get(TERMINAL)
+                if kind == EXCEPTION:
+                    exception = depth - 1
+                elif kind == RULE:
+                    length = max(length, depth)
+        if not matched:
+            break
+        nodes = matched
+    return exception if exception is not None else length
+
+
+def registrable_domain(root, url):
+    if '://' not in url:
+        url = '//' + url
+    try:
+        host = urlsplit(url.strip()).hostname or ''
+    except ValueError:
+        return ''
+    if any(char.isspace() for char in host):
+        return ''
+    host = host.rstrip('.')
+    if not host:
+        return ''
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = to_ascii(host).split('.')
+    suffix = suffix_length(root, labels[::-1])
+    if len(labels) <= suffix:
+        return '.'.join(labels)
+    return '.'.join(labels[-(suffix + 1):])
+
+
+def fill_domains(apps, schema_editor):
+    Password = apps.get_model('passwords', 'Password')
+    root = None
+    rows = Password.objects.exclude(website_url__isnull=True).exclude(website_url='').only('id', 'website_url')
+    batch = []
+    for password in rows.iterator(chunk_size=1000):
+        if root is None:
+            root = load_trie(getattr(settings, 'PASSWORD_PUBLIC_SUFFIX_LIST', None) or LIST_PATH)
+        password.domain = registrable_domain(root, password.website_url)
+        batch.append(password)
+        if len(batch) >= 1000:
+            Password.objects.bulk_update(batch, ['domain'])
+            batch = []
+    if batch:
+        Password.objects.bulk_update(batch, ['domain'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0006_encrypted_password_values'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='password',
+            name='domain',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='password',
+            index=models.Index(fields=['user', 'domain'], name='passwords_p_user_id_a3365b_idx'),
+        ),
+        migrations.RunPython(fill_domains, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0007_password_domain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharedpassword',
+            name='one_time',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0008_sharedpassword_one_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasswordVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('changed_fields', models.JSONField(default=list)),
+                ('delta', models.BinaryField()),
+                ('base_digest', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('password', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='passwords.password')),
+            ],
+            options={
+                'ordering': ['-number'],
+                'constraints': [models.UniqueConstraint(fields=('password', 'number'), name='unique_password_version')],
+            },
+        ),
+    ]
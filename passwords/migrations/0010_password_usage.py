@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0009_passwordversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='password',
+            name='last_used_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='password',
+            name='use_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
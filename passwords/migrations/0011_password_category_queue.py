@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passwords', '0010_password_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='password',
+            name='category_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='password',
+            name='category_claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
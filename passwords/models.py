@@ -2,7 +2,24 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 import uuid
+from .public_suffix import registrable_domain
+
+class PasswordQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Bulk writes (bulk_update goes through here too) skip the signals that
+        # drop cached reuse reports, so invalidate for the affected owners here
+        from .reuse import REPORT_FIELDS, invalidate_report
+        if REPORT_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+        user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+        rows = super().update(**kwargs)
+        new_owner = kwargs.get('user_id', getattr(kwargs.get('user'), 'pk', None))
+        invalidate_report(user_ids | ({new_owner} if new_owner else set()))
+        return rows
+
 
 class Password(models.Model):
     CATEGORY_CHOICES = [
@@ -14,24 +31,50 @@ class Password(models.Model):
         ('SHOPPING', 'Online Shopping'),
         ('OTHER', 'Other'),
     ]
+    CATEGORY_READY = 'READY'
+    CATEGORY_PENDING = 'PENDING'
+    CATEGORY_STATUS_CHOICES = [
+        (CATEGORY_READY, 'Ready'),
+        (CATEGORY_PENDING, 'Pending'),
+    ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='passwords')
     name = models.CharField(max_length=255)
     username = models.CharField(max_length=255, blank=True, null=True)
-    password_value = models.CharField(max_length=500)
+    password_value = models.TextField()  # Sealed with the owner's data key, see encryption.py
     website_url = models.URLField(blank=True, null=True)
+    # Registrable domain (eTLD+1) of website_url, for autofill lookups
+    domain = models.CharField(max_length=255, blank=True, default='', editable=False)
     notes = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='OTHER')
+    category_status = models.CharField(max_length=10, choices=CATEGORY_STATUS_CHOICES, default=CATEGORY_READY, db_index=True)
+    # Queue bookkeeping for process_category_queue
+    category_attempts = models.PositiveSmallIntegerField(default=0)
+    category_claimed_until = models.DateTimeField(blank=True, null=True)
+    # Written behind in batches, see usage.py
+    use_count = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = PasswordQuerySet.as_manager()
     
     class Meta:
         ordering = ['name']
+        indexes = [models.Index(fields=['user', 'domain'])]
     
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        # bulk_create skips this; importers.py sets the domain itself
+        self.domain = registrable_domain(self.website_url)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'website_url' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'domain'}
+        super().save(*args, **kwargs)
     
     def soft_delete(self):
         self.is_deleted = True
@@ -50,7 +93,7 @@ class SharedPassword(models.Model):
     original_password = models.ForeignKey(Password, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     username = models.CharField(max_length=255, blank=True, null=True)
-    password_value = models.CharField(max_length=500)
+    password_value = models.TextField()  # Copied sealed from the original
     website_url = models.URLField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=20)
@@ -58,6 +101,54 @@ class SharedPassword(models.Model):
     expires_at = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
     viewed = models.BooleanField(default=False)
+    one_time = models.BooleanField(default=False)  # Only the first view shows the password
 
     def is_expired(self):
-        return timezone.now() > self.expires_at
\ No newline at end of file
+        return timezone.now() > self.expires_at
+
+
+class PasswordVersion(models.Model):
+    """A sealed reverse delta back to the state an update replaced, see history.py."""
+    password = models.ForeignKey(Password, on_delete=models.CASCADE, related_name='versions')
+    number = models.PositiveIntegerField()
+    changed_fields = models.JSONField(default=list)
+    delta = models.BinaryField()
+    base_digest = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [models.UniqueConstraint(fields=['password', 'number'], name='unique_password_version')]
+
+
+class DataKey(models.Model):
+    """A user's data key, wrapped with the master key."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='data_key')
+    wrapped_key = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class PasswordFingerprint(models.Model):
+    """Keyed hash and MinHash signature of a password_value, for reuse reports."""
+    password = models.OneToOneField(Password, on_delete=models.CASCADE, related_name='fingerprint')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='password_fingerprints')
+    exact_hash = models.CharField(max_length=64)
+    minhash = models.BinaryField()  # Packed MinHash signature, see reuse.py
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'exact_hash'])]
+
+
+@receiver(post_save, sender=Password)
+def update_password_fingerprint(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'password_value' not in update_fields:
+        return
+    from .reuse import index_passwords
+    index_passwords([instance])
+
+
+@receiver(post_delete, sender=Password)
+def forget_password_fingerprint(sender, instance, **kwargs):
+    # The fingerprint row cascades; only the cached report needs dropping
+    from .reuse import invalidate_report
+    invalidate_report([instance.user_id])
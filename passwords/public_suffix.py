@@ -0,0 +1,120 @@
+# public_suffix.py
+"""
+Registrable domains (eTLD+1) from the Public Suffix List.
+
+The list (ICANN and private sections) is compiled into a trie keyed by
+reversed labels the first time it is needed, so a lookup walks at most one
+branch per label of the hostname. ``mail.google.co.uk`` and
+``accounts.google.co.uk`` both come out as ``google.co.uk``, while
+``alice.github.io`` and ``bob.github.io`` stay apart.
+
+The bundled copy lives in data/public_suffix_list.dat; point
+PASSWORD_PUBLIC_SUFFIX_LIST at a fresher download to override it.
+"""
+import ipaddress
+import os
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+DEFAULT_LIST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'public_suffix_list.dat')
+
+TERMINAL = None  # Key holding a node's rule type; labels are always strings
+RULE = 1
+EXCEPTION = 2
+
+
+def to_ascii(name):
+    if name.isascii():
+        return name
+    try:
+        return name.encode('idna').decode('ascii')
+    except UnicodeError:
+        return name
+
+
+class PublicSuffixTrie:
+    def __init__(self, rules=()):
+        self.root = {}
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            # Rules end at the first whitespace; comments start with //
+            return cls(line.split()[0] for line in f if line.strip() and not line.startswith('//'))
+
+    def add(self, rule):
+        kind = RULE
+        if rule.startswith('!'):
+            kind, rule = EXCEPTION, rule[1:]
+        node = self.root
+        for label in reversed(to_ascii(rule.lower()).split('.')):
+            node = node.setdefault(label, {})
+        node[TERMINAL] = kind
+
+    def suffix_length(self, labels):
+        """Labels in the public suffix of a hostname, given its labels reversed."""
+        length = 1  # The implicit "*" rule: an unknown TLD is a public suffix
+        exception = None
+        nodes = [self.root]
+        for depth, label in enumerate(labels, start=1):
+            matched = []
+            for node in nodes:
+                for key in (label, '*'):
+                    child = node.get(key)
+                    if child is None:
+                        continue
+                    matched.append(child)
+                    kind = child.get(TERMINAL)
+                    if kind == EXCEPTION:
+                        exception = depth - 1
+                    elif kind == RULE:
+                        length = max(length, depth)
+            if not matched:
+                break
+            nodes = matched
+        return exception if exception is not None else length
+
+    def registrable_domain(self, host):
+        labels = host.split('.')
+        suffix = self.suffix_length(labels[::-1])
+        if len(labels) <= suffix:
+            # A bare public suffix or single-label host (localhost, intranet names)
+            return host
+        return '.'.join(labels[-(suffix + 1):])
+
+
+@lru_cache(maxsize=None)
+def get_trie(path=None):
+    return PublicSuffixTrie.from_file(path or DEFAULT_LIST_PATH)
+
+
+def hostname(url):
+    """Lowercased host of a URL, or of a bare hostname."""
+    if not url:
+        return ''
+    if '://' not in url:
+        url = '//' + url
+    try:
+        host = urlsplit(url.strip()).hostname or ''
+    except ValueError:
+        return ''
+    if any(char.isspace() for char in host):
+        return ''
+    return host.rstrip('.')
+
+
+def registrable_domain(url):
+    """eTLD+1 of a URL (IP addresses and single-label hosts come back whole), or ''."""
+    host = hostname(url)
+    if not host:
+        return ''
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    return get_trie(getattr(settings, 'PASSWORD_PUBLIC_SUFFIX_LIST', None)).registrable_domain(to_ascii(host))
@@ -0,0 +1,225 @@
+# reuse.py
+"""
+Password reuse index.
+
+Each saved password gets a fingerprint: a keyed hash for exact reuse and a
+MinHash signature of its character trigrams for close variants
+("Summer2023!" / "Summer2024!"). Both are keyed with keys derived from
+PASSWORD_MASTER_KEY, so the table can't be matched against a wordlist
+without it, and rotating SECRET_KEY leaves them comparable. (Fingerprints
+written while they were keyed with SECRET_KEY need one
+``manage.py index_password_reuse --all``.) The report groups signatures
+with LSH banding, so it never compares every pair or needs plaintext.
+"""
+import hashlib
+import hmac
+import random
+import struct
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .encryption import decrypt_value, master_key
+
+NGRAM_SIZE = 3
+NUM_PERM = 32
+BANDS = 8  # 8 bands of 4 rows: pairs above ~0.6 Jaccard almost always share a bucket
+ROWS_PER_BAND = NUM_PERM // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+SIGNATURE_FORMAT = f'>{NUM_PERM}Q'  # Stored packed; decoding JSON dominated the report
+BAND_BYTES = ROWS_PER_BAND * 8
+REPORT_FIELDS = frozenset({'name', 'password_value', 'is_deleted', 'user', 'user_id'})  # What a report is built from
+
+# Fixed permutations so signatures stay comparable across processes and deploys
+_rng = random.Random(0x5EED)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+def _derived_key(purpose):
+    return hmac.new(master_key(), purpose.encode(), hashlib.sha256).digest()
+
+
+def exact_hash(raw_password):
+    return hmac.new(_derived_key('passwords.reuse.exact'), raw_password.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _ngram_key():
+    return _derived_key('passwords.reuse.ngrams')
+
+
+def ngrams(raw_password):
+    text = raw_password.lower()
+    if len(text) <= NGRAM_SIZE:
+        return {text}
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def minhash(raw_password, key=None):
+    key = key or _ngram_key()
+    hashes = [
+        int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), key=key, digest_size=8).digest(), 'big')
+        for gram in ngrams(raw_password)
+    ]
+    return [
+        min((a * value + b) % MERSENNE_PRIME for value in hashes)
+        for a, b in PERMUTATIONS
+    ]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the two passwords' trigram sets."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def fingerprint(raw_password, key=None):
+    return {
+        'exact_hash': exact_hash(raw_password),
+        'minhash': struct.pack(SIGNATURE_FORMAT, *minhash(raw_password, key)),
+    }
+
+
+def report_version_key(user_id):
+    return f'password-reuse-version:{user_id}'
+
+
+def report_version(user_id):
+    key = report_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seeded from the clock, so a version lost to eviction can't reuse an old report key
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def report_cache_key(user_id, version):
+    return f'password-reuse-report:{user_id}:{version}'
+
+
+def invalidate_report(user_ids):
+    """Move users on to a new report version; the old cached report is never read again."""
+    for user_id in set(user_ids):
+        try:
+            report_version(user_id)
+            cache.incr(report_version_key(user_id))
+        except Exception:
+            pass  # Reports are only cached for a short while anyway
+
+
+def index_passwords(passwords):
+    """Create or refresh fingerprints for saved Password objects."""
+    from .models import PasswordFingerprint
+
+    key = _ngram_key()
+    PasswordFingerprint.objects.bulk_create(
+        [
+            PasswordFingerprint(password_id=password.pk, user_id=password.user_id,
+                                **fingerprint(decrypt_value(password.user_id, password.password_value), key))
+            for password in passwords
+        ],
+        update_conflicts=True,
+        unique_fields=['password'],
+        update_fields=['exact_hash', 'minhash'],
+    )
+    invalidate_report(password.user_id for password in passwords)
+
+
+def _find(parent, node):
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+    return node
+
+
+def reuse_report(user):
+    try:
+        key = report_cache_key(user.pk, report_version(user.pk))
+        report = cache.get(key)
+    except Exception:
+        key, report = None, None
+    if report is None:
+        report = build_reuse_report(user)
+        if key is None:
+            return report
+        try:
+            cache.set(key, report, getattr(settings, 'PASSWORD_REUSE_REPORT_TIMEOUT', 600))
+        except Exception:
+            pass
+    return report
+
+
+def build_reuse_report(user):
+    from .models import PasswordFingerprint
+
+    threshold = getattr(settings, 'PASSWORD_REUSE_SIMILARITY', 0.5)
+    rows = (PasswordFingerprint.objects
+            .filter(user=user, password__is_deleted=False)
+            .values_list('password_id', 'password__name', 'exact_hash', 'minhash'))
+
+    names = {}
+    by_hash = defaultdict(list)
+    signatures = {}
+    for password_id, name, hashed, packed in rows:
+        names[password_id] = name
+        by_hash[hashed].append(password_id)
+        signatures.setdefault(hashed, bytes(packed))
+
+    # LSH over distinct passwords only, so a widely reused one is one bucket entry
+    buckets = defaultdict(list)
+    for hashed, packed in signatures.items():
+        for band in range(BANDS):
+            buckets[(band, packed[band * BAND_BYTES:(band + 1) * BAND_BYTES])].append(hashed)
+
+    # Verify each bucket against its first member and union the close ones.
+    # Members that are close to each other but not to the first almost
+    # always meet again in another band, and this keeps the work linear.
+    unpacked = {}
+
+    def signature(hashed):
+        if hashed not in unpacked:
+            unpacked[hashed] = struct.unpack(SIGNATURE_FORMAT, signatures[hashed])
+        return unpacked[hashed]
+
+    parent = {hashed: hashed for hashed in signatures}
+    closest = defaultdict(float)
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        first = members[0]
+        for other in members[1:]:
+            root, other_root = _find(parent, first), _find(parent, other)
+            if root == other_root:
+                continue
+            score = similarity(signature(first), signature(other))
+            if score >= threshold:
+                parent[other_root] = root
+                closest[root] = max(closest[root], closest.pop(other_root, 0.0), score)
+
+    groups = defaultdict(list)
+    for hashed in signatures:
+        groups[_find(parent, hashed)].append(hashed)
+
+    def entries(ids):
+        return sorted(({'id': pk, 'name': names[pk]} for pk in ids), key=lambda entry: entry['name'])
+
+    reused = [
+        {'count': len(ids), 'entries': entries(ids)}
+        for ids in by_hash.values() if len(ids) > 1
+    ]
+    similar = []
+    for root, hashes in groups.items():
+        if len(hashes) < 2:
+            continue
+        similar.append({
+            'similarity': round(closest[root], 2),
+            'entries': entries(pk for hashed in hashes for pk in by_hash[hashed]),
+        })
+
+    reused.sort(key=lambda group: group['count'], reverse=True)
+    similar.sort(key=lambda group: group['similarity'], reverse=True)
+    return {'checked': len(names), 'reused': reused, 'similar': similar}
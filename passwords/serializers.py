@@ -1,40 +1,129 @@
 # serializers.py
 from rest_framework import serializers
 from .models import Password
+from .batching import classify_texts
+from .classifiers import vault_model_category
+from .domain_rules import DOMAIN_INDEX
+from .category_cache import cache_key, category_cache
+from .history import record_version
+from .encryption import ciphers_for, decrypt_value, encrypt_value, is_encrypted
+from django.conf import settings
+from django.db import transaction
+from . import inference
 import re
-from transformers import pipeline  # Using Hugging Face's transformers
 from urllib.parse import urlparse
 
+class DecryptingListSerializer(serializers.ListSerializer):
+    """Resolves every owner's data key up front, then decrypts row by row from the key cache."""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        ciphers_for({item.user_id for item in items if is_encrypted(item.password_value)})
+        return super().to_representation(items)
+
+
 class PasswordSerializer(serializers.ModelSerializer):
+    # The column holds ciphertext, so the length limit lives here
+    password_value = serializers.CharField(max_length=500)
+
     class Meta:
         model = Password
         fields = (
             'id', 'name', 'username', 'password_value', 'website_url', 
-            'notes', 'category', 'created_at', 'updated_at'
+            'notes', 'category', 'category_status', 'use_count', 'last_used_at', 'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'created_at', 'updated_at', 'category')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'category', 'category_status', 'use_count', 'last_used_at')
+        list_serializer_class = DecryptingListSerializer
     
     def create(self, validated_data):
         user = self.context['request'].user
         password = Password(user=user, **validated_data)
         
         # AI-powered categorization
-        password.category = self.predict_category(password)
+        self.assign_categories([password])
+        password.password_value = encrypt_value(user.pk, password.password_value)
         password.save()
         
         return password
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            # Lock the row so concurrent updates number their versions one after another,
+            # and diff against what's stored now rather than what this request loaded
+            instance.refresh_from_db(from_queryset=Password.objects.select_for_update())
+            # Keep what's being overwritten; needs the plaintext, so before sealing
+            record_version(instance, validated_data)
+            if 'password_value' in validated_data:
+                validated_data['password_value'] = encrypt_value(instance.user_id, validated_data['password_value'])
+            # A failed save takes its version with it
+            return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'password_value' in data:
+            data['password_value'] = decrypt_value(instance.user_id, data['password_value'])
+        return data
+
+    def assign_categories(self, passwords):
+        """Set category (or a pending status) on unsaved Password objects."""
+        if not getattr(settings, 'PASSWORD_ASYNC_CATEGORIZATION', False):
+            for password, category in zip(passwords, self.predict_categories(passwords)):
+                password.category = category
+            return
+
+        # Save now; anything that needs a model is left for process_category_queue
+        for password in passwords:
+            category = self.quick_category(self.build_features(password))
+            if category is None:
+                password.category_status = Password.CATEGORY_PENDING
+            else:
+                password.category = category
     
     def predict_category(self, password):
+        return self.predict_categories([password])[0]
+
+    def predict_categories(self, passwords, strict=False):
+        """
+        Categorize several entries with at most one batched model call. With
+        ``strict`` a model failure raises instead of coming back as OTHER.
+        """
+        features_list = [self.build_features(password) for password in passwords]
+        if not getattr(settings, 'PASSWORD_CATEGORY_CACHE', True):
+            # Multi-stage classification
+            return self.classify_passwords(features_list, strict)
+
+        keys = [cache_key(features) for features in features_list]
+        categories = [category_cache.get(key) for key in keys]
+        misses = [i for i, category in enumerate(categories) if category is None]
+        results = self.classify_passwords([features_list[i] for i in misses], strict)
+        for i, category in zip(misses, results):
+            categories[i] = category
+            # Every failure path ends in OTHER, so only cache real answers
+            if category != 'OTHER':
+                category_cache.set(keys[i], category)
+        return categories
+
+    def quick_category(self, features):
+        """Cached or rule-based category, or None when only a model can tell."""
+        if not getattr(settings, 'PASSWORD_CATEGORY_CACHE', True):
+            return self.classify_without_model(features)
+
+        key = cache_key(features)
+        category = category_cache.get(key)
+        if category is None:
+            category = self.classify_without_model(features)
+            if category is not None:
+                category_cache.set(key, category)
+        return category
+
+    def build_features(self, password):
         # Combine features from different sources
-        features = {
+        return {
             'name': password.name,
             'domain': self.extract_domain_features(password.website_url),
             'notes': password.notes,
             'keywords': self.extract_keywords(password)
         }
-        
-        # Multi-stage classification
-        return self.classify_password(features)
     
     def extract_domain_features(self, url):
         if not url:
@@ -56,152 +145,54 @@ class PasswordSerializer(serializers.ModelSerializer):
         return set(re.findall(r'\b\w{4,}\b', text))
 
     def classify_password(self, features):
+        return self.classify_passwords([features])[0]
+
+    def classify_passwords(self, features_list, strict=False):
+        categories = [self.classify_without_model(features) for features in features_list]
+        pending = [i for i, category in enumerate(categories) if category is None]
+        if pending:
+            texts = [f"{features_list[i]['name']} {features_list[i]['notes']}" for i in pending]
+            for i, category in zip(pending, self.model_classification(texts, strict)):
+                categories[i] = category
+        return categories
+
+    def classify_without_model(self, features):
         # 1. Domain-based classification
         domain_cat = self.domain_based_classification(features['domain'])
         if domain_cat != 'OTHER':
             return domain_cat
 
-        # 2. Zero-shot classification using transformers
-        text = f"{features['name']} {features['notes']}"
-        return self.zero_shot_classification(text)
+        # 2. Local model trained on the vault, when it's confident enough
+        category, confidence = vault_model_category(features)
+        if category and confidence >= getattr(settings, 'PASSWORD_SKLEARN_MIN_CONFIDENCE', 0.6):
+            return category
+        return None
+
+    def model_classification(self, texts, strict=False):
+        # 3. Zero-shot classification using transformers
+        if inference.is_enabled():
+            # Shared inference daemon; keep the domain result (OTHER) if it's slow or down
+            try:
+                return inference.classify_many(texts)
+            except inference.InferenceUnavailable:
+                if strict:
+                    raise
+                return ['OTHER'] * len(texts)
+        if strict:
+            return classify_texts(texts, strict=True)
+        return self.zero_shot_classifications(texts)
     
     def domain_based_classification(self, domain_info):
-        if not domain_info.get('domain'):
-            return 'OTHER'
-
-
-        domain = domain_info['domain'].lower()
-        tld = domain_info.get('tld', '')
-        subdomains = domain_info.get('subdomains', [])
-        
-        # Expanded domain rules with common services and patterns
-        domain_patterns = {
-            'SOCIAL': {
-                'exact': {'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
-                        'pinterest.com', 'tumblr.com', 'reddit.com', 'snapchat.com',
-                        'tiktok.com', 'whatsapp.com', 'wechat.com', 'telegram.org'},
-                'contains': ['social', 'connect', 'profile', 'network', 'share'],
-                'tlds': set()
-            },
-            'EMAIL': {
-                'exact': {'gmail.com', 'outlook.com', 'yahoo.com', 'protonmail.com',
-                        'zoho.com', 'mail.com', 'fastmail.com', 'icloud.com'},
-                'contains': ['mail', 'inbox', 'email', 'mx.', 'smtp.'],
-                'tlds': {'email', 'mail'}
-            },
-            'FINANCE': {
-                'exact': {'paypal.com', 'bankofamerica.com', 'chase.com', 'fidelity.com',
-                        'capitalone.com', 'wellsfargo.com', 'schwab.com', 'coinbase.com',
-                        'binance.com', 'venmo.com', 'cash.app', 'mint.com'},
-                'contains': ['bank', 'pay', 'credit', 'loan', 'mortgage', 'crypto', 'trade',
-                            'invest', 'wealth', 'finance', 'capital', 'exchange'],
-                'tlds': {'bank', 'capital', 'trade'}
-            },
-            'WORK': {
-                'exact': {'okta.com', 'office.com', 'azure.com', 'slack.com',
-                        'atlassian.net', 'googleworkspace.com', 'vpn.', 'remote.',
-                        'jira.', 'confluence.', 'zoom.us', 'teams.microsoft.com'},
-                'contains': ['vpn', 'corp', 'office', 'work', 'business', 'enterprise',
-                            'company', 'internal', 'hr', 'okta', 'sso', 'auth'],
-                'tlds': {'enterprise', 'business'}
-            },
-            'ENTERTAINMENT': {
-                'exact': {'netflix.com', 'spotify.com', 'hulu.com', 'youtube.com',
-                        'twitch.tv', 'disneyplus.com', 'primevideo.com', 'steampowered.com',
-                        'xbox.com', 'playstation.com', 'crunchyroll.com'},
-                'contains': ['stream', 'game', 'music', 'video', 'tv', 'movie', 'play',
-                            'fun', 'entertain', 'media', 'flix', 'tube'],
-                'tlds': {'tv', 'games', 'movie'}
-            },
-            'SHOPPING': {
-                'exact': {'amazon.com', 'ebay.com', 'etsy.com', 'aliexpress.com',
-                        'walmart.com', 'target.com', 'bestbuy.com', 'newegg.com',
-                        'zappos.com', 'shopify.com', 'woocommerce.com'},
-                'contains': ['shop', 'store', 'cart', 'buy', 'deal', 'sale', 'market',
-                            'mall', 'checkout', 'purchase', 'retail', 'merchant'],
-                'tlds': {'shop', 'store', 'buy'}
-            },
-            'EDUCATION': {
-                'exact': {'coursera.org', 'edx.org', 'udemy.com', 'khanacademy.org',
-                        'skillshare.com', 'pluralsight.com', 'lynda.com'},
-                'contains': ['learn', 'course', 'academy', 'study', 'school', 'edu',
-                            'training', 'class', 'education'],
-                'tlds': {'edu', 'academy', 'courses'}
-            }
-        }
-
-        # Check exact domain matches
-        for category, patterns in domain_patterns.items():
-            if domain in patterns['exact']:
-                return category
-
-        # Check subdomain patterns
-        for subdomain in subdomains:
-            for category, patterns in domain_patterns.items():
-                if any(keyword in subdomain for keyword in patterns['contains']):
-                    return category
-
-        # Check domain contains keywords
-        for category, patterns in domain_patterns.items():
-            if any(keyword in domain for keyword in patterns['contains']):
-                return category
-
-        # Check TLD patterns
-        for category, patterns in domain_patterns.items():
-            if tld in patterns['tlds']:
-                return category
-
-        # Special case handling
-        if 'login.' in domain or 'auth.' in domain:
-            return 'WORK'
-        if 'cloud.' in domain or 'aws.' in domain:
-            return 'WORK'
-        if any(x in domain for x in ['bit.ly', 'goo.gl']):
-            return 'OTHER'  # URL shorteners
-            
-        # Check domain structure patterns
-        if re.search(r'\d{3,}', domain):  # Numbers in domain often indicate shopping
-            return 'SHOPPING'
-            
-        if re.search(r'(api|dev|stage|prod)', domain):
-            return 'WORK'
-
-        # Check for country-specific financial institutions
-        if re.search(r'(bank|creditunion|fin|capital)', domain):
-            return 'FINANCE'
-
-        return 'OTHER'
+        # Rules are compiled once per process; see domain_rules.py
+        return DOMAIN_INDEX.classify(domain_info)
 
     def zero_shot_classification(self, text):
-        if not text.strip():
-            return 'OTHER'
-        
-        # Load a pre-trained zero-shot classifier
+        return self.zero_shot_classifications([text])[0]
+
+    def zero_shot_classifications(self, texts):
         try:
-        # Load a pre-trained zero-shot classifier
-            classifier = pipeline(
-                "zero-shot-classification",
-                model="facebook/bart-large-mnli"
-            )
-            
-            candidate_labels = [
-                'social media', 'email', 'financial services', 
-                'work related', 'entertainment', 'online shopping'
-            ]
-            
-            result = classifier(text, candidate_labels)
-            top_label = result['labels'][0].upper().replace(' ', '_')
-            
-            # Map to existing categories
-            label_mapping = {
-                'SOCIAL_MEDIA': 'SOCIAL',
-                'EMAIL': 'EMAIL',
-                'FINANCIAL_SERVICES': 'FINANCE',
-                'WORK_RELATED': 'WORK',
-                'ENTERTAINMENT': 'ENTERTAINMENT',
-                'ONLINE_SHOPPING': 'SHOPPING'
-            }
-            return label_mapping.get(top_label, 'OTHER')
+            # Shared per-process classifier, batched with concurrent requests when enabled
+            return classify_texts(texts)
 
         except Exception as e:
-            return 'OTHER'
\ No newline at end of file
+            return ['OTHER'] * len(texts)
@@ -0,0 +1,88 @@
+# shares.py
+"""
+Cache-backed share links.
+
+With PASSWORD_SHARE_BACKEND = 'cache' a share is one cache entry (Redis in
+production) whose TTL is the link's lifetime, instead of a SharedPassword
+row: expiry costs nothing and the table doesn't grow. The entry holds the
+same fields the row would and comes back as an unsaved SharedPassword so
+the page code and templates don't care where it came from. Links use the
+same token URLs.
+
+The entry is always sealed (AES-GCM) with a key derived from the master key
+and the link's token, whatever the owner's encrypt_passwords setting, so
+the cache never holds a readable password; password_value inside it stays
+sealed with the owner's data key as well when they encrypt.
+"""
+import json
+import math
+import os
+
+from cryptography.exceptions import InvalidTag
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .encryption import NONCE_SIZE, share_cipher
+from .models import SharedPassword
+
+SHARE_FIELDS = (
+    'name', 'username', 'password_value', 'website_url', 'notes', 'category',
+    'created_by_id', 'original_password_id', 'expires_at', 'one_time',
+)
+
+
+def cache_enabled():
+    return getattr(settings, 'PASSWORD_SHARE_BACKEND', 'database') == 'cache'
+
+
+def share_key(token):
+    return f'password-share:{token}'
+
+
+def claim_key(token):
+    return f'password-share-claimed:{token}'
+
+
+def seconds_left(shared):
+    return max(math.ceil((shared.expires_at - timezone.now()).total_seconds()), 0)
+
+
+def seal_payload(token, payload):
+    nonce = os.urandom(NONCE_SIZE)
+    data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return nonce + share_cipher(token).encrypt(nonce, data, None)
+
+
+def unseal_payload(token, sealed):
+    try:
+        data = share_cipher(token).decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], None)
+    except InvalidTag:
+        return None
+    return json.loads(data)
+
+
+def save_share(shared):
+    """Store an unsaved SharedPassword until it expires."""
+    payload = {field: getattr(shared, field) for field in SHARE_FIELDS}
+    payload['expires_at'] = shared.expires_at.isoformat()
+    cache.set(share_key(shared.token), seal_payload(shared.token, payload), seconds_left(shared))
+
+
+def load_share(token):
+    sealed = cache.get(share_key(token))
+    payload = None if sealed is None else unseal_payload(token, sealed)
+    if payload is None:
+        return None
+    payload['expires_at'] = parse_datetime(payload['expires_at'])
+    return SharedPassword(token=token, **payload)
+
+
+def claim_one_time(shared):
+    """True for exactly one caller per link; the entry is gone afterwards."""
+    # add() is SET NX, so concurrent viewers can't both win
+    claimed = cache.add(claim_key(shared.token), True, seconds_left(shared) or 1)
+    if claimed:
+        cache.delete(share_key(shared.token))
+    return claimed
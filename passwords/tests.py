@@ -7,15 +7,58 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from .models import Password, SharedPassword
 import uuid
-from unittest.mock import patch
+import os
+import tempfile
+import threading
+import time
+import socketserver
+from django.test import override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import ImproperlyConfigured
+from io import StringIO, BytesIO
+import json
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from unittest.mock import patch, MagicMock
+from .classifiers import registry
+from .inference import InferenceServer
+from . import inference
+from .batching import MicroBatcher, classify_texts
+from .domain_rules import DOMAIN_INDEX, KeywordAutomaton, classify_linear
+from .benchmarks.domains import generate_domain_infos
+from .serializers import PasswordSerializer
+from .importers import ImportFormatError, iter_json_array, import_passwords
+from .breach import BreachCorpus
+from .reuse import minhash, similarity
+from .models import PasswordFingerprint
+from .encryption import DecryptionError, decrypt_value, encrypt_value, is_encrypted, key_cache
+from settings_app.models import UserSettings
+from bills.models import Bill
+from .public_suffix import registrable_domain
+from .models import PasswordVersion
+from .exports import ExportDecryptionError, decrypt_export
+from documents.models import Document
+from .usage import get_tracker
+import hashlib
+import csv
+from django.core.cache import cache
+from .category_cache import category_cache, cache_key
+from . import shares
 User = get_user_model()
 
+
+def reset_classifiers():
+    registry.clear()
+    category_cache.clear()
+    cache.clear()
+
 class PasswordVaultTests(APITestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="testuser", email="test@example.com", password="pass1234")
         self.other_user = User.objects.create_user(username="hacker", email="hacker@example.com", password="pass456")
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        reset_classifiers()
 
     def test_create_password_with_category(self):
         data = {
@@ -81,7 +124,7 @@ class PasswordVaultTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data["name"], long_name)
 
-    @patch("passwords.serializers.pipeline")
+    @patch("passwords.classifiers.pipeline")
     def test_ai_classification_fallback(self, mock_pipeline):
         mock_pipeline.side_effect = Exception("Model load failed")
 
@@ -127,4 +170,1170 @@ class PasswordVaultTests(APITestCase):
         "website_url": "https://test.com",
         "notes": "Special chars only"
         })
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+class ModelRegistryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="registry", email="registry@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_classifier_loaded_once_across_requests(self, mock_pipeline):
+        classifier = MagicMock(return_value={'labels': ['email'], 'scores': [0.9]})
+        mock_pipeline.return_value = classifier
+
+        for name in ("Inbox one", "Inbox two"):
+            response = self.client.post("/api/passwords/", {
+                "name": name,
+                "password_value": "secret",
+                "notes": "mail login"
+            })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data["category"], "EMAIL")
+
+        self.assertEqual(mock_pipeline.call_count, 1)
+        self.assertEqual(classifier.call_count, 2)
+        stats = registry.stats()["zero_shot"]
+        self.assertIn("load_seconds", stats)
+        self.assertGreater(stats["rss_bytes"], 0)
+
+    @patch("passwords.classifiers.pipeline")
+    def test_failed_load_is_retried(self, mock_pipeline):
+        mock_pipeline.side_effect = [Exception("Model load failed"), MagicMock()]
+        data = {"name": "Retry", "password_value": "secret", "notes": "anything"}
+
+        self.client.post("/api/passwords/", data)
+        self.assertFalse(registry.is_loaded("zero_shot"))
+        self.client.post("/api/passwords/", data)
+        self.assertTrue(registry.is_loaded("zero_shot"))
+
+
+class InferenceServerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="daemon", email="daemon@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.socket_path = os.path.join(self.tmpdir.name, "inference.sock")
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    def start_server(self):
+        server = InferenceServer(self.socket_path)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    @patch("passwords.classifiers.pipeline")
+    def test_create_uses_inference_daemon(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(return_value=[{'labels': ['online shopping'], 'scores': [0.8]}])
+        self.start_server()
+
+        with override_settings(PASSWORD_INFERENCE_SOCKET=self.socket_path):
+            response = self.client.post("/api/passwords/", {
+                "name": "Groceries",
+                "password_value": "secret",
+                "notes": "weekly order"
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["category"], "SHOPPING")
+        self.assertEqual(mock_pipeline.call_count, 1)
+
+    @patch("passwords.classifiers.pipeline")
+    def test_daemon_down_falls_back_to_domain_result(self, mock_pipeline):
+        with override_settings(PASSWORD_INFERENCE_SOCKET=self.socket_path):
+            response = self.client.post("/api/passwords/", {
+                "name": "Groceries",
+                "password_value": "secret",
+                "website_url": "https://abcxyz.unknown",
+                "notes": "weekly order"
+            })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["category"], "OTHER")
+        mock_pipeline.assert_not_called()
+
+    def test_timeout_covers_the_whole_exchange(self):
+        class Trickle(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+                # Each byte arrives well within the timeout; the whole answer doesn't
+                for byte in b'{"categories": ["OTHER"]}':
+                    self.wfile.write(bytes([byte]))
+                    self.wfile.flush()
+                    time.sleep(0.05)
+
+        server = InferenceServer(self.socket_path, Trickle)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        started = time.monotonic()
+        with override_settings(PASSWORD_INFERENCE_SOCKET=self.socket_path):
+            with self.assertRaises(inference.InferenceUnavailable):
+                inference.classify("Groceries", timeout=0.2)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class MicroBatcherTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def predict(self, texts):
+        self.calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    def test_concurrent_texts_share_one_forward_pass(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=8, max_wait=0.2)
+        futures = [batcher.submit(text) for text in ("a", "b", "c")]
+
+        self.assertEqual([f.result(timeout=2) for f in futures], ["A", "B", "C"])
+        self.assertEqual(self.calls, [["a", "b", "c"]])
+        stats = batcher.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertAlmostEqual(stats["fill_rate"], 3 / 8)
+        self.assertGreaterEqual(stats["max_queue_ms"], 0)
+
+    def test_full_batch_runs_without_waiting(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=2, max_wait=5)
+        futures = [batcher.submit(text) for text in ("a", "b", "c", "d")]
+
+        self.assertEqual([f.result(timeout=2) for f in futures], ["A", "B", "C", "D"])
+        self.assertEqual(self.calls, [["a", "b"], ["c", "d"]])
+        self.assertEqual(batcher.stats()["fill_rate"], 1.0)
+
+    def test_predict_errors_reach_every_caller(self):
+        def broken(texts):
+            raise RuntimeError("model crashed")
+
+        batcher = MicroBatcher(broken, max_batch_size=4, max_wait=0.05)
+        futures = [batcher.submit(text) for text in ("a", "b")]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=2)
+
+    @override_settings(PASSWORD_BATCHING=True, PASSWORD_BATCH_RESULT_TIMEOUT=0.1)
+    def test_wedged_batcher_falls_back_to_other(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def wedged(texts):
+            release.wait(5)
+            return ["SHOPPING"] * len(texts)
+
+        with patch("passwords.batching._batcher", MicroBatcher(wedged, max_batch_size=4, max_wait=0.01)):
+            started = time.monotonic()
+            self.assertEqual(classify_texts(["a", "b"]), ["OTHER", "OTHER"])
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(PASSWORD_BATCHING=True, PASSWORD_BATCH_RESULT_TIMEOUT=0.1)
+    def test_strict_callers_get_the_timeout_and_queued_texts_are_dropped(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def wedged(texts):
+            self.calls.append(list(texts))
+            release.wait(5)
+            return ["SHOPPING"] * len(texts)
+
+        batcher = MicroBatcher(wedged, max_batch_size=1, max_wait=0.01)
+        with patch("passwords.batching._batcher", batcher):
+            with self.assertRaises(TimeoutError):
+                classify_texts(["a", "b", "c"], strict=True)
+        release.set()
+        # Let the worker go through the cancelled items
+        self.assertEqual(batcher.submit("d").result(timeout=2), "SHOPPING")
+        self.assertEqual(self.calls, [["a"], ["d"]])
+
+    def test_stats_are_logged_periodically(self):
+        batcher = MicroBatcher(self.predict, max_batch_size=2, max_wait=0.01, stats_interval=0.001)
+        time.sleep(0.01)
+        with self.assertLogs("passwords.batching", level="INFO") as logs:
+            batcher.submit("a").result(timeout=2)
+            time.sleep(0.05)
+        self.assertIn("fill rate 0.50", logs.output[0])
+
+
+EMBEDDING_KEYWORDS = ["social", "mail", "financ", "work", "entertain", "shop"]
+
+
+def fake_feature_extractor(texts):
+    # One-hot "embedding" on the first keyword found, shaped like [1][tokens][dim]
+    outputs = []
+    for text in texts:
+        vector = [0.0] * len(EMBEDDING_KEYWORDS)
+        for i, keyword in enumerate(EMBEDDING_KEYWORDS):
+            if keyword in text.lower():
+                vector[i] = 1.0
+                break
+        outputs.append([[vector, vector]])
+    return outputs
+
+
+@override_settings(PASSWORD_CLASSIFIER_BACKEND="embedding")
+class EmbeddingBackendTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="embed", email="embed@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_create_uses_label_vectors(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(side_effect=fake_feature_extractor)
+
+        response = self.client.post("/api/passwords/", {
+            "name": "Shop account",
+            "password_value": "secret",
+            "notes": "clothes"
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["category"], "SHOPPING")
+        self.assertEqual(mock_pipeline.call_args[0][0], "feature-extraction")
+
+    @patch("passwords.classifiers.pipeline")
+    def test_benchmark_reports_accuracy(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(side_effect=fake_feature_extractor)
+        out = StringIO()
+
+        call_command("benchmark_classifiers", backends=["embedding"], stdout=out)
+
+        self.assertIn("accuracy", out.getvalue())
+        self.assertIn("p50 / p95", out.getvalue())
+
+
+class VaultModelTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="trainer", email="trainer@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.model_path = os.path.join(self.tmpdir.name, "category.joblib")
+        reset_classifiers()
+
+        rows = {
+            "FINANCE": ["Bank login", "Savings bank", "Credit union bank", "Bank card"],
+            "ENTERTAINMENT": ["Movie streaming", "Music streaming", "Streaming box", "Game streaming"],
+        }
+        for category, names in rows.items():
+            for name in names:
+                Password.objects.create(user=self.user, name=name, password_value="x", category=category)
+
+    def tearDown(self):
+        reset_classifiers()
+
+    def train(self):
+        call_command("train_category_model", output=self.model_path, stdout=StringIO())
+
+    @patch("passwords.classifiers.pipeline")
+    def test_confident_prediction_skips_transformer(self, mock_pipeline):
+        self.train()
+        with override_settings(PASSWORD_SKLEARN_MODEL_PATH=self.model_path, PASSWORD_SKLEARN_MIN_CONFIDENCE=0.5):
+            response = self.client.post("/api/passwords/", {
+                "name": "Streaming service",
+                "password_value": "secret"
+            })
+
+        self.assertEqual(response.data["category"], "ENTERTAINMENT")
+        mock_pipeline.assert_not_called()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_low_confidence_falls_back_to_transformer(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(return_value=[{'labels': ['email'], 'scores': [0.9]}])
+        self.train()
+        with override_settings(PASSWORD_SKLEARN_MODEL_PATH=self.model_path, PASSWORD_SKLEARN_MIN_CONFIDENCE=1.01):
+            response = self.client.post("/api/passwords/", {
+                "name": "Streaming service",
+                "password_value": "secret"
+            })
+
+        self.assertEqual(response.data["category"], "EMAIL")
+        mock_pipeline.assert_called_once()
+
+    def test_training_needs_two_categories(self):
+        Password.objects.filter(category="FINANCE").delete()
+        with self.assertRaises(CommandError):
+            self.train()
+
+
+class DomainRuleIndexTests(TestCase):
+    def test_matches_linear_rules(self):
+        serializer = PasswordSerializer()
+        urls = [
+            "https://www.netflix.com", "https://mail.acme.com", "https://smtp.example.org",
+            "https://shop.example.com", "https://hr.example.com", "https://example.bank",
+            "https://store123.example.com", "https://api.example.com", "https://login.example.io",
+            "https://bit.ly", "https://coursera.org", "https://abcxyz.unknown", "",
+        ]
+        infos = [serializer.extract_domain_features(url) for url in urls]
+        infos += generate_domain_infos(5000, seed=1)
+
+        for info in infos:
+            self.assertEqual(DOMAIN_INDEX.classify(info), classify_linear(info), info)
+
+    def test_earlier_category_wins_when_several_keywords_match(self):
+        # "sharemail" holds SOCIAL's "share" and EMAIL's "mail"; SOCIAL is listed first
+        info = {"domain": "sharemail.com", "tld": "com", "subdomains": ["sharemail"]}
+        self.assertEqual(DOMAIN_INDEX.classify(info), "SOCIAL")
+
+    def test_automaton_finds_overlapping_keywords(self):
+        automaton = KeywordAutomaton({0: ["he", "she"], 1: ["hers"], 2: ["xyz"]})
+        self.assertEqual(automaton.match("ushers"), 0b011)
+        self.assertEqual(automaton.match("abc"), 0)
+
+
+class CategoryCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cache", email="cache@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_repeat_saves_skip_the_classifier(self, mock_pipeline):
+        classifier = MagicMock(return_value=[{'labels': ['work related'], 'scores': [0.9]}])
+        mock_pipeline.return_value = classifier
+        data = {"name": "Team Wiki", "password_value": "secret", "website_url": "https://wiki.acme.io"}
+
+        self.client.post("/api/passwords/", data)
+        self.client.post("/api/passwords/", dict(data, name="team   WIKI"))
+        category_cache.clear()  # Another worker: only Redis has it
+        response = self.client.post("/api/passwords/", data)
+
+        self.assertEqual(response.data["category"], "WORK")
+        self.assertEqual(classifier.call_count, 1)
+        stats = category_cache.stats()
+        self.assertEqual(stats["shared_hits"], 1)
+        self.assertEqual(stats["misses"], 0)
+
+    @patch("passwords.classifiers.pipeline")
+    def test_failed_classification_is_not_cached(self, mock_pipeline):
+        mock_pipeline.side_effect = [Exception("Model load failed"),
+                                     MagicMock(return_value=[{'labels': ['email'], 'scores': [0.9]}])]
+        data = {"name": "Mailbox", "password_value": "secret"}
+
+        self.assertEqual(self.client.post("/api/passwords/", data).data["category"], "OTHER")
+        self.assertEqual(self.client.post("/api/passwords/", data).data["category"], "EMAIL")
+
+    def test_key_ignores_case_and_spacing_but_not_domain(self):
+        features = {"name": "My  Bank", "domain": {"domain": "bank.example"}}
+        self.assertEqual(cache_key(features), cache_key({"name": "my bank", "domain": {"domain": "bank.example"}}))
+        self.assertNotEqual(cache_key(features), cache_key({"name": "my bank", "domain": {"domain": "other.example"}}))
+        self.assertNotIn("bank", cache_key(features))
+
+
+@override_settings(PASSWORD_ASYNC_CATEGORIZATION=True)
+class AsyncCategorizationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="async", email="async@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_model_work_is_deferred_to_the_queue(self, mock_pipeline):
+        classifier = MagicMock(return_value=[{'labels': ['email'], 'scores': [0.9]},
+                                             {'labels': ['online shopping'], 'scores': [0.9]}])
+        mock_pipeline.return_value = classifier
+
+        first = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "x"})
+        second = self.client.post("/api/passwords/", {"name": "Groceries", "password_value": "x"})
+        self.assertEqual(first.data["category_status"], "PENDING")
+        self.assertEqual(second.data["category"], "OTHER")
+        mock_pipeline.assert_not_called()
+
+        call_command("process_category_queue", once=True, stdout=StringIO())
+
+        self.assertEqual(classifier.call_count, 1)  # One batched pass for the whole queue
+        poll = self.client.get(f"/api/passwords/{first.data['id']}/category/")
+        self.assertEqual(poll.data, {"id": first.data["id"], "category": "EMAIL", "category_status": "READY"})
+        listed = {p["name"]: p["category"] for p in self.client.get("/api/passwords/").data}
+        self.assertEqual(listed, {"Mailbox": "EMAIL", "Groceries": "SHOPPING"})
+
+    @patch("passwords.classifiers.pipeline")
+    def test_failed_inference_leaves_entries_pending(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(side_effect=RuntimeError("model crashed"))
+        created = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "x"})
+
+        call_command("process_category_queue", once=True, stdout=StringIO())
+
+        password = Password.objects.get(pk=created.data["id"])
+        self.assertEqual(password.category_status, Password.CATEGORY_PENDING)
+        self.assertEqual(password.category_attempts, 1)
+        self.assertIsNone(password.category_claimed_until)
+
+        mock_pipeline.return_value = MagicMock(return_value=[{'labels': ['email'], 'scores': [0.9]}])
+        reset_classifiers()
+        call_command("process_category_queue", once=True, stdout=StringIO())
+        password.refresh_from_db()
+        self.assertEqual((password.category, password.category_status), ("EMAIL", "READY"))
+
+    @override_settings(PASSWORD_CATEGORY_MAX_ATTEMPTS=2)
+    @patch("passwords.classifiers.pipeline")
+    def test_entries_out_of_retries_settle_on_other(self, mock_pipeline):
+        mock_pipeline.return_value = MagicMock(side_effect=RuntimeError("model crashed"))
+        created = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "x"})
+
+        for _ in range(2):
+            call_command("process_category_queue", once=True, stdout=StringIO())
+
+        poll = self.client.get(f"/api/passwords/{created.data['id']}/category/")
+        self.assertEqual(poll.data["category_status"], "READY")
+        self.assertEqual(poll.data["category"], "OTHER")
+
+    def test_claimed_entries_are_skipped_by_other_workers(self):
+        created = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "x"})
+        Password.objects.filter(pk=created.data["id"]).update(
+            category_claimed_until=timezone.now() + timezone.timedelta(minutes=5))
+        with patch("passwords.serializers.PasswordSerializer.predict_categories") as predict:
+            call_command("process_category_queue", once=True, stdout=StringIO())
+        predict.assert_not_called()
+
+    def test_domain_rules_still_answer_immediately(self):
+        response = self.client.post("/api/passwords/", {
+            "name": "Netflix",
+            "password_value": "x",
+            "website_url": "https://www.netflix.com"
+        })
+        self.assertEqual(response.data["category"], "ENTERTAINMENT")
+        self.assertEqual(response.data["category_status"], "READY")
+
+
+class VaultImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="importer", email="importer@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def tearDown(self):
+        reset_classifiers()
+
+    @patch("passwords.classifiers.pipeline")
+    def test_chrome_csv_is_categorized_in_one_batch(self, mock_pipeline):
+        classifier = MagicMock(return_value=[{'labels': ['email'], 'scores': [0.9]},
+                                             {'labels': ['work related'], 'scores': [0.9]}])
+        mock_pipeline.return_value = classifier
+        export = (
+            "name,url,username,password,note\n"
+            "Netflix,https://www.netflix.com,me,pw1,\n"
+            "Mailbox,,me,pw2,personal\n"
+            "Wiki,,me,pw3,team docs\n"
+            "Broken,https://example.com,me,,\n"
+        )
+        upload = SimpleUploadedFile("passwords.csv", export.encode(), content_type="text/csv")
+
+        response = self.client.post("/api/passwords/import/", {"file": upload}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["imported"], 3)
+        self.assertEqual(response.data["skipped"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 4)
+        self.assertEqual(response.data["categories"], {"ENTERTAINMENT": 1, "EMAIL": 1, "WORK": 1})
+        self.assertEqual(classifier.call_count, 1)
+        self.assertEqual(Password.objects.filter(user=self.user).count(), 3)
+
+    def test_bitwarden_json_from_a_temporary_file(self):
+        export = {
+            "encrypted": False,
+            "folders": [{"id": "1", "name": "Shopping"}],
+            "items": [
+                {"type": 1, "name": "Amazon", "notes": None,
+                 "login": {"username": "me", "password": "pw", "uris": [{"uri": "https://amazon.com"}]}},
+                {"type": 2, "name": "Secure note", "notes": "not a login"},
+            ],
+        }
+        upload = TemporaryUploadedFile("bitwarden.json", "application/json", 0, "utf-8")
+        upload.write(json.dumps(export).encode())
+        upload.seek(0)
+
+        summary = import_passwords(self.user, upload)
+
+        self.assertEqual((summary["imported"], summary["skipped"]), (1, 1))
+        password = Password.objects.get(user=self.user)
+        self.assertEqual((password.username, password.website_url, password.category),
+                         ("me", "https://amazon.com", "SHOPPING"))
+
+    def test_json_array_is_read_in_small_chunks(self):
+        entries = [{"name": f"Entry {i}", "password": "x" * i, "notes": "a]b,c{"} for i in range(50)]
+        items = list(iter_json_array(BytesIO(json.dumps(entries).encode()), chunk_size=7))
+        self.assertEqual(items, entries)
+
+    def test_items_key_is_found_among_top_level_keys_only(self):
+        export = {
+            "encrypted": False,
+            "note": 'see "items" below',
+            "folders": [{"id": 1, "name": '"items": ['}],
+            "count": 12345,
+            "items": [{"name": "Real"}],
+        }
+        for chunk_size in (3, 7, 4096):
+            items = list(iter_json_array(BytesIO(json.dumps(export).encode()), chunk_size=chunk_size))
+            self.assertEqual(items, [{"name": "Real"}])
+
+        with self.assertRaises(ImportFormatError):
+            list(iter_json_array(BytesIO(b'{"note": "\\"items\\": [1]"}'), chunk_size=5))
+
+    def test_chunks_are_bulk_created(self):
+        lines = "".join(json.dumps({"name": f"Site {i}", "url": "https://shop.example.com", "password": "x"}) + "\n"
+                        for i in range(7))
+        upload = SimpleUploadedFile("export.jsonl", lines.encode())
+
+        summary = import_passwords(self.user, upload, chunk_size=3)
+
+        self.assertEqual(summary["imported"], 7)
+        self.assertEqual(summary["categories"], {"SHOPPING": 7})
+
+    def test_unsupported_format(self):
+        upload = SimpleUploadedFile("export.xml", b"<xml/>")
+        response = self.client.post("/api/passwords/import/", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecategorizeCommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="recat", email="recat@example.com", password="pass1234")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.checkpoint = os.path.join(self.tmpdir.name, "checkpoint")
+        reset_classifiers()
+        # Stale categories from older rules
+        self.netflix = Password.objects.create(user=self.user, name="Netflix", password_value="x",
+                                               website_url="https://netflix.com", category="OTHER")
+        self.amazon = Password.objects.create(user=self.user, name="Amazon", password_value="x",
+                                              website_url="https://amazon.com", category="FINANCE")
+
+    def run_command(self, **options):
+        out = StringIO()
+        call_command("recategorize_passwords", checkpoint=self.checkpoint, chunk_size=1, stdout=out, **options)
+        return out.getvalue()
+
+    def test_updates_stale_categories(self):
+        output = self.run_command()
+
+        self.netflix.refresh_from_db()
+        self.amazon.refresh_from_db()
+        self.assertEqual((self.netflix.category, self.amazon.category), ("ENTERTAINMENT", "SHOPPING"))
+        self.assertIn("2 changed", output)
+        self.assertIn("rows/s", output)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_dry_run_prints_diff_only(self):
+        output = self.run_command(dry_run=True)
+
+        self.assertIn(f"{self.netflix.id}\tNetflix\tOTHER -> ENTERTAINMENT", output)
+        self.netflix.refresh_from_db()
+        self.assertEqual(self.netflix.category, "OTHER")
+
+    def test_resume_skips_checkpointed_rows(self):
+        with open(self.checkpoint, "w") as f:
+            json.dump({"last_id": self.netflix.id}, f)
+
+        self.run_command(resume=True)
+
+        self.netflix.refresh_from_db()
+        self.amazon.refresh_from_db()
+        self.assertEqual((self.netflix.category, self.amazon.category), ("OTHER", "SHOPPING"))
+
+
+    @patch("passwords.classifiers.pipeline", side_effect=RuntimeError("model failed to load"))
+    def test_model_failure_stops_without_overwriting(self, pipeline):
+        mystery = Password.objects.create(user=self.user, name="Mystery", password_value="x", category="FINANCE")
+
+        with self.assertRaises(CommandError):
+            self.run_command()
+
+        mystery.refresh_from_db()
+        self.assertEqual(mystery.category, "FINANCE")
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)["last_id"], self.amazon.id)
+
+
+def sha1_hex(value):
+    return hashlib.sha1(value.encode()).hexdigest().upper()
+
+
+class BreachCheckTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="breach", email="breach@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "pwned.txt")
+
+        self.breached = {"password": 9545824, "123456": 37359195, "letmein": 1, "zzz": 42}
+        lines = [f"{sha1_hex(value)}:{count}" for value, count in self.breached.items()]
+        lines += [f"{i:040X}:{i}" for i in range(1, 200)]  # Filler around the real hashes
+        with open(self.path, "w", newline="") as f:
+            f.write("\r\n".join(sorted(lines)) + "\r\n")
+
+    def test_lookup_finds_every_record_and_nothing_else(self):
+        corpus = BreachCorpus(self.path)
+        self.addCleanup(corpus.close)
+
+        for value, count in self.breached.items():
+            self.assertEqual(corpus.check(value), count)
+        self.assertEqual(corpus.lookup(f"{1:040X}"), 1)
+        self.assertEqual(corpus.lookup(f"{199:040X}"), 199)
+        self.assertEqual(corpus.check("correct horse battery staple"), 0)
+        self.assertEqual(corpus.lookup("F" * 40), 0)
+        self.assertEqual(corpus.lookup("0" * 40), 0)
+
+    def test_vault_audit_endpoint(self):
+        weak = Password.objects.create(user=self.user, name="Old forum", password_value="123456")
+        Password.objects.create(user=self.user, name="Bank", password_value="V3ry-l0ng-unique!")
+        Password.objects.create(user=self.user, name="Gone", password_value="password", is_deleted=True)
+
+        with override_settings(PASSWORD_BREACH_CORPUS_PATH=self.path):
+            response = self.client.get("/api/passwords/breach-audit/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["checked"], 2)
+        self.assertEqual(response.data["breached"], [{"id": weak.id, "name": "Old forum", "breach_count": 37359195}])
+
+    def test_audit_without_corpus(self):
+        with override_settings(PASSWORD_BREACH_CORPUS_PATH=None):
+            response = self.client.get("/api/passwords/breach-audit/")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+# MinHash collisions depend on the key, so pin one for the similar-pair assertions
+@override_settings(PASSWORD_MASTER_KEY="CgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgo=")
+class PasswordReuseTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reuse", email="reuse@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+
+    def create(self, name, value, **kwargs):
+        return Password.objects.create(user=self.user, name=name, password_value=value, **kwargs)
+
+    def test_report_groups_exact_and_similar_passwords(self):
+        forum = self.create("Forum", "Summer2023!")
+        shop = self.create("Shop", "Summer2023!")
+        bank = self.create("Bank", "Summer2024!")
+        self.create("Email", "k7#Vq9zL!pW2")
+        self.create("Deleted", "Summer2023!", is_deleted=True)
+
+        response = self.client.get("/api/passwords/reuse-report/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["checked"], 4)
+        self.assertEqual(response.data["reused"], [{"count": 2, "entries": [
+            {"id": forum.id, "name": "Forum"}, {"id": shop.id, "name": "Shop"}]}])
+        self.assertEqual(len(response.data["similar"]), 1)
+        self.assertEqual([e["name"] for e in response.data["similar"][0]["entries"]], ["Bank", "Forum", "Shop"])
+
+    def test_matches_survive_secret_key_rotation(self):
+        self.create("Forum", "Summer2023!")
+        with override_settings(SECRET_KEY="rotated-key", SECRET_KEY_FALLBACKS=[]):
+            self.create("Shop", "Summer2023!")
+            self.create("Bank", "Summer2024!")
+            report = self.client.get("/api/passwords/reuse-report/").data
+        self.assertEqual(len(report["reused"]), 1)
+        self.assertEqual(len(report["similar"]), 1)
+
+    def test_cached_report_is_dropped_when_the_vault_changes(self):
+        self.create("Forum", "Summer2023!")
+        shop = self.create("Shop", "Summer2023!")
+        self.assertEqual(len(self.client.get("/api/passwords/reuse-report/").data["reused"]), 1)
+
+        shop.soft_delete()
+
+        self.assertEqual(self.client.get("/api/passwords/reuse-report/").data["reused"], [])
+
+    def test_bulk_writes_drop_the_cached_report(self):
+        self.create("Forum", "Summer2023!")
+        shop = self.create("Shop", "Summer2023!")
+        self.client.get("/api/passwords/reuse-report/")
+
+        shop.name = "Store"
+        Password.objects.bulk_update([shop], ["name"])
+        names = [e["name"] for e in self.client.get("/api/passwords/reuse-report/").data["reused"][0]["entries"]]
+        self.assertEqual(names, ["Forum", "Store"])
+
+        Password.objects.filter(pk=shop.pk).update(is_deleted=True)
+        self.assertEqual(self.client.get("/api/passwords/reuse-report/").data["reused"], [])
+
+    def test_fingerprint_follows_password_changes(self):
+        password = self.create("Forum", "Summer2023!")
+        before = PasswordFingerprint.objects.get(password=password).exact_hash
+        self.assertNotIn("Summer", before)
+
+        password.password_value = "Winter2025?"
+        password.save()
+
+        self.assertNotEqual(PasswordFingerprint.objects.get(password=password).exact_hash, before)
+        self.assertEqual(PasswordFingerprint.objects.count(), 1)
+
+    def test_imported_entries_are_indexed(self):
+        lines = "".join(json.dumps({"name": f"Site {i}", "password": "same-password"}) + "\n" for i in range(3))
+        import_passwords(self.user, SimpleUploadedFile("export.jsonl", lines.encode()))
+
+        report = self.client.get("/api/passwords/reuse-report/").data
+        self.assertEqual(report["reused"][0]["count"], 3)
+
+    def test_minhash_estimates_similarity(self):
+        self.assertEqual(similarity(minhash("correcthorse"), minhash("correcthorse")), 1.0)
+        self.assertLess(similarity(minhash("correcthorse"), minhash("b4tt3ry$tapl")), 0.2)
+
+
+class PasswordEncryptionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sealed", email="sealed@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        key_cache.clear()
+        reset_classifiers()
+
+    def test_values_are_stored_sealed_and_served_plain(self):
+        response = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "hunter2"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["password_value"], "hunter2")
+
+        stored = Password.objects.get(pk=response.data["id"]).password_value
+        self.assertTrue(is_encrypted(stored))
+        self.assertNotIn("hunter2", stored)
+
+        listed = self.client.get("/api/passwords/").data
+        self.assertEqual([entry["password_value"] for entry in listed], ["hunter2"])
+
+    @override_settings(PASSWORD_MASTER_KEY=None, DEBUG=False)
+    def test_missing_master_key_fails_closed(self):
+        with self.assertRaises(ImproperlyConfigured):
+            encrypt_value(self.user.pk, "hunter2")
+
+    def test_list_decrypts_from_cached_key(self):
+        for i in range(5):
+            Password.objects.create(user=self.user, name=f"Site {i}",
+                                    password_value=encrypt_value(self.user.pk, f"secret-{i}"))
+        key_cache.clear()
+        # Session, passwords and one data key lookup for the whole page
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/passwords/")
+        self.assertEqual(sorted(entry["password_value"] for entry in response.data),
+                         [f"secret-{i}" for i in range(5)])
+
+    def test_sealed_value_does_not_open_for_another_user(self):
+        other = User.objects.create_user(username="other", password="pass1234")
+        sealed = encrypt_value(self.user.pk, "hunter2")
+        encrypt_value(other.pk, "anything")  # Give them a key of their own
+        with self.assertRaises(DecryptionError):
+            decrypt_value(other.pk, sealed)
+
+    def test_listing_plaintext_vault_creates_no_key(self):
+        Password.objects.create(user=self.user, name="Legacy", password_value="old-plaintext")
+        response = self.client.get("/api/passwords/")
+        self.assertEqual(response.data[0]["password_value"], "old-plaintext")
+        self.assertFalse(User.objects.filter(pk=self.user.pk, data_key__isnull=False).exists())
+
+    def test_encryption_can_be_turned_off(self):
+        UserSettings.objects.create(user=self.user, encrypt_passwords=False)
+        response = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "hunter2"})
+        self.assertEqual(Password.objects.get(pk=response.data["id"]).password_value, "hunter2")
+
+    def test_command_seals_existing_plaintext(self):
+        password = Password.objects.create(user=self.user, name="Legacy", password_value="old-plaintext")
+        Bill.objects.create(user=self.user, name="Power", amount=10, due_date="2030-01-01", password_value="bill-pass")
+        self.assertEqual(self.client.get(f"/api/passwords/{password.pk}/").data["password_value"], "old-plaintext")
+
+        call_command("encrypt_password_values", stdout=StringIO())
+
+        password.refresh_from_db()
+        self.assertTrue(is_encrypted(password.password_value))
+        self.assertTrue(is_encrypted(Bill.objects.get().password_value))
+        self.assertEqual(self.client.get(f"/api/passwords/{password.pk}/").data["password_value"], "old-plaintext")
+
+    def test_shared_page_shows_plaintext(self):
+        created = self.client.post("/api/passwords/", {"name": "Mailbox", "password_value": "hunter2"})
+        share_url = self.client.post(f"/api/passwords/{created.data['id']}/share/").data["share_url"]
+
+        page = self.client.get(share_url)
+
+        self.assertContains(page, "hunter2")
+        self.assertTrue(is_encrypted(SharedPassword.objects.get().password_value))
+
+
+class AutofillMatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="autofill", email="autofill@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+
+    def create(self, name, url, **kwargs):
+        return Password.objects.create(user=self.user, name=name, password_value="x", website_url=url, **kwargs)
+
+    def test_registrable_domain(self):
+        cases = {
+            "https://mail.google.co.uk/inbox": "google.co.uk",
+            "accounts.google.com": "google.com",
+            "https://alice.github.io": "alice.github.io",
+            "https://a.b.ck": "a.b.ck",
+            "https://www.ck": "www.ck",
+            "http://192.168.1.1:8080/": "192.168.1.1",
+            "https://EXAMPLE.com./login": "example.com",
+            "https://münchen.de": "xn--mnchen-3ya.de",
+            "http://localhost:8000": "localhost",
+            "": "",
+        }
+        for url, expected in cases.items():
+            self.assertEqual(registrable_domain(url), expected, url)
+
+    def test_match_returns_entries_for_the_same_site(self):
+        site = self.create("Google", "https://google.co.uk")
+        mail = self.create("Webmail", "https://mail.google.co.uk")
+        self.create("Other site", "https://example.co.uk")
+        self.create("Old", "https://accounts.google.co.uk", is_deleted=True)
+        other = User.objects.create_user(username="someone", password="pass1234")
+        Password.objects.create(user=other, name="Theirs", password_value="x", website_url="https://google.co.uk")
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/passwords/match/", {"url": "https://mail.google.co.uk/u/0/"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry["id"] for entry in response.data], [mail.id, site.id])
+
+    def test_domain_follows_url_changes(self):
+        password = self.create("Shop", "https://shop.example.com")
+        self.assertEqual(password.domain, "example.com")
+
+        self.client.patch(f"/api/passwords/{password.pk}/", {"website_url": "https://store.example.org"})
+
+        password.refresh_from_db()
+        self.assertEqual(password.domain, "example.org")
+
+    def test_imported_entries_get_a_domain(self):
+        lines = json.dumps({"name": "Bank", "password": "x", "url": "https://login.bank.com.au/"}) + "\n"
+        import_passwords(self.user, SimpleUploadedFile("export.jsonl", lines.encode()))
+        self.assertEqual(Password.objects.get().domain, "bank.com.au")
+
+    def test_match_needs_a_url(self):
+        response = self.client.get("/api/passwords/match/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SharedPasswordPageTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="sharer", email="sharer@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.password = Password.objects.create(user=self.user, name="Wifi", password_value="hunter2")
+        reset_classifiers()
+
+    def share(self, **data):
+        response = self.client.post(f"/api/passwords/{self.password.pk}/share/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["share_url"]
+
+    def test_page_is_one_query_after_the_first_view(self):
+        url = self.share()
+        with self.assertNumQueries(2):
+            self.assertContains(self.client.get(url), "hunter2")
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(url), "hunter2")
+        self.assertTrue(SharedPassword.objects.get().viewed)
+
+    def test_one_time_link_opens_once(self):
+        url = self.share(one_time=True)
+        self.assertContains(self.client.get(url), "hunter2")
+
+        second = self.client.get(url)
+
+        self.assertNotContains(second, "hunter2")
+        self.assertContains(second, "Link Expired")
+
+    def test_deleted_original(self):
+        url = self.share()
+        self.password.soft_delete()
+        with self.assertNumQueries(1):
+            self.assertContains(self.client.get(url), "Password Unavailable")
+
+
+
+@override_settings(PASSWORD_SHARE_BACKEND="cache")
+class CachedShareTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="cached-sharer", email="cs@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.password = Password.objects.create(user=self.user, name="Wifi", password_value="hunter2")
+        reset_classifiers()
+
+    def share(self, **data):
+        response = self.client.post(f"/api/passwords/{self.password.pk}/share/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["share_url"]
+
+    def test_share_lives_in_the_cache(self):
+        url = self.share(hours=2)
+
+        self.assertFalse(SharedPassword.objects.exists())
+        self.assertContains(self.client.get(url), "hunter2")
+
+    def test_entry_is_sealed_even_without_vault_encryption(self):
+        UserSettings.objects.update_or_create(user=self.user, defaults={"encrypt_passwords": False})
+        self.password.password_value = "plain-hunter2"
+        self.password.save()
+        url = self.share(hours=2)
+
+        token = url.rstrip("/").rsplit("/", 1)[-1]
+        stored = cache.get(shares.share_key(uuid.UUID(token)))
+        self.assertIsInstance(stored, bytes)
+        self.assertNotIn(b"plain-hunter2", stored)
+        self.assertNotIn(b"Wifi", stored)
+        self.assertContains(self.client.get(url), "plain-hunter2")
+
+        # Another link's key can't open it
+        self.assertIsNone(shares.unseal_payload(uuid.uuid4(), stored))
+
+    def test_expired_entry_is_gone(self):
+        url = self.share(hours=0)
+        response = self.client.get(url)
+        self.assertContains(response, "Link Expired")
+
+    def test_one_time_link_opens_once(self):
+        url = self.share(one_time=True)
+        self.assertContains(self.client.get(url), "hunter2")
+        self.assertContains(self.client.get(url), "Link Expired")
+
+    def test_deleted_original(self):
+        url = self.share()
+        self.password.soft_delete()
+        self.assertContains(self.client.get(url), "Password Unavailable")
+
+    def test_database_links_keep_working(self):
+        with override_settings(PASSWORD_SHARE_BACKEND="database"):
+            url = self.share()
+        self.assertContains(self.client.get(url), "hunter2")
+
+
+
+class PasswordHistoryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="historian", email="h@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+        created = self.client.post("/api/passwords/", {"name": "Bank", "password_value": "first-secret",
+                                                        "notes": "Security questions: " + "x" * 4000})
+        self.url = f"/api/passwords/{created.data['id']}/"
+
+    def test_updates_are_listed_and_recoverable(self):
+        self.client.patch(self.url, {"password_value": "second-secret"})
+        self.client.patch(self.url, {"password_value": "third-secret", "username": "me"})
+
+        history = self.client.get(self.url + "history/").data
+        self.assertEqual([(v["version"], v["changed_fields"]) for v in history],
+                         [(2, ["password_value", "username"]), (1, ["password_value"])])
+
+        first = self.client.get(self.url + "history/1/").data
+        self.assertEqual(first["password_value"], "first-secret")
+        self.assertIsNone(first["username"])
+        self.assertEqual(self.client.get(self.url + "history/2/").data["password_value"], "second-secret")
+
+    def test_small_edits_store_small_deltas(self):
+        notes = self.client.get(self.url).data["notes"]
+        self.client.patch(self.url, {"notes": notes.replace("questions", "answers")})
+
+        version = PasswordVersion.objects.get()
+        self.assertLess(len(version.delta), 100)
+        self.assertEqual(self.client.get(self.url + "history/1/").data["notes"], notes)
+
+    def test_unchanged_save_is_not_a_version(self):
+        self.client.patch(self.url, {"name": "Bank"})
+        self.assertFalse(PasswordVersion.objects.exists())
+
+    @override_settings(PASSWORD_HISTORY_RETENTION=2)
+    def test_retention_drops_oldest_versions(self):
+        for value in ("v2", "v3", "v4"):
+            self.client.patch(self.url, {"password_value": value})
+
+        self.assertEqual([v["version"] for v in self.client.get(self.url + "history/").data], [3, 2])
+        self.assertEqual(self.client.get(self.url + "history/2/").data["password_value"], "v2")
+        self.assertEqual(self.client.get(self.url + "history/1/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_restore_saves_old_state_as_an_update(self):
+        self.client.patch(self.url, {"password_value": "rotated-by-mistake"})
+
+        response = self.client.post(self.url + "history/1/restore/")
+
+        self.assertEqual(response.data["password_value"], "first-secret")
+        self.assertEqual(self.client.get(self.url + "history/2/").data["password_value"], "rotated-by-mistake")
+
+    def test_failed_save_leaves_no_version(self):
+        with patch.object(Password, "save", side_effect=RuntimeError("database went away")):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(self.url, {"password_value": "never-saved"})
+        self.assertFalse(PasswordVersion.objects.exists())
+
+        self.client.patch(self.url, {"password_value": "second-secret"})
+        self.assertEqual(self.client.get(self.url + "history/1/").data["password_value"], "first-secret")
+
+    def test_history_survives_secret_key_rotation(self):
+        self.client.patch(self.url, {"password_value": "second-secret"})
+        with override_settings(SECRET_KEY="rotated-key", SECRET_KEY_FALLBACKS=[]):
+            self.assertEqual(self.client.get(self.url + "history/1/").data["password_value"], "first-secret")
+
+    def test_edits_outside_the_api_are_detected(self):
+        self.client.patch(self.url, {"password_value": "second-secret"})
+        Password.objects.filter(pk=PasswordVersion.objects.get().password_id).update(password_value="changed-directly")
+
+        response = self.client.get(self.url + "history/1/")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+
+
+class VaultExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="exporter", email="ex@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+        self.client.post("/api/passwords/", {"name": "Bank", "password_value": "s3cret, \"quoted\"",
+                                              "website_url": "https://bank.example.com"})
+        Password.objects.create(user=self.user, name="Gone", password_value="x", is_deleted=True)
+        Bill.objects.create(user=self.user, name="Power", amount="12.50", due_date="2030-01-01")
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        with override_settings(MEDIA_ROOT=media.name):
+            Document.objects.create(user=self.user, title="Passport", file=SimpleUploadedFile("passport.pdf", b"%PDF"))
+
+    def export(self, **data):
+        response = self.client.post("/api/passwords/export/", {"passphrase": "correct horse", **data})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content)
+
+    def test_jsonl_export_round_trips(self):
+        blob = self.export()
+        self.assertNotIn(b"s3cret", blob)
+
+        lines = b"".join(decrypt_export(BytesIO(blob), "correct horse")).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([(r["type"], r["name"]) for r in records],
+                         [("password", "Bank"), ("bill", "Power"), ("document", "Passport")])
+        self.assertEqual(records[0]["password"], 's3cret, "quoted"')
+        self.assertEqual(records[2]["file_name"], "passport.pdf")
+
+    def test_csv_export(self):
+        blob = self.export(format="csv")
+        rows = list(csv.DictReader(StringIO(b"".join(decrypt_export(BytesIO(blob), "correct horse")).decode())))
+        self.assertEqual([row["type"] for row in rows], ["password", "bill", "document"])
+        self.assertEqual(rows[0]["password"], 's3cret, "quoted"')
+
+    def test_wrong_passphrase(self):
+        blob = self.export()
+        with self.assertRaises(ExportDecryptionError):
+            list(decrypt_export(BytesIO(blob), "wrong horse"))
+
+    @patch("passwords.exports.SEGMENT_SIZE", 64)
+    def test_truncated_export_is_rejected(self):
+        blob = self.export()
+        segments = list(decrypt_export(BytesIO(blob), "correct horse"))
+        self.assertGreater(len(segments), 2)
+
+        # Cut after a complete segment so every remaining one still authenticates
+        header = 4 + 16 + 3 + 7
+        first_length = int.from_bytes(blob[header:header + 4], "big")
+        with self.assertRaises(ExportDecryptionError):
+            list(decrypt_export(BytesIO(blob[:header + 4 + first_length]), "correct horse"))
+
+    def test_oversized_scrypt_parameters_are_rejected(self):
+        blob = self.export()
+        params = 4 + 16
+        for log_n, r, p in ((40, 8, 1), (0, 8, 1), (15, 255, 1), (15, 8, 255)):
+            tampered = blob[:params] + bytes((log_n, r, p)) + blob[params + 3:]
+            with self.assertRaises(ExportDecryptionError):
+                next(decrypt_export(BytesIO(tampered), "correct horse"))
+
+    def test_short_passphrase(self):
+        response = self.client.post("/api/passwords/export/", {"passphrase": "short"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class UsageTrackingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user-of-things", email="u@example.com", password="pass1234")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        reset_classifiers()
+        self.tracker = get_tracker()
+        self.tracker.buffer.drain()
+        self.mail = Password.objects.create(user=self.user, name="Mail", password_value="x")
+        self.bank = Password.objects.create(user=self.user, name="Bank", password_value="x")
+        self.unused = Password.objects.create(user=self.user, name="Unused", password_value="x")
+
+    def test_reads_are_written_behind_in_one_batch(self):
+        updated_at = self.mail.updated_at
+        for _ in range(3):
+            self.client.get(f"/api/passwords/{self.mail.pk}/")
+        self.client.post(f"/api/passwords/{self.bank.pk}/used/")
+        self.assertEqual(Password.objects.get(pk=self.mail.pk).use_count, 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.tracker.flush(), 2)
+
+        self.mail.refresh_from_db()
+        self.assertEqual(self.mail.use_count, 3)
+        self.assertIsNotNone(self.mail.last_used_at)
+        self.assertEqual(self.mail.updated_at, updated_at)
+        self.assertEqual(Password.objects.get(pk=self.bank.pk).use_count, 1)
+
+    def test_failed_flush_keeps_the_counts(self):
+        for _ in range(2):
+            self.client.post(f"/api/passwords/{self.mail.pk}/used/")
+        with patch("passwords.usage.write_usage", side_effect=RuntimeError("database is down")):
+            self.assertEqual(self.tracker.flush(), 0)
+        self.client.post(f"/api/passwords/{self.mail.pk}/used/")
+
+        self.assertEqual(self.tracker.flush(), 1)
+        self.assertEqual(Password.objects.get(pk=self.mail.pk).use_count, 3)
+
+    def test_ordering_by_use(self):
+        self.client.post(f"/api/passwords/{self.bank.pk}/used/")
+        self.client.post(f"/api/passwords/{self.mail.pk}/used/")
+        self.client.post(f"/api/passwords/{self.mail.pk}/used/")
+        self.tracker.flush()
+
+        recent = self.client.get("/api/passwords/", {"ordering": "-last_used_at"}).data
+        self.assertEqual([p["name"] for p in recent], ["Mail", "Bank", "Unused"])
+        most_used = self.client.get("/api/passwords/", {"ordering": "-use_count"}).data
+        self.assertEqual([p["name"] for p in most_used], ["Mail", "Bank", "Unused"])
+        self.assertEqual([p["name"] for p in self.client.get("/api/passwords/").data], ["Bank", "Mail", "Unused"])
+
+    @override_settings(PASSWORD_USAGE_FLUSH_SECONDS=0)
+    def test_flushes_once_the_interval_has_passed(self):
+        self.client.post(f"/api/passwords/{self.bank.pk}/used/")
+        self.assertEqual(Password.objects.get(pk=self.bank.pk).use_count, 1)
+
+    def test_other_users_entries_are_not_counted(self):
+        other = User.objects.create_user(username="nosy", password="pass1234")
+        self.client.force_authenticate(user=other)
+        response = self.client.post(f"/api/passwords/{self.bank.pk}/used/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.tracker.buffer.drain(), {})
@@ -0,0 +1,171 @@
+# usage.py
+"""
+Write-behind "last used" tracking.
+
+Reveals are counted in a buffer and written to Password.use_count and
+last_used_at in one batch at most every PASSWORD_USAGE_FLUSH_SECONDS, so
+reading a password doesn't cost a write. The buffer is per process by
+default; with PASSWORD_USAGE_BUFFER = 'redis' it's a pair of Redis hashes
+shared by every worker. Flushes happen inline on the first reveal after the
+interval (one worker at a time, via a cache lock) and from
+``manage.py flush_password_usage`` for quiet periods. A flush whose write
+fails puts what it drained back into the buffer for the next one. Counts
+still in a buffer when a process dies are lost; these are usage hints, not
+audit data.
+"""
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COUNTS_KEY = 'password-usage:counts'
+LAST_USED_KEY = 'password-usage:last-used'
+FLUSH_LOCK_KEY = 'password-usage:flush-lock'
+
+# Read both hashes and delete them in one step, so no increment lands between
+DRAIN_SCRIPT = """
+local counts = redis.call('HGETALL', KEYS[1])
+local last_used = redis.call('HGETALL', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+return {counts, last_used}
+"""
+
+# Put drained usage back (ARGV: pk, count, timestamp, ...), keeping the later last-used time
+MERGE_SCRIPT = """
+for i = 1, #ARGV, 3 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    local current = redis.call('HGET', KEYS[2], ARGV[i])
+    if not current or tonumber(current) < tonumber(ARGV[i + 2]) then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+    end
+end
+"""
+
+
+def write_usage(usage):
+    """Apply {password_id: (count, last_used_at)} to the rows in one batched UPDATE."""
+    from .models import Password
+
+    if not usage:
+        return 0
+    rows = [
+        Password(pk=pk, use_count=F('use_count') + count, last_used_at=last_used)
+        for pk, (count, last_used) in usage.items()
+    ]
+    # bulk_update leaves updated_at alone and sends no signals
+    Password.objects.bulk_update(rows, ['use_count', 'last_used_at'], batch_size=500)
+    return len(rows)
+
+
+class LocalUsageBuffer:
+    def __init__(self):
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def record(self, pk, when):
+        with self._lock:
+            count, _ = self._usage.get(pk, (0, None))
+            self._usage[pk] = (count + 1, when)
+
+    def drain(self):
+        with self._lock:
+            usage, self._usage = self._usage, {}
+        return usage
+
+    def merge(self, usage):
+        with self._lock:
+            for pk, (count, when) in usage.items():
+                current, last = self._usage.get(pk, (0, None))
+                self._usage[pk] = (current + count, when if last is None else max(last, when))
+
+
+class RedisUsageBuffer:
+    def _connection(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def record(self, pk, when):
+        pipe = self._connection().pipeline(transaction=False)
+        pipe.hincrby(COUNTS_KEY, pk, 1)
+        pipe.hset(LAST_USED_KEY, pk, when.timestamp())
+        pipe.execute()
+
+    def drain(self):
+        counts, last_used = self._connection().eval(DRAIN_SCRIPT, 2, COUNTS_KEY, LAST_USED_KEY)
+        counts = dict(zip(counts[::2], counts[1::2]))
+        last_used = dict(zip(last_used[::2], last_used[1::2]))
+        return {
+            int(pk): (int(count), datetime.fromtimestamp(float(last_used[pk]), tz=dt_timezone.utc))
+            for pk, count in counts.items() if pk in last_used
+        }
+
+    def merge(self, usage):
+        args = []
+        for pk, (count, when) in usage.items():
+            args += [pk, count, when.timestamp()]
+        if args:
+            self._connection().eval(MERGE_SCRIPT, 2, COUNTS_KEY, LAST_USED_KEY, *args)
+
+
+class UsageTracker:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self._last_flush = time.monotonic()
+
+    def record(self, pk):
+        try:
+            self.buffer.record(pk, timezone.now())
+        except Exception:
+            # Usage is a nicety; never fail the read over it
+            logger.warning("Couldn't record password usage", exc_info=True)
+            return
+        interval = getattr(settings, 'PASSWORD_USAGE_FLUSH_SECONDS', 30)
+        if time.monotonic() - self._last_flush >= interval:
+            self._last_flush = time.monotonic()
+            if isinstance(self.buffer, LocalUsageBuffer) or cache.add(FLUSH_LOCK_KEY, True, interval):
+                self.flush()
+
+    def flush(self):
+        try:
+            usage = self.buffer.drain()
+        except Exception:
+            logger.warning("Couldn't drain password usage", exc_info=True)
+            return 0
+        try:
+            return write_usage(usage)
+        except Exception:
+            logger.warning("Couldn't flush password usage; keeping it for the next flush", exc_info=True)
+        try:
+            self.buffer.merge(usage)
+        except Exception:
+            logger.warning("Couldn't put back %d password usage counts", len(usage), exc_info=True)
+        return 0
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            if getattr(settings, 'PASSWORD_USAGE_BUFFER', 'local') == 'redis':
+                _tracker = UsageTracker(RedisUsageBuffer())
+            else:
+                _tracker = UsageTracker(LocalUsageBuffer())
+                # Don't drop a quiet worker's counts on a clean shutdown
+                atexit.register(_tracker.flush)
+        return _tracker
+
+
+def record_use(pk):
+    get_tracker().record(pk)
@@ -3,28 +3,162 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
 from django.shortcuts import render, get_object_or_404
-from .models import Password, SharedPassword
+from .models import Password, PasswordVersion, SharedPassword
 from .serializers import PasswordSerializer
+from .importers import ImportFormatError, import_passwords
+from rest_framework.parsers import MultiPartParser
+from .breach import BreachCorpusUnavailable, audit_passwords
+from .reuse import reuse_report
+from .encryption import cipher_for, decrypt_value
+from .public_suffix import hostname, registrable_domain
+from . import shares
+from .history import HistoryUnavailable, reconstruct
+from .exports import FORMATS, stream_export
+from .filters import NullsLastOrderingFilter
+from .usage import record_use
 from rest_framework.decorators import action
 from datetime import timedelta
 from django.urls import reverse
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 import pytz
 
 class PasswordViewSet(viewsets.ModelViewSet):
     serializer_class = PasswordSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [NullsLastOrderingFilter]
+    # ?ordering=-last_used_at for "recently used", -use_count for "most used"
+    ordering_fields = ['name', 'created_at', 'updated_at', 'last_used_at', 'use_count']
     
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Password.objects.none()
         return Password.objects.filter(user=self.request.user, is_deleted=False)
     
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        # Buffered; no write on the read path
+        record_use(response.data['id'])
+        return response
+
+    @action(detail=True, methods=['post'])
+    def used(self, request, pk=None):
+        # For clients that fill or copy a password they already have
+        record_use(self.get_object().pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def perform_destroy(self, instance):
         # Soft delete instead of actual delete
         instance.soft_delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_vault(self, request):
+        # CSV / JSON / JSON Lines export from a browser or another password manager
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the export as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = import_passwords(request.user, upload, fmt=request.data.get('format'))
+        except ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'error' in summary and not summary['imported']:
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def export(self, request):
+        # Passwords, bills and document metadata, encrypted with the caller's passphrase as it streams
+        fmt = request.data.get('format', 'jsonl')
+        passphrase = request.data.get('passphrase') or ''
+        if fmt not in FORMATS:
+            return Response({'error': 'format must be "jsonl" or "csv"'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(passphrase) < 8:
+            return Response({'error': 'Choose a passphrase of at least 8 characters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream_export(request.user, fmt, passphrase), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="encryptease-vault.{fmt}.enc"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='breach-audit')
+    def breach_audit(self, request):
+        # Checks the whole vault against the local breach corpus; nothing leaves the server
+        rows = self.get_queryset().values_list('id', 'name', 'password_value').iterator(chunk_size=1000)
+        cipher = cipher_for(request.user.pk)
+        rows = ((pk, name, decrypt_value(request.user.pk, value, cipher)) for pk, name, value in rows)
+        try:
+            report = audit_passwords(rows)
+        except BreachCorpusUnavailable as e:
+            return Response({'error': f'Breach check unavailable: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(report)
+
+    @action(detail=False, methods=['get'], url_path='reuse-report')
+    def password_reuse(self, request):
+        # Exact and near-duplicate password groups, from stored fingerprints only
+        return Response(reuse_report(request.user))
+
+    @action(detail=False, methods=['get'])
+    def match(self, request):
+        # Autofill: entries saved for the same registrable domain as ?url=
+        url = request.query_params.get('url', '')
+        domain = registrable_domain(url)
+        if not domain:
+            return Response({'error': 'Pass the page address as "url"'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One query on the (user, domain) index
+        matches = list(self.get_queryset().filter(domain=domain))
+        host = hostname(url)
+        # Entries saved for this exact host come before the rest of the site
+        matches.sort(key=lambda password: hostname(password.website_url) != host)
+        return Response(self.get_serializer(matches, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        # Metadata only; nothing is decrypted until a version is opened
+        password = self.get_object()
+        versions = password.versions.values_list('number', 'created_at', 'changed_fields')
+        return Response([
+            {'version': number, 'created_at': created_at, 'changed_fields': changed_fields}
+            for number, created_at, changed_fields in versions
+        ])
+
+    @action(detail=True, methods=['get'], url_path=r'history/(?P<number>\d+)')
+    def version(self, request, pk=None, number=None):
+        password = self.get_object()
+        try:
+            state = reconstruct(password, int(number))
+        except PasswordVersion.DoesNotExist:
+            return Response({'error': 'No such version'}, status=status.HTTP_404_NOT_FOUND)
+        except HistoryUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'version': int(number), **state})
+
+    @action(detail=True, methods=['post'], url_path=r'history/(?P<number>\d+)/restore')
+    def restore_version(self, request, pk=None, number=None):
+        # Saved as a normal update, so the state being replaced becomes a version too
+        password = self.get_object()
+        try:
+            state = reconstruct(password, int(number))
+        except PasswordVersion.DoesNotExist:
+            return Response({'error': 'No such version'}, status=status.HTTP_404_NOT_FOUND)
+        except HistoryUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        serializer = self.get_serializer(password, data=state, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def category(self, request, pk=None):
+        # Lets clients poll an entry saved with a pending category
+        password = self.get_object()
+        return Response({
+            'id': password.id,
+            'category': password.category,
+            'category_status': password.category_status,
+        })
+
     @action(detail=True, methods=['post'])
     def share(self, request, pk=None):
         password = self.get_object()
@@ -41,18 +175,28 @@ class PasswordViewSet(viewsets.ModelViewSet):
         except Exception:
             user_tz = pytz.UTC
         expires_at = timezone.now() + timedelta(hours=hours)
+        one_time = str(request.data.get('one_time', '')).lower() in ('true', '1')
 
-        shared = SharedPassword.objects.create(
+        shared = SharedPassword(
             original_password=password,
             name=password.name,
             username=password.username,
-            password_value=password.password_value,
+            password_value=password.password_value,  # Still sealed for the same user
             website_url=password.website_url,
             notes=password.notes,
             category=password.category,
             created_by=request.user,
-            expires_at=expires_at
+            expires_at=expires_at,
+            one_time=one_time
         )
+        if shares.cache_enabled():
+            # Lives only as long as the link does
+            try:
+                shares.save_share(shared)
+            except Exception:
+                return Response({'error': 'Sharing is unavailable right now'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        else:
+            shared.save()
         
         share_url = request.build_absolute_uri(
             reverse('shared-password', kwargs={'token': shared.token})
@@ -60,8 +204,30 @@ class PasswordViewSet(viewsets.ModelViewSet):
 
         return Response({'share_url': share_url}, status=status.HTTP_201_CREATED)
 
+# Everything the shared page reads, fetched with the owner's deleted flag in one query
+SHARED_PAGE_FIELDS = (
+    'name', 'username', 'password_value', 'website_url', 'notes', 'created_by',
+    'expires_at', 'viewed', 'one_time', 'original_password__is_deleted',
+)
+
+
 def shared_password_view(request, token):
-    shared = get_object_or_404(SharedPassword, token=token)
+    if shares.cache_enabled():
+        shared = shares.load_share(token)
+        if shared is not None:
+            return cached_share_view(request, shared)
+
+    # Links created before the cache backend was switched on are still rows
+    shared = (SharedPassword.objects
+              .select_related('original_password')
+              .only(*SHARED_PAGE_FIELDS)
+              .filter(token=token)
+              .first())
+    if shared is None:
+        if shares.cache_enabled():
+            # An expired cache entry is simply gone
+            return render(request, 'passwords/shared_expired.html')
+        raise Http404
     
     if shared.is_expired():
         return render(request, 'passwords/shared_expired.html')
@@ -69,12 +235,30 @@ def shared_password_view(request, token):
     if shared.original_password.is_deleted:
         return render(request, 'passwords/shared_deleted.html')
     
-    # Mark as viewed (optional)
     if not shared.viewed:
-        shared.viewed = True
-        shared.save()
-    
+        # Only the first view writes, and only one request can claim a one-time link
+        claimed = SharedPassword.objects.filter(pk=shared.pk, viewed=False).update(viewed=True)
+        if not claimed and shared.one_time:
+            return render(request, 'passwords/shared_expired.html')
+    elif shared.one_time:
+        return render(request, 'passwords/shared_expired.html')
+
+    return shared_detail(request, shared)
+
+
+def cached_share_view(request, shared):
+    # The entry's TTL is its expiry, so only the owner's delete needs checking
+    if not Password.objects.filter(pk=shared.original_password_id, is_deleted=False).exists():
+        return render(request, 'passwords/shared_deleted.html')
+    if shared.one_time and not shares.claim_one_time(shared):
+        return render(request, 'passwords/shared_expired.html')
+    return shared_detail(request, shared)
+
+
+def shared_detail(request, shared):
+    # Only for the template; the stored share keeps the sealed value
+    shared.password_value = decrypt_value(shared.created_by_id, shared.password_value)
     return render(request, 'passwords/shared_detail.html', {
         'password': shared,
         'expires_at': shared.expires_at
-    })
\ No newline at end of file
+    })